@@ -0,0 +1,41 @@
+"""Time and peak memory of companyfacts -> quarterly extraction on a large synthetic filer.
+
+Compares fin_from_companyfacts against the previous row-wise implementation (kept in
+src/utils/reference.py) and checks both produce the same table.
+    python -m scripts.bench_companyfacts --facts 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src.data.fetch_fin_from_sec import fin_from_companyfacts
+from src.utils.reference import legacy_fin_from_companyfacts, synthetic_companyfacts
+
+
+def measure(fn, *a):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*a)
+    secs = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, secs, peak / 1e6
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark companyfacts fact extraction")
+    ap.add_argument("--facts", type=int, default=100_000,
+                    help="fact entries in the synthetic document")
+    args = ap.parse_args()
+    cf = synthetic_companyfacts(args.facts)
+    old, t_old, m_old = measure(legacy_fin_from_companyfacts, cf, "0000000001")
+    new, t_new, m_new = measure(fin_from_companyfacts, cf, "0000000001")
+    pd.testing.assert_frame_equal(old, new)
+    print(f"[INFO] {args.facts} facts -> {len(new)} quarters")
+    print(f"[INFO] row-wise:   {t_old:7.2f}s  peak {m_old:7.1f} MB")
+    print(f"[INFO] vectorized: {t_new:7.2f}s  peak {m_new:7.1f} MB  ({t_old / t_new:.1f}x faster)")
+    print("[OK] outputs identical")
+
+if __name__ == "__main__":
+    main()
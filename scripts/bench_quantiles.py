@@ -0,0 +1,87 @@
+"""Check the streaming quantile sketch against exact quantiles on a synthetic panel.
+
+Winsorization cutoffs (1%/99% of CCC, DIO, DSO, DPO) and per-quarter 90% thresholds are
+computed exactly (whole columns in memory) and from chunks with KLL sketches; reports the
+rank error of each sketch quantile, the retained items and the timings. eps=0 must
+reproduce the exact numbers.
+    python -m scripts.bench_quantiles --rows 2000000 --eps 0.001
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features.compute_ccc import (
+    FIN_INPUTS,
+    WINSOR_COLS,
+    core_metrics,
+    stream_cutoffs,
+    winsor_cutoffs,
+)
+from src.utils.quantiles import GroupedQuantiles
+
+
+def synthetic_fin(rows: int, quarters: int = 40, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    fin = pd.DataFrame({c: rng.lognormal(17, 1, rows) for c in FIN_INPUTS})
+    fin["cogs"] *= rng.uniform(0.5, 0.9, rows)
+    labels = np.array([f"{2000 + i // 4}Q{i % 4 + 1}" for i in range(quarters)])
+    fin["quarter"] = labels[rng.integers(0, quarters, rows)]
+    fin["shock"] = rng.standard_t(3, rows)
+    return fin
+
+def rank_error(sorted_x: np.ndarray, value: float, q: float) -> float:
+    return abs(np.searchsorted(sorted_x, value, side="right") / len(sorted_x) - q)
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark streaming quantile sketches")
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--eps", type=float, default=0.001)
+    ap.add_argument("--chunksize", type=int, default=250_000)
+    args = ap.parse_args()
+    fin = synthetic_fin(args.rows)
+    def chunks():
+        return (fin.iloc[i:i + args.chunksize] for i in range(0, len(fin), args.chunksize))
+    print(f"[INFO] {len(fin)} rows, chunks of {args.chunksize}, eps={args.eps}")
+
+    t0 = time.perf_counter()
+    metrics = core_metrics(fin[FIN_INPUTS].copy())
+    exact = winsor_cutoffs(metrics)
+    t_exact = time.perf_counter() - t0
+    if stream_cutoffs(chunks(), eps=0) != exact:
+        raise SystemExit("[ERR] exact streaming cutoffs differ from winsor_cutoffs")
+    t0 = time.perf_counter()
+    approx = stream_cutoffs(chunks(), eps=args.eps)
+    t_sketch = time.perf_counter() - t0
+    worst = 0.0
+    for c in WINSOR_COLS:
+        x = np.sort(metrics[c].dropna().to_numpy())
+        errs = [rank_error(x, v, q) for v, q in zip(approx[c], (0.01, 0.99), strict=True)]
+        worst = max(worst, *errs)
+        print(f"[INFO] {c}: exact [{exact[c][0]:.4g}, {exact[c][1]:.4g}]  "
+              f"sketch [{approx[c][0]:.4g}, {approx[c][1]:.4g}]  rank error {max(errs):.2e}")
+    print(f"[INFO] winsor cutoffs: exact {t_exact:.2f}s  streaming sketch {t_sketch:.2f}s")
+
+    t0 = time.perf_counter()
+    thr = fin.groupby("quarter")["shock"].quantile(0.9)
+    t_exact = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    g = GroupedQuantiles(args.eps)
+    for chunk in chunks():
+        g.update(chunk["shock"], chunk["quarter"])
+    top = g.quantile(0.9)
+    t_sketch = time.perf_counter() - t0
+    by_q = {q: np.sort(s.to_numpy()) for q, s in fin.groupby("quarter")["shock"]}
+    errs = [rank_error(by_q[q], top[q], 0.9) for q in thr.index]
+    worst = max(worst, *errs)
+    kept = sum(sk.size for sk in g.sketches.values())
+    print(f"[INFO] per-quarter p90 ({len(thr)} groups): exact {t_exact:.2f}s  "
+          f"sketch {t_sketch:.2f}s  max rank error {max(errs):.2e}  "
+          f"retained {kept} of {len(fin)} values")
+    if worst > args.eps:
+        raise SystemExit(f"[ERR] rank error {worst:.2e} above eps {args.eps}")
+    print("[OK] sketch quantiles within eps; eps=0 matches exact")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 
-import pathlib, shutil, pandas as pd
+import pathlib
+import shutil
+
+from src.utils.io import read_table
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 ART = ROOT / "artifacts"
@@ -14,7 +17,7 @@ def copy_if(src, dst):
 def to_tex(csv_rel, tex_rel, caption, label):
     p = ROOT / csv_rel
     if p.exists():
-        df = pd.read_csv(p)
+        df = read_table(p)
         tex = df.to_latex(index=False, escape=True, caption=caption, label=label)
         out = ROOT / tex_rel
         out.parent.mkdir(parents=True, exist_ok=True)
@@ -26,7 +29,9 @@ def main():
     copy_if("reports/tables/did_event.csv", ART/"tables/did_event.csv")
     copy_if("reports/tables/mediation.csv", ART/"tables/mediation.csv")
     copy_if("reports/figures/eventstudy.png", ART/"figures/eventstudy.png")
-    copy_if("data/processed/firm_quarter.csv", ART/"data/firm_quarter.csv")
+    # processed panel in whichever format the pipeline wrote it
+    for ext in (".parquet", ".feather", ".csv"):
+        copy_if(f"data/processed/firm_quarter{ext}", ART/f"data/firm_quarter{ext}")
 
     to_tex("reports/tables/fe_main.csv", "artifacts/tables/fe_main.tex", "Fixed-effects regression", "tab:fe_main")
     to_tex("reports/tables/did_event.csv", "artifacts/tables/did_event.tex", "Event-study coefficients", "tab:eventstudy")
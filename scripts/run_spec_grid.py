@@ -0,0 +1,243 @@
+"""Run the specification grid in the `grid:` section of config/config.yaml.
+
+Each model is expanded only over the grid keys it depends on (fe: none; mediation:
+mediator; did: treat_rule, gscpi_thresh, shock_col, window; iv: iv_spec, iv_lag), so the
+FE table is estimated once however many thresholds are swept. Shared stages run once in
+the parent: reading the inputs, the merged/lagged/winsorized base panel, the firm and
+quarter codes of the estimation sample and the FE demeaning of its columns. Specs that
+need the same treat or IV panel are grouped into one task; all gscpi_thresh values of a
+task share one first-treat sweep. Tasks are fanned out over a process pool, and every
+term lands in one CSV with the spec keys and timings.
+    python -m scripts.run_spec_grid --config config/config.yaml --workers 4
+"""
+import argparse
+import itertools
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import yaml
+
+from src.features.compute_ccc import (
+    ESSENTIALS,
+    add_iv,
+    add_treat_and_event,
+    base_panel,
+    finalize_panel,
+    first_treat_sweep,
+    read_fin_winsorized,
+    sweep_event_times,
+)
+from src.models.absorb import Absorbed, FixedEffects
+from src.models.did_eventstudy import run_eventstudy
+from src.models.fe_panel import REGRESSORS, fe_regression
+from src.models.iv_panel import fe_2sls, iv_design
+from src.models.mediation_statistical import mediation_paths
+from src.utils.io import KEY_DTYPES, categorize_keys, read_table
+
+KEYS = ["treat_rule", "gscpi_thresh", "shock_col", "iv_spec", "iv_lag", "window", "mediator"]
+MODELS = {"fe": [], "mediation": ["mediator"],
+          "did": ["treat_rule", "gscpi_thresh", "shock_col", "window"], "iv": ["iv_spec", "iv_lag"]}
+INSTR = {"peer_it_lagK": "IV_peer_IT", "industry_wave": "IV_wave"}
+# per-worker: base panel, estimation sample, its FE codes and demeaned columns, settings
+_SHARED = None
+
+def grid_axes(cfg: dict) -> dict:
+    # every grid key as a list; keys missing from grid: fall back to the treat:/iv: sections
+    treat, iv, grid = cfg.get("treat", {}), cfg.get("iv", {}), cfg.get("grid", {})
+    axes = {"treat_rule": treat.get("rule", "gscpi_thresh"),
+            "gscpi_thresh": treat.get("gscpi_thresh", 0.5),
+            "shock_col": treat.get("shock_col", "gscpi"), "iv_spec": iv.get("spec", "peer_it_lagK"),
+            "iv_lag": iv.get("lag", 4), "window": 6, "mediator": "DIO"}
+    axes.update({k: grid[k] for k in KEYS if k in grid})
+    return {k: v if isinstance(v, list) else [v] for k, v in axes.items()}
+
+def expand_specs(axes: dict, models) -> list:
+    # one spec per distinct combination of the keys a model uses; keys it ignores are None
+    specs = []
+    for model in models:
+        if model not in MODELS:
+            raise ValueError(f"Unknown model in grid: {model} (one of {', '.join(MODELS)})")
+        for combo in itertools.product(*(axes[k] for k in MODELS[model])):
+            spec = dict.fromkeys(KEYS)
+            spec.update(zip(MODELS[model], combo, strict=True))
+            if model == "did" and spec["treat_rule"] != "gscpi_thresh":
+                spec["gscpi_thresh"] = None
+            if model == "did" and spec["treat_rule"] == "custom_dates":
+                spec["shock_col"] = None
+            if model == "iv" and spec["iv_spec"] != "peer_it_lagK":
+                spec["iv_lag"] = None
+            spec = {"model": model, **spec}
+            if spec not in specs:
+                specs.append(spec)
+    return specs
+
+def stage_key(spec: dict) -> tuple:
+    # specs with equal keys run on the same treat/IV panel (or the same threshold sweep)
+    if spec["model"] == "did":
+        return ("did", spec["treat_rule"], spec["shock_col"])
+    if spec["model"] == "iv":
+        return ("iv", spec["iv_spec"], spec["iv_lag"])
+    return ("base",)
+
+def _init_worker(shared: dict):
+    global _SHARED
+    _SHARED = shared
+
+def _same_rows(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    return len(a) == len(b) and all(
+        (a[k].astype(str).to_numpy() == b[k].astype(str).to_numpy()).all()
+        for k in ("firm_id", "quarter"))
+
+def _stage(task):
+    # (panel, {threshold: event_time of the sample rows} or None) for a task's specs
+    s = _SHARED
+    spec = task[0][1]
+    if spec["model"] == "did" and spec["treat_rule"] == "gscpi_thresh":
+        # every threshold from one sweep; event times on the base rows, cut to the shared sample
+        thresholds = list(dict.fromkeys(sp["gscpi_thresh"] for _, sp in task))
+        table = first_treat_sweep(s["base"], thresholds, spec["shock_col"])
+        return s["sample"], {t: et[s["keep"]] for t, et in sweep_event_times(s["base"], table)}
+    if spec["model"] == "did":
+        kw = {k: spec[k] for k in ("gscpi_thresh", "shock_col") if spec[k] is not None}
+        panel = add_treat_and_event(s["base"], spec["treat_rule"],
+                                    custom_events_csv=s["custom_events"],
+                                    quantile_eps=s["quantile_eps"], **kw)
+        return finalize_panel(panel), None
+    if spec["model"] == "iv":
+        kw = {"iv_lag": spec["iv_lag"]} if spec["iv_lag"] is not None else {}
+        panel = add_iv(s["base"], spec["iv_spec"], industry_wave_csv=s["industry_wave_csv"], **kw)
+        return finalize_panel(panel), None
+    return s["sample"], None
+
+def _fit(spec: dict, df: pd.DataFrame, event_times=None) -> pd.DataFrame:
+    s = _SHARED
+    if spec["model"] == "fe":
+        return fe_regression(df, cov_type=s["cov"], absorbed=s["absorbed"])[1]
+    if spec["model"] == "mediation":
+        out = mediation_paths(df, [spec["mediator"]], cov_type=s["cov"], absorbed=s["absorbed"])[0]
+        return out.rename(columns={"metric": "term", "value": "coef"})
+    if spec["model"] == "did" and event_times is not None:
+        return run_eventstudy(df, window=spec["window"], cov_type=s["cov"], fe=s["fe"],
+                              event_time=event_times[spec["gscpi_thresh"]]).drop(columns="k")
+    if spec["model"] == "did":
+        # treatment never changes the sample, so the shared FE codes normally apply
+        fe = s["fe"] if _same_rows(df, s["sample"]) else None
+        return run_eventstudy(df, window=spec["window"], cov_type=s["cov"], tol=s["tol"],
+                              fe=fe).drop(columns="k")
+    d, endog, instr = iv_design(df, "IT_lag1", INSTR[spec["iv_spec"]])
+    return fe_2sls(d, "CCC", endog, ["gscpi"], instr, cov_type=s["cov"], tol=s["tol"]).table()
+
+def _run_task(task) -> list:
+    # task: [(spec index, spec)] sharing one stage; the stage time is reported on each of them
+    t0 = time.perf_counter()
+    df, event_times = _stage(task)
+    stage_s = time.perf_counter() - t0
+    out = []
+    for idx, spec in task:
+        t0 = time.perf_counter()
+        table = _fit(spec, df, event_times)
+        out.append(table.assign(spec=idx, **spec, seconds=time.perf_counter() - t0,
+                                stage_seconds=stage_s))
+    return out
+
+def shared_stages(base: pd.DataFrame, mediators, tol: float = 1e-10) -> dict:
+    # estimation sample of the base panel, its FE codes and the base columns demeaned once; a
+    # mediator missing on some sample rows is left to Absorbed, which fits its paths on the rows
+    # it is observed
+    sample = categorize_keys(finalize_panel(base))
+    sample["ITxGSCPI"] = sample["IT_lag1"] * sample["gscpi"]
+    missing = [m for m in mediators if m not in sample.columns]
+    if missing:
+        raise ValueError(f"Unknown mediator column(s): {', '.join(missing)}")
+    fe = FixedEffects.from_frame(sample, tol=tol)
+    absorbed = Absorbed(sample, REGRESSORS + ["CCC", *mediators], fe, clusters=sample["firm_id"])
+    # base rows that make up sample, in order
+    keep = base[ESSENTIALS].notna().all(axis=1).to_numpy()
+    return {"base": base, "sample": sample, "keep": keep, "fe": fe, "absorbed": absorbed}
+
+def run_grid(shared: dict, specs, workers: int = 1) -> pd.DataFrame:
+    # shared: shared_stages() plus cov, tol, quantile_eps, custom_events, industry_wave_csv
+    groups = {}
+    for idx, spec in enumerate(specs):
+        groups.setdefault(stage_key(spec), []).append((idx, spec))
+    tasks = sorted(groups.values(), key=len, reverse=True)  # longest tasks first
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared,)) as ex:
+            results = list(ex.map(_run_task, tasks))
+    else:
+        _init_worker(shared)
+        results = [_run_task(t) for t in tasks]
+    out = pd.concat([t for r in results for t in r], ignore_index=True)
+    cols = (["spec", "model"] + KEYS
+            + ["term", "coef", "std_err", "p_value", "seconds", "stage_seconds"])
+    return out.reindex(columns=cols).sort_values("spec", kind="stable").reset_index(drop=True)
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Run the spec grid of config/config.yaml over one shared base panel")
+    ap.add_argument("--config", default="config/config.yaml")
+    ap.add_argument("--fin", default="data/raw/fin.csv")
+    ap.add_argument("--it", help="IT index table (default data/interim/it_index.<io.format>)")
+    ap.add_argument("--out",
+                    help="result CSV (default grid.out, else reports/tables/spec_grid.csv)")
+    ap.add_argument("--workers", type=int, help="processes (default grid.workers, else 1 = serial)")
+    ap.add_argument("--quantile_eps", type=float, default=0.0,
+                    help="as in compute_ccc; 0 = exact quantiles")
+    ap.add_argument("--chunksize", type=int, default=500_000,
+                    help="rows per chunk when --fin is read chunk by chunk (--quantile_eps > 0)")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load(pathlib.Path(args.config).read_text(encoding="utf-8"))
+    grid = cfg.get("grid", {})
+    ext = "." + cfg.get("io", {}).get("format", "csv")
+    out_path = args.out or grid.get("out", "reports/tables/spec_grid.csv")
+    workers = args.workers or grid.get("workers", 1)
+    axes = grid_axes(cfg)
+    models = grid.get("models", list(MODELS))
+    try:
+        specs = expand_specs(axes, models)
+    except ValueError as e:
+        raise SystemExit(f"[ERR] {e}") from e
+
+    t0 = time.perf_counter()
+    cutoffs = None
+    if args.quantile_eps:
+        # as in compute_ccc: one chunked read with metrics and clipping per chunk
+        fin, cutoffs = read_fin_winsorized(args.fin, args.chunksize, args.quantile_eps)
+    else:
+        fin = read_table(args.fin, dtype=KEY_DTYPES)
+    gscpi = read_table(cfg["paths"]["gscpi_csv"])
+    it = read_table(args.it or f"data/interim/it_index{ext}",
+                    columns=["firm_id", "quarter", "IT_index"], dtype=KEY_DTYPES)
+    t_read = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    base = base_panel(fin, it, gscpi, cutoffs, quantile_eps=args.quantile_eps)
+    t_base = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    tol = grid.get("tol", 1e-10)
+    mediators = axes["mediator"] if "mediation" in models else []
+    try:
+        shared = shared_stages(base, mediators, tol)
+    except ValueError as e:
+        raise SystemExit(f"[ERR] {e}") from e
+    t_fe = time.perf_counter() - t0
+    print(f"[INFO] shared stages: inputs {t_read:.2f}s, "
+          f"base panel {t_base:.2f}s ({len(shared['sample'])} rows), "
+          f"FE codes + demeaning {t_fe:.2f}s")
+
+    shared.update(cov=grid.get("cov", "HC1"), tol=tol, quantile_eps=args.quantile_eps,
+                  custom_events=cfg["paths"].get("custom_events_csv"),
+                  industry_wave_csv=cfg["paths"].get("industry_waves_csv"))
+    t0 = time.perf_counter()
+    out = run_grid(shared, specs, workers)
+    pathlib.Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(out_path, index=False)
+    n_stages = len({stage_key(s) for s in specs})
+    print(f"[OK] {len(specs)} specs ({n_stages} panel stages) on {workers} worker(s) in "
+          f"{time.perf_counter() - t0:.2f}s -> {out_path}")
+
+if __name__ == "__main__":
+    main()
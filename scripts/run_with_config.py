@@ -1,5 +1,11 @@
 
-import argparse, subprocess, sys, yaml, pathlib, shutil
+import argparse
+import pathlib
+import subprocess
+import sys
+
+import yaml
+
 
 def run(cmd: str):
     print(f"[RUN] {cmd}")
@@ -13,6 +19,10 @@ def main():
     args = ap.parse_args()
 
     cfg = yaml.safe_load(pathlib.Path(args.config).read_text(encoding="utf-8"))
+    # Interchange format for intermediate tables (csv | parquet | feather)
+    ext = "." + cfg.get("io", {}).get("format", "csv")
+    it_path = f"data/interim/it_index{ext}"
+    panel = f"data/processed/firm_quarter{ext}"
 
     # 1) Prepare private data -> public schema
     compustat = cfg["paths"]["compustat_csv"]
@@ -24,9 +34,9 @@ def main():
     if cfg.get("run", {}).get("train_it", False):
         labels_csv = cfg["paths"].get("it_labels_csv", "")
         eval_dir = "reports/tables"
-        run(f"python -m src.text.build_it_index --input data/raw/10k --labels_csv {labels_csv} --output data/interim/it_index.csv --eval_dir {eval_dir}")
+        run(f"python -m src.text.build_it_index --input data/raw/10k --labels_csv {labels_csv} --output {it_path} --eval_dir {eval_dir}")
     else:
-        run("python -m src.text.build_it_index --input data/raw/10k --output data/interim/it_index.csv")
+        run(f"python -m src.text.build_it_index --input data/raw/10k --output {it_path}")
 
     # 3) Validate
     gscpi_csv = cfg["paths"]["gscpi_csv"]
@@ -47,17 +57,17 @@ def main():
         waves_csv = cfg["paths"]["industry_waves_csv"]
         iv_args = f"--iv_spec industry_wave --industry_wave_csv {waves_csv}"
 
-    run(f"python -m src.features.compute_ccc --fin data/raw/fin.csv --gscpi {gscpi_csv} --it data/interim/it_index.csv --out data/processed/firm_quarter.csv {treat_args} {iv_args}")
+    run(f"python -m src.features.compute_ccc --fin data/raw/fin.csv --gscpi {gscpi_csv} --it {it_path} --out {panel} {treat_args} {iv_args}")
 
     # 5) Models
-    run("python -m src.models.fe_panel --data data/processed/firm_quarter.csv --out reports/tables/fe_main.csv")
+    run(f"python -m src.models.fe_panel --data {panel} --out reports/tables/fe_main.csv")
     if iv["spec"] == "peer_it_lagK":
-        run('python -m src.models.iv_panel --data data/processed/firm_quarter.csv --endog IT_lag1 --instr IV_peer_IT --out reports/tables/iv_main.txt')
+        run(f'python -m src.models.iv_panel --data {panel} --endog IT_lag1 --instr IV_peer_IT --out reports/tables/iv_main.txt')
     else:
-        run('python -m src.models.iv_panel --data data/processed/firm_quarter.csv --endog IT_lag1 --instr IV_wave --out reports/tables/iv_main.txt')
+        run(f'python -m src.models.iv_panel --data {panel} --endog IT_lag1 --instr IV_wave --out reports/tables/iv_main.txt')
 
-    run("python -m src.models.did_eventstudy --data data/processed/firm_quarter.csv --out reports/tables/did_event.csv --fig reports/figures/eventstudy.png")
-    run("python -m src.models.mediation_statistical --data data/processed/firm_quarter.csv --out reports/tables/mediation.csv")
+    run(f"python -m src.models.did_eventstudy --data {panel} --out reports/tables/did_event.csv --fig reports/figures/eventstudy.png")
+    run(f"python -m src.models.mediation_statistical --data {panel} --out reports/tables/mediation.csv")
 
     print('[OK] All done. See reports/ for outputs.')
 
@@ -1,27 +1,41 @@
 
-import argparse, pandas as pd
-from pathlib import Path
+import argparse
+import numpy as np
+import pandas as pd
+from src.utils.io import read_table, write_table
+from src.utils.panel import Panel
 
 def main():
     ap = argparse.ArgumentParser(description="Derive industry adoption waves from IT_index percentiles")
-    ap.add_argument("--it_csv", default="data/interim/it_index.csv")
+    ap.add_argument("--it_csv", default="data/interim/it_index.csv", help="IT index table (.csv/.parquet/.feather)")
     ap.add_argument("--industry_map_csv", help="optional CSV with firm_id,industry; if it_csv already has 'industry' column, not needed")
     ap.add_argument("--out", default="data/raw/external/industry_waves.csv")
     ap.add_argument("--percentile", type=float, default=0.6, help="threshold on industry-quarter median IT_index to switch wave to 1")
     args = ap.parse_args()
 
-    it = pd.read_csv(args.it_csv)
+    it = read_table(args.it_csv, columns=["firm_id","quarter","IT_index"], optional=["industry"])
     if "industry" not in it.columns:
         if not args.industry_map_csv:
             raise SystemExit("Need industry info via --industry_map_csv or include 'industry' column in it_csv")
-        ind = pd.read_csv(args.industry_map_csv)
+        ind = read_table(args.industry_map_csv)
         it = it.merge(ind, on="firm_id", how="left")
 
-    g = it.groupby(["industry","quarter"])["IT_index"].median().reset_index(name="med_it")
-    thr = g.groupby("industry")["med_it"].transform(lambda s: s.quantile(args.percentile))
-    g["wave"] = (g["med_it"] >= thr).astype(int)
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    g[["industry","quarter","wave"]].to_csv(args.out, index=False)
+    try:
+        panel = Panel.from_frame(it, ["IT_index"])
+    except ValueError as e:
+        raise SystemExit(f"IT index is not a firm-quarter panel: {e}")
+    ind, industries = panel.codes(it["industry"])
+    # industry x quarter median IT, then each industry's percentile over its quarters
+    med = panel.group_reduce("IT_index", ind, "median")
+    with np.errstate(invalid="ignore"):
+        thr = np.nanquantile(med, args.percentile, axis=1, keepdims=True) if med.size else med
+        wave = (med >= thr).astype(int)
+    present = np.zeros(med.shape, dtype=bool)  # industry-quarter cells with at least one firm row
+    has = ind >= 0
+    present[ind[has], np.nonzero(has)[1]] = True
+    gi, qi = np.nonzero(present)
+    g = pd.DataFrame({"industry": industries[gi], "quarter": panel.quarter_labels[qi], "wave": wave[gi, qi]})
+    write_table(g[["industry","quarter","wave"]], args.out)
     print(f"[OK] Wrote {len(g)} rows -> {args.out}")
 
 if __name__ == "__main__":
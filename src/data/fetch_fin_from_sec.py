@@ -1,12 +1,19 @@
 
-import argparse, sys, time, json, re, math
+import argparse, asyncio, hashlib, sys, time, json, re, math
 from pathlib import Path
 from typing import List, Dict, Optional
+import numpy as np
 import pandas as pd
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 UA = "YourName-YourOrg-Contact@example.com"  # replace with your email per SEC API guidance
+BASE_URL = "https://data.sec.gov"
+TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+SEC_MAX_RPS = 10  # SEC fair-access limit: at most 10 requests/second
+RETRY_STATUS = (429, 503)  # rate limited / temporarily unavailable: wait and retry
 
 FACT_TAGS = {
     "sales": ["SalesRevenueNet", "Revenues"],
@@ -20,76 +27,270 @@ def to_quarter(dt: str) -> str:
     d = pd.to_datetime(dt)
     return f"{d.year}Q{((d.month-1)//3)+1}"
 
-def get_cik_for_ticker(ticker: str) -> Optional[str]:
-    # Use SEC submissions endpoint (no key) to resolve ticker to CIK
-    url = f"https://data.sec.gov/submissions/CIK0000000000.json"  # placeholder to check format
-    # We will instead use the "tickers" list JSON
-    resp = requests.get("https://www.sec.gov/files/company_tickers.json", headers={"User-Agent": UA}, timeout=30)
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate, self.capacity = rate, capacity
+        self.tokens = capacity
+        self.t = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.rate)
+                self.t = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HttpCache:
+    """On-disk response cache revalidated with ETag / Last-Modified (304 => reuse stored body)."""
+
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.dir / f"{key}.body", self.dir / f"{key}.meta.json"
+
+    def conditional_headers(self, url) -> dict:
+        body, meta = self._paths(url)
+        if not (body.exists() and meta.exists()):
+            return {}
+        m = json.loads(meta.read_text(encoding="utf-8"))
+        h = {}
+        if m.get("etag"):
+            h["If-None-Match"] = m["etag"]
+        if m.get("last_modified"):
+            h["If-Modified-Since"] = m["last_modified"]
+        return h
+
+    def load(self, url) -> bytes:
+        return self._paths(url)[0].read_bytes()
+
+    def store(self, url, content: bytes, headers) -> None:
+        body, meta = self._paths(url)
+        body.write_bytes(content)
+        meta.write_text(json.dumps({"url": url, "etag": headers.get("ETag"),
+                                    "last_modified": headers.get("Last-Modified")}), encoding="utf-8")
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    # One pooled session (keep-alive connections) shared by all requests
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers["User-Agent"] = UA
+    return s
+
+def get_json(url: str, session=None, cache: Optional[HttpCache] = None, timeout: int = 60):
+    # Returns (parsed JSON, "fetched" | "not_modified")
+    session = session or make_session(1)
+    headers = cache.conditional_headers(url) if cache else {}
+    resp = session.get(url, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and cache:
+        return json.loads(cache.load(url)), "not_modified"
     resp.raise_for_status()
-    data = resp.json()
-    for _, row in data.items():
-        if row.get("ticker","").upper() == ticker.upper():
-            cik = str(row["cik_str"]).zfill(10)
-            return cik
-    return None
-
-def pick_facts(cfacts: dict, tags: List[str]) -> List[dict]:
-    # Return all fact entries across provided tags
-    out = []
-    facts = cfacts.get("facts", {}).get("us-gaap", {})
-    for tag in tags:
-        if tag in facts:
-            for uom, arr in facts[tag].get("units", {}).items():
-                for item in arr:
-                    # item has "start", "end" (for duration), or only "end" (for instant), and "val"
-                    out.append({"tag": tag, "uom": uom, **item})
-    return out
+    if cache:
+        cache.store(url, resp.content, resp.headers)
+    return resp.json(), "fetched"
+
+def retry_wait(exc, attempt: int, backoff: float = 1.0) -> Optional[float]:
+    # Seconds to wait before retrying after a 429/503 (Retry-After, else exponential backoff); None = give up
+    resp = getattr(exc, "response", None)
+    if resp is None or resp.status_code not in RETRY_STATUS:
+        return None
+    ra = resp.headers.get("Retry-After")
+    if ra:
+        try:
+            return max(float(ra), 0.0)
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(ra)
+        except (TypeError, ValueError):
+            when = None
+        if when is not None:
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    return backoff * 2 ** attempt
+
+def load_ticker_map(session=None, cache: Optional[HttpCache] = None, url: str = TICKERS_URL) -> Dict[str, str]:
+    # ticker (upper case) -> 10-digit CIK, from one download of the SEC tickers list
+    data, _ = get_json(url, session=session, cache=cache, timeout=30)
+    return {row.get("ticker", "").upper(): str(row["cik_str"]).zfill(10) for row in data.values()}
 
-def best_unit(rows: List[dict]) -> str:
-    # prefer USD
-    uoms = [r["uom"] for r in rows]
+_TICKER_MAP = None
+
+def get_cik_for_ticker(ticker: str, ticker_map: Optional[Dict[str, str]] = None) -> Optional[str]:
+    # Resolve ticker to CIK; the SEC tickers list is loaded once per process unless a map is passed
+    global _TICKER_MAP
+    if ticker_map is None:
+        if _TICKER_MAP is None:
+            _TICKER_MAP = load_ticker_map()
+        ticker_map = _TICKER_MAP
+    return ticker_map.get(ticker.upper())
+
+def best_unit(uoms: List[str]) -> str:
+    # prefer USD, else the first unit reported
     if "USD" in uoms: return "USD"
     return uoms[0] if uoms else "USD"
 
-def build_fin_for_cik(cik: str) -> pd.DataFrame:
-    url = f"https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
-    cf = requests.get(url, headers={"User-Agent": UA}, timeout=60).json()
-    series = {}
-    for k, tags in FACT_TAGS.items():
-        rows = pick_facts(cf, tags)
-        if not rows:
-            continue
-        u = best_unit(rows)
-        rows = [r for r in rows if r["uom"] == u]
-        # Build quarter series
-        recs = []
-        for r in rows:
-            end = r.get("end")
-            if not end:  # skip if no end
-                continue
-            q = to_quarter(end)
-            val = r.get("val")
-            # Keep last filed per quarter
-            recs.append({"quarter": q, "val": val, "filed": r.get("filed","") , "accn": r.get("accn","")})
-        s = pd.DataFrame(recs).sort_values(["quarter","filed"]).groupby("quarter", as_index=False).last()
-        series[k] = s[["quarter","val"]].rename(columns={"val": k})
-
-    # Merge series on quarter
-    fin = None
-    for k, s in series.items():
-        fin = s if fin is None else fin.merge(s, on="quarter", how="outer")
-    if fin is None:
+def companyfacts_url(cik: str, base_url: str = BASE_URL) -> str:
+    return f"{base_url.rstrip('/')}/api/xbrl/companyfacts/CIK{cik}.json"
+
+def build_fin_for_cik(cik: str, session=None, cache: Optional[HttpCache] = None, base_url: str = BASE_URL) -> pd.DataFrame:
+    cf, _ = get_json(companyfacts_url(cik, base_url), session=session, cache=cache)
+    return fin_from_companyfacts(cf, cik)
+
+FACT_COLS = ["end", "val", "filed"]
+
+def _metric_facts(facts: dict, tags: List[str]) -> pd.DataFrame:
+    # All entries of a metric's tags in its best_unit as one columnar frame
+    parts = [(uom, arr) for tag in tags if tag in facts
+             for uom, arr in facts[tag].get("units", {}).items() if arr]
+    if not parts:
+        return pd.DataFrame(columns=FACT_COLS)
+    u = best_unit([uom for uom, _ in parts])
+    frames = [pd.DataFrame.from_records(arr, columns=FACT_COLS) for uom, arr in parts if uom == u]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return df[df["end"].notna() & (df["end"] != "")]  # skip if no end
+
+def fin_from_companyfacts(cf: dict, cik: str) -> pd.DataFrame:
+    # quarter x metric table from one companyfacts JSON document
+    facts = cf.get("facts", {}).get("us-gaap", {})
+    per = {k: _metric_facts(facts, tags) for k, tags in FACT_TAGS.items()}
+    per = {k: df for k, df in per.items() if len(df)}
+    if not per:
         return pd.DataFrame()
+    keys = list(per)
+    long = pd.DataFrame({
+        "metric": np.repeat(np.arange(len(keys)), [len(per[k]) for k in keys]),
+        "end": np.concatenate([per[k]["end"].to_numpy(dtype=object) for k in keys]),
+        "filed": np.concatenate([per[k]["filed"].fillna("").to_numpy(dtype=object) for k in keys]),
+        "pos": np.concatenate([np.arange(len(per[k])) for k in keys]),
+        "has_val": np.concatenate([per[k]["val"].notna().to_numpy() for k in keys]),
+    })
+    # integer quarter code year*4+q-1 sorts like the "YYYYQn" label; labels are built for unique codes only
+    d = pd.to_datetime(long["end"], format="ISO8601")
+    long["quarter"] = d.dt.year.to_numpy() * 4 + d.dt.quarter.to_numpy() - 1
+    # Keep last filed per quarter (last non-null value, as groupby.last did), all metrics in one pass
+    long = long.sort_values(["metric", "quarter", "filed"], kind="stable")
+    last = long[long["has_val"]].groupby(["metric", "quarter"], sort=False)["pos"].last()
+    quarters = long.groupby("metric", sort=False)["quarter"].unique()
+
+    # Gather from each metric's own val column so int/float dtypes match the per-metric merge
+    cols = {}
+    for m, k in enumerate(keys):
+        vals = per[k]["val"]
+        pos = last[m] if m in last.index.get_level_values(0) else pd.Series(dtype=int)
+        s = pd.Series(vals.to_numpy()[pos.to_numpy()], index=pos.index, name=k)
+        cols[k] = s.reindex(quarters[m]) if len(s) < len(quarters[m]) else s
+    fin = pd.concat(cols.values(), axis=1, join="outer").sort_index()
+    fin.index = [f"{c // 4}Q{c % 4 + 1}" for c in fin.index]
+    fin = fin.rename_axis("quarter").reset_index()
     fin["cik"] = cik
     return fin
 
+FIN_COLS = ["firm_id","quarter","sales","cogs","inventory","receivables","payables"]
+
+def finalize_fin(rows, industry_map_csv: Optional[str] = None) -> pd.DataFrame:
+    # per-firm frames (with firm_id) -> fin.csv schema
+    fin = pd.concat(rows, ignore_index=True)
+    # Reorder and add industry if provided
+    for c in FIN_COLS:
+        if c not in fin.columns: fin[c] = None
+    fin = fin[FIN_COLS]
+
+    if industry_map_csv:
+        im = pd.read_csv(industry_map_csv)
+        fin = fin.merge(im[["cik","industry"]].rename(columns={"cik":"firm_id"}), on="firm_id", how="left")
+    else:
+        fin["industry"] = None
+    return fin
+
+def write_fin(fin: pd.DataFrame, out: str) -> None:
+    Path(out).parent.mkdir(parents=True, exist_ok=True)
+    if Path(out).suffix == ".parquet":
+        fin.to_parquet(out, index=False)
+    else:
+        fin.to_csv(out, index=False)
+
+async def fetch_all_async(ciks, base_url: str = BASE_URL, rate: float = 8.0, concurrency: int = 8,
+                          cache: Optional[HttpCache] = None, session=None, retries: int = 3, backoff: float = 1.0):
+    """Fetch companyfacts for many CIKs concurrently under a global requests/second budget.
+
+    Blocking HTTP runs on worker threads over one pooled session; the token bucket spaces
+    request starts so the SEC limit holds regardless of concurrency. A 429/503 is retried up
+    to `retries` times after its Retry-After (or exponential backoff), each retry taking a
+    new token. Any other failure of one CIK, in the request or in parsing its document, is
+    recorded for that CIK and the others carry on. Returns a list of (cik, DataFrame or
+    None, status) in input order, status in fetched/not_modified/error:<msg>.
+    """
+    session = session or make_session(concurrency)
+    bucket = TokenBucket(rate)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(cik):
+        async with sem:
+            for attempt in range(retries + 1):
+                await bucket.acquire()
+                try:
+                    cf, status = await asyncio.to_thread(get_json, companyfacts_url(cik, base_url), session, cache)
+                    return cik, fin_from_companyfacts(cf, cik), status
+                except Exception as e:
+                    wait = retry_wait(e, attempt, backoff) if attempt < retries else None
+                    if wait is None:
+                        return cik, None, f"error:{type(e).__name__}: {e}"
+                await asyncio.sleep(wait)
+
+    return await asyncio.gather(*(one(c) for c in ciks))
+
+def fetch_all(ciks, mode: str = "async", base_url: str = BASE_URL, rate: float = 8.0, concurrency: int = 8,
+              cache: Optional[HttpCache] = None, session=None, retries: int = 3, backoff: float = 1.0):
+    if mode == "async":
+        return asyncio.run(fetch_all_async(ciks, base_url, rate, concurrency, cache, session, retries, backoff))
+    session = session or make_session(1)
+    out = []
+    for cik in ciks:
+        for attempt in range(retries + 1):
+            try:
+                cf, status = get_json(companyfacts_url(cik, base_url), session, cache)
+                out.append((cik, fin_from_companyfacts(cf, cik), status))
+                break
+            except Exception as e:
+                wait = retry_wait(e, attempt, backoff) if attempt < retries else None
+                if wait is None:
+                    out.append((cik, None, f"error:{type(e).__name__}: {e}"))
+                    break
+                time.sleep(wait)
+        time.sleep(1.0 / rate)  # be gentle
+    return out
+
 def main():
     ap = argparse.ArgumentParser(description="Fetch quarterly fin.csv from SEC companyfacts API")
     ap.add_argument("--tickers_csv", help="CSV with column 'ticker' (alternatively use --ciks_csv)")
     ap.add_argument("--ciks_csv", help="CSV with column 'cik' (10-digit, leading zeros allowed)")
-    ap.add_argument("--out", required=True, help="output CSV path, e.g., data/raw/fin.csv")
+    ap.add_argument("--out", required=True, help="output CSV (or .parquet) path, e.g., data/raw/fin.csv")
     ap.add_argument("--industry_map_csv", help="optional CSV with columns cik,industry")
+    ap.add_argument("--mode", choices=["serial", "async"], default="async", help="sequential or concurrent fetching")
+    ap.add_argument("--concurrency", type=int, default=8, help="requests in flight (async mode); also the connection pool size")
+    ap.add_argument("--rate", type=float, default=8.0, help=f"max requests/second (SEC allows {SEC_MAX_RPS})")
+    ap.add_argument("--retries", type=int, default=3,
+                    help="retries of a CIK answered with 429/503, after Retry-After or exponential backoff")
+    ap.add_argument("--http_cache", default="data/interim/sec_cache",
+                    help="disk cache revalidated with ETag/Last-Modified; '' disables")
+    ap.add_argument("--base_url", default=BASE_URL, help="companyfacts API root (override for testing/mirrors)")
+    ap.add_argument("--tickers_url", default=TICKERS_URL)
     args = ap.parse_args()
+    if args.rate > SEC_MAX_RPS:
+        print(f"[WARN] --rate {args.rate} exceeds the SEC limit of {SEC_MAX_RPS} requests/second")
 
     if not args.tickers_csv and not args.ciks_csv:
         sys.exit("Provide --tickers_csv or --ciks_csv")
@@ -105,44 +306,46 @@ def main():
         cdf = pd.read_csv(args.ciks_csv)
         ciks = [str(c).zfill(10) for c in cdf["cik"].dropna().astype(int).tolist()]
 
-    # Resolve tickers to CIKs
-    for t in tickers:
-        cik = get_cik_for_ticker(t)
-        if cik:
-            ciks.append(cik)
-        else:
-            print(f"[WARN] Ticker {t} not found in SEC tickers list.")
-
-    rows = []
-    for cik in sorted(set(ciks)):
-        print(f"[INFO] Fetching companyfacts for CIK {cik}")
-        df = build_fin_for_cik(cik)
+    cache = HttpCache(args.http_cache) if args.http_cache else None
+    session = make_session(max(args.concurrency, 1))
+
+    # Resolve tickers to CIKs (tickers list downloaded once)
+    if tickers:
+        ticker_map = load_ticker_map(session, cache, args.tickers_url)
+        for t in tickers:
+            cik = get_cik_for_ticker(t, ticker_map)
+            if cik:
+                ciks.append(cik)
+            else:
+                print(f"[WARN] Ticker {t} not found in SEC tickers list.")
+
+    todo = sorted(set(ciks))
+    print(f"[INFO] Fetching companyfacts for {len(todo)} CIKs ({args.mode}, {args.rate:g} req/s)")
+    t0 = time.perf_counter()
+    results = fetch_all(todo, args.mode, args.base_url, args.rate, args.concurrency, cache, session,
+                        args.retries)
+    secs = time.perf_counter() - t0
+
+    rows, counts = [], {"fetched": 0, "not_modified": 0, "error": 0}
+    for cik, df, status in results:
+        if df is None:
+            counts["error"] += 1
+            print(f"[WARN] {cik}: {status[len('error:'):]}")
+            continue
+        counts[status] += 1
         if df.empty:
             print(f"[WARN] No facts for {cik}")
             continue
         df["firm_id"] = cik  # use CIK as firm_id
         rows.append(df)
-
-        time.sleep(0.2)  # be gentle
+    print(f"[INFO] {counts['fetched']} fetched, {counts['not_modified']} unchanged (cache), "
+          f"{counts['error']} failed in {secs:.1f}s")
 
     if not rows:
         sys.exit("No data fetched.")
 
-    fin = pd.concat(rows, ignore_index=True)
-    # Reorder and add industry if provided
-    cols = ["firm_id","quarter","sales","cogs","inventory","receivables","payables"]
-    for c in cols:
-        if c not in fin.columns: fin[c] = None
-    fin = fin[cols]
-
-    if args.industry_map_csv:
-        im = pd.read_csv(args.industry_map_csv)
-        fin = fin.merge(im[["cik","industry"]].rename(columns={"cik":"firm_id"}), on="firm_id", how="left")
-    else:
-        fin["industry"] = None
-
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    fin.to_csv(args.out, index=False)
+    fin = finalize_fin(rows, args.industry_map_csv)
+    write_fin(fin, args.out)
     print(f"[OK] Wrote {len(fin)} rows -> {args.out}")
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+import argparse, json, os, re, sys, time, zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+from src.data.fetch_fin_from_sec import fin_from_companyfacts, finalize_fin, write_fin
+
+# Bulk archive: https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip (one CIK##########.json per filer)
+MEMBER_RE = re.compile(r"CIK(\d{10})\.json$")
+_ZIP = None  # per-worker archive handle
+
+def _open_zip(zip_path: str):
+    global _ZIP
+    _ZIP = zipfile.ZipFile(zip_path)
+
+def _close_zip():
+    global _ZIP
+    if _ZIP is not None:
+        _ZIP.close()
+        _ZIP = None
+
+def list_members(zf: zipfile.ZipFile, ciks=None):
+    # [(member name, cik)] optionally restricted to a CIK set; sorted by CIK like the online path
+    want = set(ciks) if ciks else None
+    out = []
+    for info in zf.infolist():
+        m = MEMBER_RE.search(info.filename)
+        if m and (want is None or m.group(1) in want):
+            out.append((info.filename, m.group(1), info.file_size))
+    return sorted(out, key=lambda r: r[1])
+
+def read_member(zf: zipfile.ZipFile, name: str, cik: str) -> pd.DataFrame:
+    # decompress straight into the JSON parser; nothing is extracted to disk
+    with zf.open(name) as f:
+        cf = json.load(f)
+    return fin_from_companyfacts(cf, cik)
+
+def _ingest_batch(batch):
+    # a member that fails to read or parse (bad JSON, unexpected structure) is reported, not fatal
+    frames, bad = [], []
+    for name, cik, _ in batch:
+        try:
+            df = read_member(_ZIP, name, cik)
+        except Exception as e:
+            bad.append((cik, f"{type(e).__name__}: {e}"))
+            continue
+        if not df.empty:
+            df["firm_id"] = cik  # use CIK as firm_id
+            frames.append(df)
+    return frames, bad
+
+def _batches(members, target_bytes: int):
+    # group members into ~target_bytes of uncompressed JSON so IPC overhead stays small
+    batch, size = [], 0
+    for m in members:
+        batch.append(m)
+        size += m[2]
+        if size >= target_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+def ingest_zip(zip_path, ciks=None, workers: int = 1, batch_mb: float = 64.0):
+    """Quarterly fin frames for every (or every requested) filer in a companyfacts.zip.
+
+    Returns (list of per-firm frames in CIK order, [(cik, error)], members read, uncompressed bytes).
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        members = list_members(zf, ciks)
+    batches = list(_batches(members, int(batch_mb * 1e6)))
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_zip, initargs=(str(zip_path),)) as ex:
+            results = list(ex.map(_ingest_batch, batches))
+    else:
+        _open_zip(str(zip_path))
+        try:
+            results = [_ingest_batch(b) for b in batches]
+        finally:
+            _close_zip()
+    frames = [df for fr, _ in results for df in fr]
+    bad = [e for _, b in results for e in b]
+    return frames, bad, len(members), sum(m[2] for m in members)
+
+def main():
+    ap = argparse.ArgumentParser(description="Build quarterly fin.csv from a local SEC companyfacts.zip (offline bulk path)")
+    ap.add_argument("--zip", required=True, help="path to companyfacts.zip")
+    ap.add_argument("--out", required=True, help="output CSV (or .parquet) path, e.g., data/raw/fin.csv")
+    ap.add_argument("--ciks_csv", help="optional CSV with column 'cik' to restrict the filers read")
+    ap.add_argument("--industry_map_csv", help="optional CSV with columns cik,industry")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parsing processes (1 = serial)")
+    ap.add_argument("--batch_mb", type=float, default=64.0, help="uncompressed JSON per worker task")
+    args = ap.parse_args()
+
+    ciks = None
+    if args.ciks_csv:
+        cdf = pd.read_csv(args.ciks_csv)
+        ciks = [str(c).zfill(10) for c in cdf["cik"].dropna().astype(int).tolist()]
+
+    t0 = time.perf_counter()
+    frames, bad, n, nbytes = ingest_zip(args.zip, ciks, args.workers, args.batch_mb)
+    secs = time.perf_counter() - t0
+    for cik, err in bad:
+        print(f"[WARN] {cik}: {err}")
+    print(f"[INFO] Parsed {n} filers ({nbytes / 1e6:.0f} MB JSON) in {secs:.1f}s with {args.workers} workers; "
+          f"{len(frames)} with facts")
+    if not frames:
+        sys.exit("No data found in archive.")
+
+    fin = finalize_fin(frames, args.industry_map_csv)
+    write_fin(fin, args.out)
+    print(f"[OK] Wrote {len(fin)} rows -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
-
-import argparse, re
+import argparse, csv, json, os, re, time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from src.text.cache import hash_file
+from src.text.sections import extract_sections, parse_sections
+
+MANIFEST = ".prepare_manifest.json"
+WS_RE = re.compile(r'\s+')
 
 def guess_firm_year(name: str):
     # Accept patterns like firm123_2020.* or 2020_firm123.*
@@ -21,27 +26,168 @@ def clean_text(s: str) -> str:
     s = re.sub(r'\s+', ' ', s).strip()
     return s
 
+class TagStripper:
+    """Chunked equivalent of clean_text: feed() pieces of a document, then close().
+
+    A tag is '<' + at least one non-'>' char + '>', as in clean_text; an open '<' is carried
+    over to the next chunk until its '>' shows up (or the document ends and it stays literal).
+    Whitespace runs collapse across chunk boundaries and the ends are stripped.
+    """
+
+    def __init__(self):
+        self.carry = ""
+        self.space = False
+        self.started = False
+
+    def _squash(self, s: str) -> str:
+        s = WS_RE.sub(" ", s)
+        if s.startswith(" "):
+            self.space, s = True, s[1:]
+        if not s:
+            return ""
+        lead = " " if self.space and self.started else ""
+        self.space = s.endswith(" ")
+        self.started = True
+        return lead + (s[:-1] if self.space else s)
+
+    def feed(self, chunk: str) -> str:
+        data, self.carry = self.carry + chunk, ""
+        out, pos = [], 0
+        while True:
+            i = data.find("<", pos)
+            if i < 0:
+                out.append(data[pos:])
+                break
+            j = data.find(">", i + 1)
+            if j < 0:
+                out.append(data[pos:i])
+                self.carry = data[i:]
+                break
+            out.append(data[pos:i])
+            if j == i + 1:  # "<>" is not a tag
+                out.append("<")
+                pos = i + 1
+            else:
+                out.append(" ")
+                pos = j + 1
+        return self._squash("".join(out))
+
+    def close(self) -> str:
+        # unterminated '<...' at end of document is literal text
+        data, self.carry = self.carry, ""
+        return self._squash(data)
+
+def convert_file(src: str, dst: str, sections=None, chunk_chars: int = 1 << 20):
+    # Stream src through TagStripper into dst (via a temp file); returns (bytes read, section spans)
+    tmp = Path(dst).with_suffix(".tmp")
+    stripper = TagStripper()
+    spans = None
+    with open(src, "r", encoding="utf-8", errors="ignore") as fin:
+        if sections:
+            # sections need the whole cleaned filing (already much smaller than the raw HTML)
+            parts = [stripper.feed(chunk) for chunk in iter(lambda: fin.read(chunk_chars), "")]
+            text, spans = extract_sections("".join(parts) + stripper.close(), sections)
+            tmp.write_text(text, encoding="utf-8")
+        else:
+            with open(tmp, "w", encoding="utf-8") as fout:
+                for chunk in iter(lambda: fin.read(chunk_chars), ""):
+                    fout.write(stripper.feed(chunk))
+                fout.write(stripper.close())
+    os.replace(tmp, dst)
+    return os.path.getsize(src), spans
+
+def _convert_job(job):
+    name, src, dst, sections, chunk_chars = job
+    try:
+        nbytes, spans = convert_file(src, dst, sections, chunk_chars)
+    except Exception:
+        # unreadable/binary: skip
+        return name, None
+    st = os.stat(src)
+    return name, {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": hash_file(src), "out": Path(dst).name,
+                  "sections": list(sections) if sections else None, "spans": spans, "bytes": nbytes}
+
+def load_manifest(out_dir: Path) -> dict:
+    p = out_dir / MANIFEST
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+def is_unchanged(entry, p: Path, out_dir: Path, sections) -> bool:
+    # size+mtime match is trusted; on an mtime-only change the content hash decides
+    if not entry or not (out_dir / entry["out"]).exists():
+        return False
+    if entry.get("sections") != (list(sections) if sections else None):
+        return False
+    st = p.stat()
+    if st.st_size != entry["size"]:
+        return False
+    if st.st_mtime_ns == entry["mtime_ns"]:
+        return True
+    if hash_file(p) == entry["hash"]:
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+    return False
+
 def main():
     ap = argparse.ArgumentParser(description="Convert local 10-K files to plain text for IT index")
     ap.add_argument("--input_dir", required=True, help="folder with raw 10-K files (.txt/.html/.htm/pdf-text)")
     ap.add_argument("--out_dir", required=True, help="output folder (data/raw/10k)")
+    ap.add_argument("--sections", help="comma list of 10-K items to keep, e.g. 1,7; offsets go to <out_dir>/sections_index.csv")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="conversion processes (1 = serial)")
+    ap.add_argument("--chunk_chars", type=int, default=1 << 20, help="characters per streamed chunk")
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and convert every file")
     args = ap.parse_args()
+    sections = parse_sections(args.sections)
 
     in_dir = Path(args.input_dir)
     out_dir = Path(args.out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if args.force else load_manifest(out_dir)
 
-    count = 0
-    for p in in_dir.glob("*.*"):
-        try:
-            text = p.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            # binary: skip
-            continue
+    # One source per output name (sorted, last wins) so parallel workers never write the same file
+    targets = {}
+    for p in sorted(in_dir.glob("*.*")):
         firm, year = guess_firm_year(p.name)
-        out_name = f"{firm}_{year}.txt"
-        out_path = out_dir / out_name
-        out_path.write_text(clean_text(text), encoding="utf-8")
+        targets[f"{firm}_{year}.txt"] = p
+    jobs, skipped = [], 0
+    for out_name, p in targets.items():
+        if is_unchanged(manifest.get(p.name), p, out_dir, sections):
+            skipped += 1
+            continue
+        jobs.append((p.name, str(p), str(out_dir / out_name), sections, args.chunk_chars))
+
+    t0 = time.perf_counter()
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(_convert_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))))
+    else:
+        results = [_convert_job(j) for j in jobs]
+    secs = time.perf_counter() - t0
+
+    count, nbytes = 0, 0
+    for name, entry in results:
+        if entry is None:
+            manifest.pop(name, None)
+            continue
+        nbytes += entry.pop("bytes")
+        manifest[name] = entry
         count += 1
+    live = {p.name for p in targets.values()}
+    manifest = {k: v for k, v in manifest.items() if k in live}
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=0, sort_keys=True), encoding="utf-8")
+
+    if sections:
+        spans_rows, whole = [], 0
+        for name, entry in sorted(manifest.items()):
+            firm, year = guess_firm_year(name)
+            spans_rows += [(firm, year, item, s, e) for item, s, e in entry["spans"] or []]
+            whole += not entry["spans"]
+        with open(out_dir / "sections_index.csv", "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["firm_id", "year", "item", "start", "end"])
+            w.writerows(spans_rows)
+        print(f"[INFO] Sections {','.join(sections)}: {len(spans_rows)} spans indexed; {whole} files without item headers kept whole")
+    mbs = nbytes / 1e6 / secs if secs > 0 else float("nan")
+    print(f"[INFO] Converted {nbytes / 1e6:.1f} MB in {secs:.2f}s ({mbs:.1f} MB/s, {args.workers} workers); "
+          f"skipped {skipped} unchanged")
     print(f"Wrote {count} cleaned 10-K text files to {out_dir}")
 
 if __name__ == "__main__":
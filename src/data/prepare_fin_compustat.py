@@ -1,17 +1,61 @@
-
-import argparse
+import argparse, time
+from pathlib import Path
 import pandas as pd
 
-def to_quarter_str(dt):
-    if not isinstance(dt, pd.Timestamp):
-        dt = pd.to_datetime(dt)
-    q = ((dt.month-1)//3)+1
-    return f"{dt.year}Q{q}"
+FLOWS = ["sales", "cogs"]
+STOCKS = ["inventory", "receivables", "payables"]
+# Aggregate duplicates within firm_id-quarter by summing flows and taking last stocks;
+# both are associative, so per-chunk partials can be re-aggregated with the same rule
+AGG = {**{c: "sum" for c in FLOWS}, **{c: "last" for c in STOCKS}, "industry": "last"}
+
+def quarter_codes(dates: pd.Series) -> pd.Series:
+    # vectorized year*4 + (q-1); sorts like the "YYYYQn" label
+    d = pd.to_datetime(dates)
+    return d.dt.year * 4 + d.dt.quarter - 1
+
+def quarter_labels(codes: pd.Series) -> pd.Series:
+    return (codes // 4).astype(str) + "Q" + (codes % 4 + 1).astype(str)
+
+def read_fundq(path: str, col_map: dict, industry_col: str = None, chunksize: int = 500_000):
+    """Firm-quarter aggregates from a FUNDQ CSV, read in typed chunks of only the needed columns.
+
+    col_map maps fin.csv names (firm_id, quarter, sales, ...) to export headers. Returns
+    (frame with integer quarter codes, rows read).
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in col_map.values() if c not in header]
+    if missing:
+        raise ValueError(f"Missing columns in input: {missing}")
+    names = dict(col_map)
+    if industry_col and industry_col in header:
+        names["industry"] = industry_col
+    rename = {v: k for k, v in names.items()}
+    dtypes = {names["firm_id"]: str, names["quarter"]: str, **{names[c]: "float64" for c in FLOWS + STOCKS}}
+    if "industry" in names:
+        dtypes[names["industry"]] = str
+
+    parts, nrows = [], 0
+    for chunk in pd.read_csv(path, usecols=list(names.values()), dtype=dtypes, chunksize=chunksize):
+        nrows += len(chunk)
+        chunk = chunk.rename(columns=rename)
+        if "industry" not in chunk:
+            chunk["industry"] = None
+        # Drop rows with any essential NaNs (you may relax this)
+        chunk = chunk.dropna(subset=FLOWS + STOCKS)
+        chunk["quarter"] = quarter_codes(chunk["quarter"])
+        parts.append(chunk.groupby(["firm_id", "quarter"], as_index=False).agg(AGG))
+    if not parts:
+        return pd.DataFrame(columns=["firm_id", "quarter", *FLOWS, *STOCKS, "industry"]), nrows
+    df = pd.concat(parts, ignore_index=True)
+    if len(parts) > 1:
+        # firm-quarters split across chunk boundaries: merge partials in file order
+        df = df.groupby(["firm_id", "quarter"], as_index=False).agg(AGG)
+    return df, nrows
 
 def main():
     ap = argparse.ArgumentParser(description="Convert Compustat FUNDQ export -> data/raw/fin.csv schema")
     ap.add_argument("--input", required=True, help="Compustat FUNDQ CSV")
-    ap.add_argument("--out", required=True, help="output CSV path (data/raw/fin.csv)")
+    ap.add_argument("--out", required=True, help="output CSV path (data/raw/fin.csv); .parquet writes Parquet")
     # column names (override if your export uses different headers)
     ap.add_argument("--firm_id_col", default="gvkey")
     ap.add_argument("--date_col", default="datadate")
@@ -21,16 +65,12 @@ def main():
     ap.add_argument("--receivables_col", default="rectq")
     ap.add_argument("--payables_col", default="apq")
     ap.add_argument("--industry_col", default="naics", help="optional; will be included if present")
+    ap.add_argument("--chunksize", type=int, default=500_000, help="rows per CSV chunk")
+    ap.add_argument("--partition_by_year", action="store_true",
+                    help="write --out as a Parquet dataset directory partitioned by year=YYYY")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.input, low_memory=False)
-    cols = [args.firm_id_col, args.date_col, args.sales_col, args.cogs_col,
-            args.inventory_col, args.receivables_col, args.payables_col]
-    missing = [c for c in cols if c not in df.columns]
-    if missing:
-        raise SystemExit(f"Missing columns in input: {missing}")
-
-    out_cols = {
+    col_map = {
         "firm_id": args.firm_id_col,
         "quarter": args.date_col,
         "sales": args.sales_col,
@@ -39,27 +79,24 @@ def main():
         "receivables": args.receivables_col,
         "payables": args.payables_col,
     }
-    out = df.rename(columns=out_cols)[list(out_cols.keys())].copy()
-    # Quarter string
-    out["quarter"] = pd.to_datetime(out["quarter"]).apply(to_quarter_str)
+    t0 = time.perf_counter()
+    try:
+        flows, nrows = read_fundq(args.input, col_map, args.industry_col, args.chunksize)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    year = flows["quarter"] // 4
+    flows["quarter"] = quarter_labels(flows["quarter"])
+    secs = time.perf_counter() - t0
 
-    # Optional industry
-    if args.industry_col in df.columns:
-        out["industry"] = df[args.industry_col].astype(str)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    if args.partition_by_year:
+        flows.assign(year=year).to_parquet(args.out, partition_cols=["year"], index=False,
+                                          existing_data_behavior="delete_matching")
+    elif args.out.endswith(".parquet"):
+        flows.to_parquet(args.out, index=False)
     else:
-        out["industry"] = None
-
-    # Drop rows with any essential NaNs (you may relax this)
-    out = out.dropna(subset=["sales","cogs","inventory","receivables","payables"])
-
-    # Aggregate duplicates within firm_id-quarter by summing flows and taking last stocks
-    flows = out.groupby(["firm_id","quarter"], as_index=False).agg({
-        "sales":"sum", "cogs":"sum",
-        "inventory":"last", "receivables":"last", "payables":"last",
-        "industry":"last"
-    })
-
-    flows.to_csv(args.out, index=False)
+        flows.to_csv(args.out, index=False)
+    print(f"[INFO] Read {nrows} FUNDQ rows in {secs:.1f}s")
     print(f"Wrote standardized fin.csv -> {args.out} (rows={len(flows)})")
 
 if __name__ == "__main__":
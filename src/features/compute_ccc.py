@@ -1,63 +1,196 @@
 
 import argparse
-from pathlib import Path
-import pandas as pd
+
 import numpy as np
+import pandas as pd
+
+from src.utils.io import KEY_DTYPES, iter_table, read_table, write_table
+from src.utils.panel import Panel, drop_duplicate_keys, parse_quarters, quarter_codes
+from src.utils.quantiles import GroupedQuantiles, make_sketch
+
+WINSOR_COLS = ["CCC","DIO","DSO","DPO"]
+FIN_INPUTS = ["sales", "cogs", "inventory", "receivables", "payables"]
+ESSENTIALS = ["CCC","IT_lag1","gscpi"]  # rows missing any of these are dropped from the final panel
 
 def winsorize(s, lower=0.01, upper=0.99):
     lo = s.quantile(lower)
     hi = s.quantile(upper)
     return s.clip(lower=lo, upper=hi)
 
-def add_treat_and_event(df, rule: str, gscpi_thresh: float = 0.5, custom_events_csv: str = None, shock_col: str = "gscpi"):
+def winsor_cutoffs(df, cols=WINSOR_COLS, lower=0.01, upper=0.99) -> dict:
+    # {col: (lo, hi)} exactly as winsorize() computes them
+    return {c: (float(df[c].quantile(lower)), float(df[c].quantile(upper))) for c in cols}
+
+def stream_cutoffs(chunks, cols=WINSOR_COLS, lower=0.01, upper=0.99, eps: float = 0.0) -> dict:
+    """winsor_cutoffs from an iterable of raw financials chunks (FIN_INPUTS columns).
+
+    The metrics are row-wise, so each chunk only feeds one quantile summary per column;
+    eps > 0 uses a KLL sketch (rank error ~eps), eps = 0 keeps every value (exact).
+    """
+    sketches = {c: make_sketch(eps) for c in cols}
+    for chunk in chunks:
+        m = core_metrics(chunk[FIN_INPUTS].copy())
+        for c in cols:
+            sketches[c].update(m[c].to_numpy())
+    return {c: (float(sk.quantile(lower)), float(sk.quantile(upper))) for c, sk in sketches.items()}
+
+def read_fin_winsorized(path, chunksize: int = 500_000, eps: float = 0.0):
+    """Read --fin once, chunk by chunk: (financials with clipped metrics, cutoffs).
+
+    Each chunk gets its core metrics and feeds one quantile summary per WINSOR_COLS column
+    (a KLL sketch for eps > 0, so no metric column is sorted); once all chunks are in, the
+    cutoffs are applied to each chunk before they are concatenated. The chunks are kept,
+    so fin is held in memory as in a plain read: this is not an out-of-core path.
+    """
+    sketches = {c: make_sketch(eps) for c in WINSOR_COLS}
+    chunks = []
+    for chunk in iter_table(path, chunksize=chunksize, dtype=KEY_DTYPES):
+        chunk = core_metrics(chunk)
+        for c in WINSOR_COLS:
+            sketches[c].update(chunk[c].to_numpy())
+        chunks.append(chunk)
+    if not chunks:
+        raise ValueError(f"no rows in {path}")
+    cutoffs = {c: (float(sk.quantile(0.01)), float(sk.quantile(0.99)))
+               for c, sk in sketches.items()}
+    for chunk in chunks:
+        for c in WINSOR_COLS:
+            chunk[c] = chunk[c].clip(lower=cutoffs[c][0], upper=cutoffs[c][1])
+    return pd.concat(chunks, ignore_index=True), cutoffs
+
+def core_metrics(fin: pd.DataFrame) -> pd.DataFrame:
+    fin["DIO"] = 365.0 * fin["inventory"] / fin["cogs"].replace(0, np.nan)
+    fin["DSO"] = 365.0 * fin["receivables"] / fin["sales"].replace(0, np.nan)
+    fin["DPO"] = 365.0 * fin["payables"] / fin["cogs"].replace(0, np.nan)
+    fin["CCC"] = fin["DIO"] + fin["DSO"] - fin["DPO"]
+    return fin
+
+def first_treat_pos(firm: pd.Series, treat: np.ndarray) -> np.ndarray:
+    """Row position of each firm's first treated row (its first row if never treated), per row.
+
+    Same row as groupby(firm)["treat"].transform("idxmax") in the current row order.
+    """
+    codes = pd.factorize(firm)[0]
+    pos = np.arange(len(codes))
+    key = pd.Series(codes)
+    first_row = pd.Series(pos).groupby(key).transform("min").to_numpy()
+    hit_pos = pd.Series(np.where(treat == 1, pos, len(pos)))
+    first_hit = hit_pos.groupby(key).transform("min").to_numpy()
+    out = np.where(first_hit < len(pos), first_hit, first_row)
+    return np.where(codes < 0, pos, out)  # rows without firm_id: event_time 0
+
+def first_treat_sweep(df, thresholds, shock_col: str = "gscpi") -> pd.DataFrame:
+    """First treated quarter of every firm under the gscpi_thresh rule, for many thresholds at once.
+
+    treat = shock > t, so a firm is first treated at its first row whose running maximum of
+    the shock exceeds t. One cumulative max per firm and one searchsorted over (firm, rank of
+    the running max) keys answer every (firm, threshold) pair. Returns a firm x threshold
+    table of calendar quarter codes (year*4 + q-1, see quarter_codes); <NA> = never treated.
+    Rows are scanned in the current order, as add_treat_and_event does.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    codes, firms = pd.factorize(df["firm_id"])
+    order = np.argsort(codes, kind="stable")  # rows grouped by firm, row order kept within a firm
+    order = order[codes[order] >= 0]
+    firm = codes[order]
+    shock = df[shock_col].to_numpy(dtype=float)[order]
+    running = pd.Series(np.where(np.isnan(shock), -np.inf, shock)).groupby(firm).cummax().to_numpy()
+    uniq = np.unique(running)
+    # keys ascend in this order; running > t  <=>  rank >= need(t)
+    key = firm * (len(uniq) + 1) + np.searchsorted(uniq, running)
+    need = np.searchsorted(uniq, thresholds, side="right")
+    target = np.arange(len(firms))[:, None] * (len(uniq) + 1) + need[None, :]
+    pos = np.searchsorted(key, target)
+    hit = pos < len(key)
+    pos = np.where(hit, pos, 0)
+    hit &= firm[pos] == np.arange(len(firms))[:, None]  # else the search ran into the next firm
+    start = quarter_codes(df["quarter"])[order][pos]
+    out = pd.DataFrame(np.where(hit, start, -1), index=pd.Index(firms, name="firm_id"),
+                       columns=pd.Index(thresholds, name="gscpi_thresh"))
+    return out.where(hit).astype("Int64")
+
+def sweep_event_times(df, table: pd.DataFrame):
+    """Yield (threshold, event_time of df's rows) for each column of first_treat_sweep(df, ...).
+
+    Firm positions, quarter codes and the never-treated origin (the firm's first row, as in
+    add_treat_and_event) are computed once; each threshold is then one gather.
+    """
+    qc = quarter_codes(df["quarter"])
+    fpos = table.index.get_indexer(df["firm_id"])
+    first_row = qc[first_treat_pos(df["firm_id"], np.zeros(len(df), dtype=int))]
+    for t in table.columns:
+        start = table[t].to_numpy(dtype=float, na_value=np.nan)
+        start = np.where(fpos >= 0, start[fpos], np.nan)
+        yield t, qc - np.where(np.isnan(start), first_row, start).astype(qc.dtype)
+
+def sweep_labels(table: pd.DataFrame) -> pd.DataFrame:
+    # first-treat table with "YYYYQn" labels (an event_quarter per threshold) for writing out
+    def label(v):
+        return f"{v // 4}Q{v % 4 + 1}"
+    out = table.apply(lambda c: c.map(label, na_action="ignore")).astype(object)
+    out.columns = [f"thresh_{t:g}" for t in table.columns]
+    return out.reset_index()
+
+def add_treat_and_event(df, rule: str, gscpi_thresh: float = 0.5, custom_events_csv: str = None,
+                        shock_col: str = "gscpi", quantile_eps: float = 0.0):
     df = df.copy()
     if rule == "gscpi_thresh":
         df["treat"] = (df[shock_col] > gscpi_thresh).astype(int)
-        # first treat per firm
-        df["first_treat"] = df.groupby("firm_id")["treat"].transform(lambda s: s.idxmax() if s.any() else pd.NA)
     elif rule == "industry_topdecile":
         # within each quarter, mark industries in top 10% shock as treated
         if "industry" not in df.columns:
             raise ValueError("industry_topdecile requires 'industry' column.")
-        qg = df.groupby("quarter")[shock_col]
-        thr = qg.transform(lambda s: s.quantile(0.9))
+        if quantile_eps:
+            # per-quarter KLL sketches instead of sorting every quarter's shocks (the column is in
+            # memory; this trades exactness for speed, not memory)
+            top = GroupedQuantiles(quantile_eps).update(df[shock_col], df["quarter"]).quantile(0.9)
+            thr = df["quarter"].map(top)
+        else:
+            thr = df.groupby("quarter")[shock_col].transform("quantile", 0.9)
         df["treat"] = (df[shock_col] >= thr).astype(int)
-        df["first_treat"] = df.groupby("firm_id")["treat"].transform(lambda s: s.idxmax() if s.any() else pd.NA)
     elif rule == "custom_dates":
         if not custom_events_csv:
-            raise ValueError("custom_dates requires --custom_events CSV with columns firm_id,event_quarter")
-        ev = pd.read_csv(custom_events_csv)
+            raise ValueError("custom_dates requires --custom_events CSV with columns "
+                             "firm_id,event_quarter")
+        ev = read_table(custom_events_csv)
         need = {"firm_id","event_quarter"}
         if not need.issubset(ev.columns):
             raise ValueError("custom_events CSV must have firm_id,event_quarter")
+        if ev["firm_id"].duplicated().any():
+            # a firm is treated from its first event; more rows per firm would duplicate its panel
+            # rows
+            print("[WARN] Several event quarters for some firms in custom_events; "
+                  "using each firm's first")
+            ev = ev.sort_values("event_quarter", kind="stable").drop_duplicates("firm_id")
         df = df.merge(ev, on="firm_id", how="left")
         df["treat"] = (df["quarter"] >= df["event_quarter"]).astype(int)
-        # locate index of first treat
-        df["first_treat"] = df.groupby("firm_id")["treat"].transform(lambda s: s.idxmax() if s.any() else pd.NA)
     else:
         raise ValueError("Unknown treat rule")
 
     # Quarter numeric index
-    qnum = df["quarter"].str.extract(r"(\d{4})Q(\d)").astype(int)
-    df["q_index"] = (qnum[0] - qnum[0].min())*4 + (qnum[1]-1)
-
-    # First treat index by firm
-    first_idx = df.loc[df.groupby("firm_id")["treat"].transform("idxmax")].set_index("firm_id")["q_index"].to_dict()
-    df["event_time"] = df.apply(lambda r: r["q_index"] - first_idx.get(r["firm_id"], r["q_index"]), axis=1)
+    year, q = parse_quarters(df["quarter"])
+    q_index = (year - year.min()) * 4 + (q - 1)
+    df["q_index"] = q_index
 
-    return df.drop(columns=["first_treat"])
+    # Event time relative to the firm's first treated quarter
+    df["event_time"] = q_index - q_index[first_treat_pos(df["firm_id"], df["treat"].to_numpy())]
+    return df
 
 def add_iv(df, spec: str, iv_lag: int = 4, industry_wave_csv: str = None):
     df = df.copy()
     if spec == "peer_it_lagK":
         if "industry" not in df.columns:
             raise ValueError("peer_it_lagK requires 'industry' column.")
-        peer = df.groupby(["industry","quarter"])["IT_index"].transform("mean") - df["IT_index"]
-        df["IV_peer_IT"] = peer.groupby(df["firm_id"]).shift(iv_lag)
+        # industry-quarter mean IT net of own IT, iv_lag calendar quarters back
+        panel = Panel.from_frame(df, ["IT_index"])
+        ind, _ = panel.codes(df["industry"])
+        peer = panel.group_transform("IT_index", ind) - panel["IT_index"]
+        df["IV_peer_IT"] = panel.to_rows(panel.lag(peer, iv_lag))
     elif spec == "industry_wave":
         if not industry_wave_csv:
-            raise ValueError("industry_wave requires --industry_wave_csv with industry,quarter,wave columns")
-        waves = pd.read_csv(industry_wave_csv)
+            raise ValueError("industry_wave requires --industry_wave_csv with "
+                             "industry,quarter,wave columns")
+        waves = read_table(industry_wave_csv)
         need = {"industry","quarter","wave"}
         if not need.issubset(waves.columns):
             raise ValueError("industry_wave CSV requires columns industry,quarter,wave")
@@ -67,58 +200,130 @@ def add_iv(df, spec: str, iv_lag: int = 4, industry_wave_csv: str = None):
         raise ValueError("Unknown IV spec")
     return df
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--fin", required=True, help="firm-quarter financials CSV")
-    ap.add_argument("--gscpi", required=True, help="GSCPI CSV with columns: quarter,gscpi")
-    ap.add_argument("--it", required=True, help="IT index CSV with columns: firm_id,quarter,IT_index")
-    ap.add_argument("--out", required=True, help="output CSV path")
-
-    # New options
-    ap.add_argument("--treat_rule", default="gscpi_thresh", choices=["gscpi_thresh","industry_topdecile","custom_dates"])
-    ap.add_argument("--gscpi_thresh", type=float, default=0.5)
-    ap.add_argument("--custom_events", help="CSV with firm_id,event_quarter for custom treatment timing")
-    ap.add_argument("--shock_col", default="gscpi")
-
-    ap.add_argument("--iv_spec", default="peer_it_lagK", choices=["peer_it_lagK","industry_wave"])
-    ap.add_argument("--iv_lag", type=int, default=4)
-    ap.add_argument("--industry_wave_csv", help="CSV with industry,quarter,wave (for industry_wave IV)")
-
-    args = ap.parse_args()
+def base_panel(fin, it, gscpi, cutoffs=None, quantile_eps: float = 0.0) -> pd.DataFrame:
+    """Merged, lagged and winsorized panel: everything that does not depend on the treat/IV spec.
 
-    fin = pd.read_csv(args.fin)
-    gscpi = pd.read_csv(args.gscpi)
-    it = pd.read_csv(args.it)
-
-    # Core metrics
-    fin["DIO"] = 365.0 * fin["inventory"] / fin["cogs"].replace(0, np.nan)
-    fin["DSO"] = 365.0 * fin["receivables"] / fin["sales"].replace(0, np.nan)
-    fin["DPO"] = 365.0 * fin["payables"] / fin["cogs"].replace(0, np.nan)
-    fin["CCC"] = fin[["DIO","DSO","DPO"]].apply(lambda r: r[0]+r[1]-r[2], axis=1)
+    cutoffs ({col: (lo, hi)}) replaces the winsorization quantiles of this frame, so a
+    slice of quarters can be built with the cutoffs of the whole panel. quantile_eps > 0
+    takes the cutoffs from KLL sketches of this frame. fin from read_fin_winsorized already
+    carries clipped metrics; clipping it again with its cutoffs changes nothing.
+    """
+    # Core metrics (unless read_fin_winsorized computed them per chunk)
+    if not set(WINSOR_COLS).issubset(fin.columns):
+        fin = core_metrics(fin)
 
     # Merge
     df = fin.merge(it, on=["firm_id","quarter"], how="left")
     df = df.merge(gscpi, on="quarter", how="left")
 
-    # Lagged IT
+    # One row per firm-quarter (duplicate or restated filings, duplicate IT rows): the point where
+    # the panel becomes unique, so the lags below and every model downstream see one row each
+    df = drop_duplicate_keys(df)
+
+    # Lagged IT (previous calendar quarter)
     df = df.sort_values(["firm_id","quarter"])
-    df["IT_lag1"] = df.groupby("firm_id")["IT_index"].shift(1)
+    panel = Panel.from_frame(df, ["IT_index"])
+    df["IT_lag1"] = panel.to_rows(panel.lag("IT_index", 1))
 
     # Winsorize
-    for col in ["CCC","DIO","DSO","DPO"]:
-        df[col] = winsorize(df[col])
+    if not cutoffs:
+        cutoffs = stream_cutoffs([df], eps=quantile_eps) if quantile_eps else winsor_cutoffs(df)
+    for col in WINSOR_COLS:
+        df[col] = df[col].clip(lower=cutoffs[col][0], upper=cutoffs[col][1])
+    return df
+
+def build_panel(fin, it, gscpi, args, cutoffs=None) -> pd.DataFrame:
+    """Full firm-quarter panel before the final dropna.
+
+    cutoffs ({col: (lo, hi)}) replaces the winsorization quantiles of this frame, so a
+    slice of quarters can be built with the cutoffs of the whole panel. args.quantile_eps > 0
+    switches cutoffs and top-decile thresholds to approximate streaming quantiles.
+    """
+    df = base_panel(fin, it, gscpi, cutoffs, args.quantile_eps)
 
     # Treat & event_time
-    df = add_treat_and_event(df, rule=args.treat_rule, gscpi_thresh=args.gscpi_thresh, custom_events_csv=args.custom_events, shock_col=args.shock_col)
+    df = add_treat_and_event(df, rule=args.treat_rule, gscpi_thresh=args.gscpi_thresh,
+                             custom_events_csv=args.custom_events, shock_col=args.shock_col,
+                             quantile_eps=args.quantile_eps)
 
     # Instruments
-    df = add_iv(df, spec=args.iv_spec, iv_lag=args.iv_lag, industry_wave_csv=args.industry_wave_csv)
+    return add_iv(df, spec=args.iv_spec, iv_lag=args.iv_lag,
+                  industry_wave_csv=args.industry_wave_csv)
 
+def finalize_panel(df: pd.DataFrame) -> pd.DataFrame:
     # Drop rows with missing essentials
-    df = df.dropna(subset=["CCC","IT_lag1","gscpi"]).reset_index(drop=True)
+    return df.dropna(subset=ESSENTIALS).reset_index(drop=True)
 
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(args.out, index=False)
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fin", required=True,
+                    help="firm-quarter financials (.csv/.parquet/.feather or a Parquet dataset "
+                         "dir)")
+    ap.add_argument("--gscpi", required=True, help="GSCPI CSV with columns: quarter,gscpi")
+    ap.add_argument("--it", required=True,
+                    help="IT index table (.csv/.parquet/.feather) with columns: "
+                         "firm_id,quarter,IT_index")
+    ap.add_argument("--out", required=True,
+                    help="output table; .parquet/.feather keep dtypes and categorical keys")
+
+    # New options
+    ap.add_argument("--treat_rule", default="gscpi_thresh",
+                    choices=["gscpi_thresh","industry_topdecile","custom_dates"])
+    ap.add_argument("--gscpi_thresh", type=float, default=0.5)
+    ap.add_argument("--custom_events",
+                    help="CSV with firm_id,event_quarter for custom treatment timing")
+    ap.add_argument("--shock_col", default="gscpi")
+
+    ap.add_argument("--iv_spec", default="peer_it_lagK", choices=["peer_it_lagK","industry_wave"])
+    ap.add_argument("--iv_lag", type=int, default=4)
+    ap.add_argument("--industry_wave_csv",
+                    help="CSV with industry,quarter,wave (for industry_wave IV)")
+    ap.add_argument("--quantile_eps", type=float, default=0.0,
+                    help="rank error of the quantile sketch used for winsorization cutoffs and "
+                         "top-decile thresholds (e.g. 0.001); avoids sorting the columns, the "
+                         "panel stays in memory; 0 = exact quantiles")
+    ap.add_argument("--chunksize", type=int, default=500_000,
+                    help="rows per chunk when --fin is read chunk by chunk (--quantile_eps > 0)")
+    ap.add_argument("--sweep_thresh", type=float, nargs="+",
+                    help="gscpi_thresh values whose first-treat quarters are computed in one "
+                         "pass (with --sweep_out)")
+    ap.add_argument("--sweep_out",
+                    help="firm x threshold first-treat table (event_quarter labels, empty = "
+                         "never treated)")
+    ap.add_argument("--update", action="store_true",
+                    help="append new quarters to the existing --out panel (state kept in "
+                         "<out>.state/); falls back to a full rebuild when history or settings "
+                         "changed")
+
+    args = ap.parse_args()
+    if bool(args.sweep_thresh) != bool(args.sweep_out):
+        raise SystemExit("--sweep_thresh and --sweep_out go together")
+    if args.sweep_thresh and args.update:
+        raise SystemExit("--sweep_thresh needs a full build (not --update)")
+
+    gscpi = read_table(args.gscpi)
+    it = read_table(args.it, columns=["firm_id", "quarter", "IT_index"], dtype=KEY_DTYPES)
+
+    if args.update:
+        from src.features.panel_update import update_panel
+        df = update_panel(read_table(args.fin, dtype=KEY_DTYPES), it, gscpi, args)
+    else:
+        cutoffs = None
+        if args.quantile_eps:
+            # one chunked read: metrics, sketch updates and clipping happen per chunk (fin stays
+            # in memory)
+            fin, cutoffs = read_fin_winsorized(args.fin, args.chunksize, args.quantile_eps)
+        else:
+            fin = read_table(args.fin, dtype=KEY_DTYPES)
+        df = build_panel(fin, it, gscpi, args, cutoffs)
+        if args.sweep_thresh:
+            # first treatment is taken over all rows, before the final dropna
+            table = first_treat_sweep(df, args.sweep_thresh, args.shock_col)
+            write_table(sweep_labels(table), args.sweep_out, categorical_keys=False)
+            print(f"First-treat quarters for {len(args.sweep_thresh)} thresholds "
+                  f"-> {args.sweep_out}")
+        df = finalize_panel(df)
+    write_table(df, args.out)
     print(f"Processed rows: {len(df)} -> {args.out}")
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.features.compute_ccc import (
+    FIN_INPUTS,
+    WINSOR_COLS,
+    build_panel,
+    core_metrics,
+    finalize_panel,
+    stream_cutoffs,
+    winsor_cutoffs,
+)
+from src.utils.io import KEY_DTYPES, KEYS, read_table, table_format
+from src.utils.panel import quarter_codes
+
+STATE_VERSION = 1
+SETTINGS = ("treat_rule", "gscpi_thresh", "shock_col", "iv_spec", "iv_lag", "quantile_eps")
+
+def state_dir(out) -> Path:
+    return Path(str(out) + ".state")
+
+def frame_hash(df: pd.DataFrame) -> str:
+    # row-order independent content hash
+    return str(int(pd.util.hash_pandas_object(df, index=False).sum())) if len(df) else "0"
+
+def file_hash(path) -> str:
+    return hashlib.blake2b(Path(path).read_bytes(), digest_size=16).hexdigest() if path else ""
+
+def fingerprints(fin, it, gscpi, last: int, args) -> dict:
+    # inputs up to and including quarter code `last`; any change there invalidates the stored panel
+    def hist(d):
+        return d[quarter_codes(d["quarter"]) <= last] if len(d) else d
+
+    events = args.custom_events if args.treat_rule == "custom_dates" else None
+    waves = args.industry_wave_csv if args.iv_spec == "industry_wave" else None
+    return {"fin": frame_hash(hist(fin)), "it": frame_hash(hist(it)),
+            "gscpi": frame_hash(hist(gscpi)), "custom_events": file_hash(events),
+            "industry_wave": file_hash(waves)}
+
+def firm_state(df: pd.DataFrame) -> pd.DataFrame:
+    # per firm: q_index of its first row and of its first treated row (NaN if never treated)
+    first_q = df.groupby("firm_id")["q_index"].min()
+    first_treat = df.loc[df["treat"] == 1].groupby("firm_id")["q_index"].min()
+    return pd.DataFrame({"first_q": first_q,
+                         "first_treat_q": first_treat.reindex(first_q.index).astype(float)})
+
+def save_state(out, meta: dict, firms: pd.DataFrame) -> None:
+    d = state_dir(out)
+    d.mkdir(parents=True, exist_ok=True)
+    firms.rename_axis("firm_id").reset_index().to_parquet(d / "firms.parquet", index=False)
+    (d / "meta.json").write_text(json.dumps(meta, indent=1), encoding="utf-8")
+
+def load_state(out):
+    d = state_dir(out)
+    if not (d / "meta.json").exists() or not (d / "firms.parquet").exists():
+        return None, None
+    meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+    firms = pd.read_parquet(d / "firms.parquet").set_index("firm_id")
+    return meta, firms
+
+def read_previous(out) -> pd.DataFrame:
+    # CSV floats must round-trip exactly, or the untouched history would drift by an ulp per update;
+    # keys come back as str like the new rows, whatever the firm ids look like
+    if table_format(out) == "csv":
+        return pd.read_csv(out, float_precision="round_trip", dtype=KEY_DTYPES)
+    return read_table(out, dtype=KEY_DTYPES)
+
+def raw_cutoffs(fin, eps: float = 0.0) -> dict:
+    # same quantiles build_panel takes over the merged frame: after drop_duplicate_keys that is one
+    # row per firm-quarter, the last fin row of each, in fin order
+    fin = fin.loc[~fin.duplicated(list(KEYS), keep="last")]
+    if eps:
+        return stream_cutoffs([fin], eps=eps)
+    return winsor_cutoffs(core_metrics(fin[FIN_INPUTS].copy()))
+
+def _meta(args, fin, it, gscpi, last, min_year, cutoffs):
+    return {"version": STATE_VERSION, "settings": {k: getattr(args, k) for k in SETTINGS},
+            "last_q": int(last), "min_year": int(min_year), "cutoffs": cutoffs,
+            "fingerprints": fingerprints(fin, it, gscpi, last, args)}
+
+def full_rebuild(fin, it, gscpi, args, reason: str) -> pd.DataFrame:
+    print(f"[INFO] Full rebuild: {reason}")
+    cutoffs = raw_cutoffs(fin, args.quantile_eps)
+    df = build_panel(fin.copy(), it, gscpi, args, cutoffs)
+    codes = quarter_codes(df["quarter"])
+    meta = _meta(args, fin, it, gscpi, codes.max(), codes.min() // 4, cutoffs)
+    save_state(args.out, meta, firm_state(df))
+    return finalize_panel(df)
+
+def update_panel(fin, it, gscpi, args) -> pd.DataFrame:
+    """Append the quarters of `fin` newer than the stored panel, recomputing only what they touch.
+
+    New rows are built from a window reaching max(iv_lag, 1) quarters back, so IT_lag1 and the
+    peer-IT instrument see exactly the history they would in a full run. Two things reach
+    into history: winsorization cutoffs (quantiles of the whole panel) and the first treated
+    quarter of firms first treated in the new quarters (their event_time shifts). Both are
+    reported. Changed history, changed settings or a missing state trigger a full rebuild.
+    """
+    meta, firms = load_state(args.out)
+    if meta is None or not Path(args.out).exists():
+        return full_rebuild(fin, it, gscpi, args, f"no previous panel/state at {args.out}")
+    if meta.get("version") != STATE_VERSION:
+        return full_rebuild(fin, it, gscpi, args, "state written by another version")
+    settings = {k: getattr(args, k) for k in SETTINGS}
+    if meta["settings"] != settings:
+        changed = sorted(k for k in SETTINGS if meta["settings"].get(k) != settings[k])
+        return full_rebuild(fin, it, gscpi, args, f"settings changed ({', '.join(changed)})")
+    last = meta["last_q"]
+    fp = fingerprints(fin, it, gscpi, last, args)
+    stale = sorted(k for k in fp if fp[k] != meta["fingerprints"].get(k))
+    if stale:
+        return full_rebuild(fin, it, gscpi, args, f"history changed in {', '.join(stale)}")
+
+    fin_code = quarter_codes(fin["quarter"])
+    prev = read_previous(args.out)
+    new = fin_code > last
+    if not new.any():
+        print("[INFO] No quarters after the stored panel; nothing to update")
+        return prev
+
+    # Global step: winsorization cutoffs over every firm-quarter (raw metrics are cheap to
+    # recompute)
+    cutoffs = raw_cutoffs(fin, args.quantile_eps)
+    old_cut = {c: tuple(v) for c, v in meta["cutoffs"].items()}
+    if cutoffs != old_cut:
+        moved = ", ".join(f"{c} [{old_cut[c][0]:.4g}, {old_cut[c][1]:.4g}] -> [{lo:.4g}, {hi:.4g}]"
+                          for c, (lo, hi) in cutoffs.items() if (lo, hi) != old_cut[c])
+        raw = core_metrics(prev[FIN_INPUTS].copy())
+        before = prev[WINSOR_COLS].copy()
+        for c in WINSOR_COLS:
+            prev[c] = raw[c].clip(lower=cutoffs[c][0], upper=cutoffs[c][1])
+        after = prev[WINSOR_COLS]
+        reclipped = int(((before != after) & ~(before.isna() & after.isna())).any(axis=1).sum())
+        print(f"[WARN] Winsorization cutoffs moved ({moved}): re-clipped all {len(prev)} history "
+              f"rows, {reclipped} changed")
+
+    # Window: new quarters plus the quarters their lags/instruments look back to
+    ctx = max(args.iv_lag, 1)
+    first_new = int(fin_code[new].min())
+    it_code = quarter_codes(it["quarter"]) if len(it) else np.array([], dtype=int)
+    win = build_panel(fin.loc[fin_code >= first_new - ctx].copy(),
+                      it.loc[it_code >= first_new - ctx], gscpi, args, cutoffs)
+    rows = win.loc[quarter_codes(win["quarter"]) > last].copy()
+
+    # q_index against the panel's first year; event_time against each firm's first treated quarter
+    rows["q_index"] = quarter_codes(rows["quarter"]) - 4 * meta["min_year"]
+    add = firm_state(rows)
+    known = firms.reindex(add.index)
+    moved_firms = known.index[known["first_q"].notna() & known["first_treat_q"].isna()
+                              & add["first_treat_q"].notna()]
+    firms = pd.concat([firms, add.loc[known["first_q"].isna()]])
+    firms.loc[moved_firms, "first_treat_q"] = add.loc[moved_firms, "first_treat_q"]
+    anchor = firms["first_treat_q"].fillna(firms["first_q"])
+    rows["event_time"] = ((rows["q_index"] - rows["firm_id"].map(anchor))
+                          .astype(rows["q_index"].dtype))
+    if len(moved_firms):
+        hit = prev["firm_id"].isin(moved_firms)
+        shift = prev.loc[hit, "q_index"] - prev.loc[hit, "firm_id"].map(anchor)
+        prev.loc[hit, "event_time"] = shift.astype(int)
+        print(f"[INFO] {len(moved_firms)} firms first treated in the new quarters: "
+              f"event_time refreshed on {int(hit.sum())} history rows")
+
+    added = finalize_panel(rows)
+    df = pd.concat([prev, added], ignore_index=True).sort_values(["firm_id", "quarter"],
+                                                                 kind="stable")
+    df = df.reset_index(drop=True)
+    new_last = int(fin_code.max())
+    save_state(args.out, _meta(args, fin, it, gscpi, new_last, meta["min_year"], cutoffs), firms)
+    print(f"[INFO] Update: {len(added)} rows for {len(np.unique(fin_code[new]))} new quarters "
+          f"(window rebuilt {len(win)} rows incl. {ctx} context quarters); "
+          f"{len(prev)} history rows kept")
+    return df
@@ -1,8 +1,11 @@
 
-import argparse, re
-import pandas as pd
-import pandera as pa
-from pandera import Column, DataFrameSchema, Check
+import argparse
+import re
+
+from pandera import Check, Column, DataFrameSchema
+
+from src.utils.io import read_table
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -11,10 +14,11 @@ def main():
     args = ap.parse_args()
 
     quarter_re = re.compile(r'^\d{4}Q[1-4]$')
+    quarter_check = Check(lambda s: s.str.match(quarter_re).all())
 
     fin_schema = DataFrameSchema({
         "firm_id": Column(str, nullable=False),
-        "quarter": Column(str, checks=Check(lambda s: s.str.match(quarter_re).all()), nullable=False),
+        "quarter": Column(str, checks=quarter_check, nullable=False),
         "industry": Column(object, nullable=True),
         "sales": Column(float, nullable=False),
         "cogs": Column(float, nullable=False),
@@ -24,12 +28,12 @@ def main():
     }, coerce=True)
 
     gscpi_schema = DataFrameSchema({
-        "quarter": Column(str, checks=Check(lambda s: s.str.match(quarter_re).all()), nullable=False),
+        "quarter": Column(str, checks=quarter_check, nullable=False),
         "gscpi": Column(float, nullable=False),
     }, coerce=True)
 
-    fin = pd.read_csv(args.fin)
-    g = pd.read_csv(args.gscpi)
+    fin = read_table(args.fin)
+    g = read_table(args.gscpi)
 
     fin_schema.validate(fin, lazy=True)
     gscpi_schema.validate(g, lazy=True)
@@ -0,0 +1,414 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+from scipy.sparse.csgraph import connected_components
+
+from src.utils.panel import quarter_codes
+
+
+def _max_change(d, scale) -> float:
+    # largest absolute change of any column, relative to that column's scale
+    return float((np.abs(d).max(axis=0, initial=0.0) / scale).max(initial=0.0))
+
+
+class FixedEffects:
+    """One- or two-way fixed effects absorbed by alternating projections.
+
+    demean() sweeps out the group means of each effect in turn until a sweep moves no
+    value by more than tol (relative to the column's scale): the residuals of a regression
+    on the full set of dummies, without ever building them. rank is the number of dummy
+    columns (constant included) the effects identify: the group count for one effect,
+    n_a + n_b - (connected components of the a-b bipartite graph) for two.
+    """
+
+    def __init__(self, codes, tol: float = 1e-10, maxiter: int = 10_000):
+        self.codes = [np.asarray(c, dtype=np.int64) for c in codes]
+        if not 1 <= len(self.codes) <= 2:
+            raise ValueError("one or two fixed effects are supported")
+        if any((c < 0).any() for c in self.codes):
+            raise ValueError("fixed-effect groups must not be missing")
+        self.n = len(self.codes[0])
+        self.tol, self.maxiter = tol, maxiter
+        self.sizes = [np.bincount(c) for c in self.codes]
+        # group-indicator matrices (n x groups): D.T @ X gives group sums of every column at once
+        self._dummies = [sparse.csr_matrix((np.ones(self.n), (np.arange(self.n), c)),
+                                           shape=(self.n, len(s)))
+                         for c, s in zip(self.codes, self.sizes, strict=True)]
+        self.iterations = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, effects=("firm_id", "quarter"), **kw) -> "FixedEffects":
+        # firm x quarter: the Panel codes (sorted firms, calendar quarters); duplicate firm-quarter
+        # rows are fine for a regression, so they are not rejected here
+        if tuple(effects) == ("firm_id", "quarter"):
+            qc = quarter_codes(df["quarter"])
+            q0 = qc.min() if len(qc) else 0
+            return cls([pd.factorize(df["firm_id"], sort=True)[0], qc - q0], **kw)
+        return cls([pd.factorize(df[e])[0] for e in effects], **kw)
+
+    def subset(self, rows) -> "FixedEffects":
+        # the same effects on a subset of rows (boolean mask); groups left empty are ignored
+        return FixedEffects([c[rows] for c in self.codes], tol=self.tol, maxiter=self.maxiter)
+
+    @property
+    def rank(self) -> int:
+        used = [s > 0 for s in self.sizes]
+        if len(self.codes) == 1:
+            return int(used[0].sum())
+        link = self._dummies[0].T @ self._dummies[1]
+        graph = sparse.bmat([[None, link], [link.T, None]])
+        _, labels = connected_components(graph, directed=False)
+        # calendar gaps leave empty groups: isolated nodes that are not components of the data
+        return int(used[0].sum() + used[1].sum()) - len(np.unique(labels[np.concatenate(used)]))
+
+    def demean(self, M) -> np.ndarray:
+        M = np.asarray(M, dtype=float)
+        X = M.reshape(self.n, -1).copy()
+        scale = np.maximum(np.abs(X).max(axis=0, initial=0.0), np.finfo(float).tiny)
+        inv_size = [1.0 / np.maximum(s, 1) for s in self.sizes]
+        sweeps = 0
+        for _ in range(self.maxiter):
+            sweeps += 1
+            moved = 0.0
+            for D, inv in zip(self._dummies, inv_size, strict=True):
+                means = (D.T @ X) * inv[:, None]
+                X -= D @ means
+                moved = max(moved, _max_change(means, scale))
+            # one effect is exact after a single sweep
+            if len(self._dummies) == 1 or moved < self.tol:
+                break
+        else:
+            warnings.warn(f"fixed-effect demeaning did not converge in {self.maxiter} sweeps "
+                          f"(last change {moved:.2e})", stacklevel=2)
+        self.iterations = max(self.iterations, sweeps)
+        return X.reshape(M.shape)
+
+    def group_effects(self, X) -> list:
+        """Per-effect (groups x k) arrays B_g with demean(X) = X - sum_g D_g @ B_g.
+
+        The same alternating projections as demean(), run on the group effects alone, so a
+        sparse X is only touched through its group sums.
+        """
+        X = sparse.csr_matrix(X, dtype=float)
+        scale = np.maximum(abs(X).max(axis=0).toarray().ravel(), np.finfo(float).tiny)
+        sums = [np.asarray((D.T @ X).todense()) for D in self._dummies]
+        inv = [1.0 / np.maximum(s, 1)[:, None] for s in self.sizes]
+        if len(sums) == 1:
+            return [sums[0] * inv[0]]
+        link = (self._dummies[0].T @ self._dummies[1]).tocsr()  # firm x quarter row counts
+        a, b = np.zeros_like(sums[0]), np.zeros_like(sums[1])
+        sweeps = 0
+        for _ in range(self.maxiter):
+            sweeps += 1
+            a_new = (sums[0] - link @ b) * inv[0]
+            b_new = (sums[1] - link.T @ a_new) * inv[1]
+            # the increments are the group means a demean() sweep would remove
+            moved = max(_max_change(a_new - a, scale), _max_change(b_new - b, scale))
+            a, b = a_new, b_new
+            if moved < self.tol:
+                break
+        else:
+            warnings.warn(f"fixed-effect demeaning did not converge in {self.maxiter} sweeps "
+                          f"(last change {moved:.2e})", stacklevel=2)
+        self.iterations = max(self.iterations, sweeps)
+        return [a, b]
+
+
+def independent_columns(Xt: np.ndarray, X: np.ndarray, tol: float = 1e-7) -> list:
+    # positions of demeaned columns kept in order; a column is dropped when what is left of it after
+    # the fixed effects and the earlier kept columns is negligible next to the column itself
+    keep = []
+    for j in range(Xt.shape[1]):
+        x = Xt[:, j]
+        if keep:
+            K = Xt[:, keep]
+            x = x - K @ np.linalg.lstsq(K, x, rcond=None)[0]
+        if np.linalg.norm(x) > tol * np.linalg.norm(X[:, j]):
+            keep.append(j)
+    return keep
+
+
+def independent_gram(gram: np.ndarray, norms: np.ndarray, tol: float = 1e-6) -> list:
+    # independent_columns from the demeaned Gram matrix; squared norms carry half the digits,
+    # hence the looser tol
+    keep = []
+    for j in range(len(norms)):
+        r2 = gram[j, j]
+        if keep:
+            g = gram[keep, j]
+            r2 -= g @ np.linalg.solve(gram[np.ix_(keep, keep)], g)
+        if r2 > (tol * norms[j]) ** 2:
+            keep.append(j)
+    return keep
+
+
+class AbsorbResult:
+    """Slopes of an absorbed-FE regression; dropped (collinear) terms are NaN."""
+
+    def __init__(self, terms, params, cov, nobs: int, df_resid: int, fe_rank: int, dropped,
+                 cov_type: str, iterations: int, const=None):
+        terms = list(terms)
+        self.nobs, self.df_resid, self.fe_rank = nobs, df_resid, fe_rank
+        self.dropped, self.cov_type, self.iterations = list(dropped), cov_type, iterations
+        kept = [t for t in terms if t not in self.dropped]
+        self.params = pd.Series(params, index=kept, dtype=float).reindex(terms)
+        self.cov = pd.DataFrame(cov, index=kept, columns=kept)
+        self.bse = pd.Series(np.sqrt(np.diag(cov)), index=kept, dtype=float).reindex(terms)
+        self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.params / self.bse)), index=terms)
+        if const is not None:
+            # intercept at the sample means (as PanelOLS reports it with absorbed effects); no
+            # std. error
+            self.params = pd.concat([pd.Series({"const": const}), self.params])
+            self.bse = pd.concat([pd.Series({"const": np.nan}), self.bse])
+            self.pvalues = pd.concat([pd.Series({"const": np.nan}), self.pvalues])
+
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame({"term": self.params.index, "coef": self.params.values,
+                             "std_err": self.bse.values, "p_value": self.pvalues.values})
+
+    def summary(self, title: str = "Absorbed fixed-effects regression") -> str:
+        t = self.table().set_index("term")
+        t["z"] = t["coef"] / t["std_err"]
+        body = t[["coef", "std_err", "z", "p_value"]].to_string(float_format=lambda v: f"{v:.6g}")
+        lines = [title, f"No. Observations: {self.nobs}   Absorbed FE rank: {self.fe_rank}   "
+                        f"Df Residuals: {self.df_resid}   Covariance Type: {self.cov_type}", "",
+                 body]
+        if self.dropped:
+            lines += ["", "[Note] Absorbed by the fixed effects or collinear (dropped): "
+                          f"{', '.join(self.dropped)}"]
+        return "\n".join(lines)
+
+
+def warn_dropped(res: AbsorbResult) -> None:
+    if res.dropped:
+        print("[WARN] Not identified with the absorbed fixed effects (dropped): "
+              f"{', '.join(res.dropped)}")
+
+
+def _cluster_indicator(clusters, nobs: int):
+    # (clusters x rows) 0/1 matrix: C @ scores sums the scores within each cluster
+    if sparse.issparse(clusters):
+        return clusters
+    if clusters is None:
+        raise ValueError("cov_type='cluster' needs cluster codes")
+    g, uniq = pd.factorize(pd.Series(clusters))
+    return sparse.csr_matrix((np.ones(nobs), (g, np.arange(nobs))), shape=(len(uniq), nobs))
+
+
+def _sandwich(bread, meat, nobs, k, cov_type, n_clusters=None):
+    df_resid = nobs - k
+    if df_resid <= 0:
+        return np.full(bread.shape, np.nan), df_resid
+    if cov_type == "HC1":
+        scale = nobs / df_resid
+    else:
+        # statsmodels' small-sample correction for clustered covariances
+        scale = n_clusters / (n_clusters - 1) * (nobs - 1) / df_resid
+    return bread @ meat @ bread * scale, df_resid
+
+
+def _covariance(Xt, e, bread, nobs, k, cov_type, clusters):
+    scores = Xt * e[:, None]
+    if cov_type == "HC1":
+        return _sandwich(bread, scores.T @ scores, nobs, k, cov_type)
+    if cov_type == "cluster":
+        C = _cluster_indicator(clusters, nobs)
+        S = C @ scores
+        return _sandwich(bread, S.T @ S, nobs, k, cov_type, C.shape[0])
+    raise ValueError("cov_type must be 'HC1' or 'cluster'")
+
+
+def _const(y, X, beta):
+    return float(y.mean() - X.mean(axis=0) @ beta) if len(beta) else float(y.mean())
+
+
+def _results(names, terms, keep, B, covs, nobs, fe, cov_type, consts) -> dict:
+    dropped = [c for j, c in enumerate(terms) if j not in keep]
+    return {name: AbsorbResult(terms, B[:, j], covs[j][0], nobs, covs[j][1], fe.rank, dropped,
+                               cov_type, fe.iterations, consts[j] if consts else None)
+            for j, name in enumerate(names)}
+
+
+def _ols_many(names, Yv, Yt, terms, Xv, Xt, fe, cov_type, clusters, add_const) -> dict:
+    # one collinearity screen and one inverse of the demeaned Gram matrix for every outcome
+    if cov_type not in ("HC1", "cluster"):
+        raise ValueError("cov_type must be 'HC1' or 'cluster'")
+    keep = independent_columns(Xt, Xv)
+    Xk = Xt[:, keep]
+    bread = np.linalg.inv(Xk.T @ Xk)
+    B = bread @ (Xk.T @ Yt)
+    E = Yt - Xk @ B
+    C = _cluster_indicator(clusters, len(Yv)) if cov_type == "cluster" else None
+    k = fe.rank + len(keep)
+    covs = [_covariance(Xk, E[:, j], bread, len(Yv), k, cov_type, C) for j in range(len(names))]
+    consts = ([_const(Yv[:, j], Xv[:, keep], B[:, j]) for j in range(len(names))]
+              if add_const else None)
+    return _results(names, terms, keep, B, covs, len(Yv), fe, cov_type, consts)
+
+
+def _ols_many_sparse(names, Yv, Yt, terms, X, fe, cov_type, clusters, add_const) -> dict:
+    """Sparse-design version of _ols_many (e.g. event-time indicators).
+
+    The demeaned design is Z @ M with Z = [X | group dummies] (sparse) and M = [I; -group
+    effects of X] (dense, groups x k), so the Gram matrix, the HC1 meat and the cluster
+    scores all come from sparse products; the dense n x k demeaned design is never formed
+    and memory grows with nnz(X) + rows + groups * k.
+    """
+    if cov_type not in ("HC1", "cluster"):
+        raise ValueError("cov_type must be 'HC1' or 'cluster'")
+    nobs, k = X.shape
+    Z = sparse.hstack([X] + fe._dummies, format="csr")
+    M = np.vstack([np.eye(k)] + [-b for b in fe.group_effects(X)])
+    gram = M.T @ ((Z.T @ Z) @ M)
+    keep = independent_gram(gram, np.sqrt(np.asarray(X.multiply(X).sum(axis=0)).ravel()))
+    Mk = M[:, keep]
+    bread = np.linalg.inv(gram[np.ix_(keep, keep)])
+    B = bread @ (Mk.T @ (Z.T @ Yt))
+    E = Yt - Z @ (Mk @ B)
+    C = _cluster_indicator(clusters, nobs) if cov_type == "cluster" else None
+    covs = []
+    for j in range(len(names)):
+        Ze = Z.multiply(E[:, [j]]).tocsr()  # rows of Z scaled by their residual
+        if C is None:
+            meat = Mk.T @ ((Ze.T @ Ze) @ Mk)
+            covs.append(_sandwich(bread, meat, nobs, fe.rank + len(keep), cov_type))
+        else:
+            S = (C @ Ze) @ Mk
+            covs.append(_sandwich(bread, S.T @ S, nobs, fe.rank + len(keep), cov_type, C.shape[0]))
+    means = np.asarray(X.mean(axis=0)).ravel()[keep]
+    consts = ([float(Yv[:, j].mean() - means @ B[:, j]) for j in range(len(names))]
+              if add_const else None)
+    return _results(names, terms, keep, B, covs, nobs, fe, cov_type, consts)
+
+
+def _take_rows(X, rows):
+    # rows of a design: DataFrame or sparse matrix
+    return sparse.csr_matrix(X)[rows] if sparse.issparse(X) else X.iloc[rows]
+
+
+def _take_clusters(clusters, rows):
+    # cluster labels of the kept rows; an indicator loses the rows and the clusters left empty
+    if clusters is None:
+        return None
+    if sparse.issparse(clusters):
+        C = sparse.csr_matrix(clusters)[:, np.flatnonzero(rows)]
+        return C[C.getnnz(axis=1) > 0]
+    return np.asarray(clusters)[rows]
+
+
+def absorb_ols_many(Y: pd.DataFrame, X, fe: FixedEffects, cov_type: str = "HC1", clusters=None,
+                    add_const: bool = True, terms=None) -> dict:
+    """absorb_ols for several outcomes on one design: {outcome: AbsorbResult}.
+
+    The design is demeaned, screened for collinearity and its Gram matrix inverted once;
+    the outcomes are demeaned together and solved against that single factorization.
+    Each outcome is estimated on the rows where it and the regressors are observed (the sample
+    a single-outcome fit would use); outcomes with the same missing-value pattern share one
+    factorization.
+    X is a DataFrame, or a scipy sparse matrix with its column names in terms.
+    """
+    names = list(Y.columns)
+    Yv = Y.to_numpy(dtype=float)
+    missing = np.isnan(Yv)
+    if not sparse.issparse(X):
+        missing |= X.isna().to_numpy().any(axis=1)[:, None]
+    if missing.any():
+        patterns = {}
+        for j in range(len(names)):
+            patterns.setdefault(missing[:, j].tobytes(), []).append(j)
+        out = {}
+        for cols in patterns.values():
+            rows = ~missing[:, cols[0]]
+            if not rows.any():
+                raise ValueError(f"no observed rows for {', '.join(names[j] for j in cols)}")
+            out.update(absorb_ols_many(Y.iloc[rows, cols], _take_rows(X, rows), fe.subset(rows),
+                                       cov_type, _take_clusters(clusters, rows), add_const, terms))
+        return {name: out[name] for name in names}
+    Yt = fe.demean(Yv)
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X, dtype=float)
+        terms = list(terms) if terms is not None else [f"x{j}" for j in range(X.shape[1])]
+        return _ols_many_sparse(names, Yv, Yt, terms, X, fe, cov_type, clusters, add_const)
+    Xv = X.to_numpy(dtype=float)
+    return _ols_many(names, Yv, Yt, list(X.columns), Xv, fe.demean(Xv), fe, cov_type, clusters,
+                     add_const)
+
+
+def absorb_ols(y, X, fe: FixedEffects, cov_type: str = "HC1", clusters=None,
+               add_const: bool = True, terms=None) -> AbsorbResult:
+    """OLS of y on X plus the fixed effects in fe.
+
+    Same slopes and HC1/cluster errors as the regression on the full set of dummies.
+
+    X is a DataFrame, or a scipy sparse matrix with its column names in terms.
+    """
+    name = getattr(y, "name", None) or "y"
+    Y = pd.DataFrame({name: np.asarray(y, dtype=float)})
+    return absorb_ols_many(Y, X, fe, cov_type, clusters, add_const, terms)[name]
+
+
+class Absorbed:
+    """Columns of one estimation sample, demeaned once for any number of regressions among them.
+
+    ols(outcomes, regressors) solves all outcomes from one factorization of the demeaned
+    regressors; calls with different regressor sets (both mediation paths, say) reuse the
+    same demeaned columns instead of sweeping the fixed effects again. Columns with missing
+    values are not demeaned here: a fit that uses one runs through absorb_ols_many on the
+    rows where its columns are observed.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns, fe: FixedEffects, clusters=None):
+        self.columns = list(dict.fromkeys(columns))
+        self.fe, self.clusters = fe, clusters
+        self.raw = df[self.columns].to_numpy(dtype=float)
+        self.complete = ~np.isnan(self.raw).any(axis=0)
+        self.tilde = np.full_like(self.raw, np.nan)
+        self.tilde[:, self.complete] = fe.demean(self.raw[:, self.complete])
+        self._pos = {c: j for j, c in enumerate(self.columns)}
+
+    def ols(self, outcomes, regressors, cov_type: str = "HC1", add_const: bool = True) -> dict:
+        yi = [self._pos[c] for c in outcomes]
+        xi = [self._pos[c] for c in regressors]
+        if not self.complete[yi + xi].all():
+            Y = pd.DataFrame(self.raw[:, yi], columns=list(outcomes))
+            X = pd.DataFrame(self.raw[:, xi], columns=list(regressors))
+            return absorb_ols_many(Y, X, self.fe, cov_type, self.clusters, add_const)
+        return _ols_many(list(outcomes), self.raw[:, yi], self.tilde[:, yi], list(regressors),
+                         self.raw[:, xi], self.tilde[:, xi], self.fe, cov_type, self.clusters,
+                         add_const)
+
+
+def stacked_table(results: dict) -> pd.DataFrame:
+    # one coefficient table per outcome, stacked with an outcome column and its sample size
+    tables = [res.table().assign(outcome=name, nobs=res.nobs) for name, res in results.items()]
+    return pd.concat(tables, ignore_index=True)[["outcome", "term", "coef", "std_err", "p_value",
+                                                 "nobs"]]
+
+
+def absorb_iv(y, exog: pd.DataFrame, endog: pd.DataFrame, instruments: pd.DataFrame,
+              fe: FixedEffects, cov_type: str = "HC1", clusters=None,
+              add_const: bool = True) -> AbsorbResult:
+    """2SLS with the fixed effects partialled out of y, regressors and instruments.
+
+    Residuals use the structural regressors (y - X b), not the first-stage fitted values.
+    """
+    yv = np.asarray(y, dtype=float)
+    Ev, Nv, Iv = (d.to_numpy(dtype=float) for d in (exog, endog, instruments))
+    yt, Et, Nt, It = (fe.demean(a) for a in (yv, Ev, Nv, Iv))
+    # instruments: exogenous regressors plus excluded instruments that survive the fixed effects
+    Zv, Zt = np.hstack([Ev, Iv]), np.hstack([Et, It])
+    Zk = Zt[:, independent_columns(Zt, Zv)]
+    Nhat = Zk @ np.linalg.lstsq(Zk, Nt, rcond=None)[0]
+    Xv, Xt, Xhat = np.hstack([Ev, Nv]), np.hstack([Et, Nt]), np.hstack([Et, Nhat])
+    keep = independent_columns(Xhat, Xv)
+    Xk, Xh = Xt[:, keep], Xhat[:, keep]
+    bread = np.linalg.inv(Xh.T @ Xh)
+    beta = bread @ (Xh.T @ yt)
+    e = yt - Xk @ beta
+    cov, df_resid = _covariance(Xh, e, bread, len(yv), fe.rank + len(keep), cov_type, clusters)
+    terms = list(exog.columns) + list(endog.columns)
+    dropped = [c for j, c in enumerate(terms) if j not in keep]
+    return AbsorbResult(terms, beta, cov, len(yv), df_resid, fe.rank, dropped, cov_type,
+                        fe.iterations, _const(yv, Xv[:, keep], beta) if add_const else None)
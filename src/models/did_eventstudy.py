@@ -1,54 +1,81 @@
 
 import argparse
-import pandas as pd
-import numpy as np
-import statsmodels.api as sm
+
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.models.absorb import FixedEffects, absorb_ols_many, warn_dropped
+from src.utils.io import categorize_keys, read_table
+
 
 def design_matrices(df, window=6):
-    # Build leads/lags dummies for event_time in [-window, +window], omit -1 as baseline
-    for k in range(-window, window+1):
-        df[f"E{k}"] = (df["event_time"] == k).astype(int)
+    # Sparse lead/lag indicators for event_time in [-window, +window], omit -1 as baseline.
+    # A row has at most one nonzero, so the design grows with rows, not with rows x window.
     baseline = -1
-    cols = [f"E{k}" for k in range(-window, window+1) if k != baseline]
-    # FE via dummies
-    entities = pd.get_dummies(df['firm_id'], drop_first=True, prefix='f')
-    times = pd.get_dummies(df['quarter'], drop_first=True, prefix='t')
-    X = pd.concat([pd.Series(1.0, index=df.index, name='const'), df[cols], entities, times], axis=1)
-    return X, cols
+    ks = [k for k in range(-window, window+1) if k != baseline]
+    pos = df["event_time"].map(dict(zip(ks, range(len(ks)), strict=True))).to_numpy(dtype=float)
+    rows = np.flatnonzero(~np.isnan(pos))
+    X = sparse.csr_matrix((np.ones(len(rows)), (rows, pos[rows].astype(int))),
+                          shape=(len(df), len(ks)))
+    return X, [f"E{k}" for k in ks]
 
-def run_eventstudy(df, out_csv=None, fig_path=None, window=6):
-    dfx = df.dropna(subset=["CCC","event_time"]).copy()
+def run_eventstudy(df, out_csv=None, fig_path=None, window=6, cov_type="HC1", tol=1e-10,
+                   outcomes=("CCC",), fe=None, event_time=None):
+    # several outcomes share one design factorization per missing-value pattern, each on the rows
+    # where it is observed; their tables are stacked with outcome and nobs columns.
+    # fe: FixedEffects of the rows with event_time and any outcome observed (reused across specs);
+    # event_time: per-row values used instead of df["event_time"] (one threshold of a sweep)
+    outcomes = list(outcomes)
+    et = (df["event_time"] if event_time is None
+          else pd.Series(np.asarray(event_time), index=df.index))
+    keep = df[outcomes].notna().any(axis=1) & et.notna()
+    # only the keys, outcomes and event_time are copied, not the whole panel
+    dfx = categorize_keys(df.loc[keep, ["firm_id", "quarter"] + outcomes]
+                          .assign(event_time=et[keep]))
+    fe = fe or FixedEffects.from_frame(dfx, tol=tol)
+    if fe.n != len(dfx):
+        raise ValueError(f"fe covers {fe.n} rows, the event-study sample has {len(dfx)}")
     X, cols = design_matrices(dfx, window=window)
-    y = dfx["CCC"]
-    model = sm.OLS(y, X)
-    res = model.fit(cov_type="HC1")
+    results = absorb_ols_many(dfx[outcomes], X, fe, cov_type=cov_type, clusters=dfx["firm_id"],
+                              terms=cols)
+    warn_dropped(results[outcomes[0]])
 
-    table = pd.DataFrame({
-        "term": cols,
-        "coef": res.params[cols].values,
-        "std_err": res.bse[cols].values,
-        "p_value": res.pvalues[cols].values,
-    })
-    # term -> k
-    table["k"] = table["term"].str.replace("E", "").astype(int)
-    table = table.sort_values("k")
+    tables = []
+    for name, res in results.items():
+        t = pd.DataFrame({
+            "term": cols,
+            "coef": res.params[cols].values,
+            "std_err": res.bse[cols].values,
+            "p_value": res.pvalues[cols].values,
+        })
+        # term -> k
+        t["k"] = t["term"].str.replace("E", "").astype(int)
+        t = t.sort_values("k")
+        if len(outcomes) > 1:
+            t = t.assign(outcome=name, nobs=res.nobs)[["outcome"] + list(t.columns) + ["nobs"]]
+        tables.append(t)
+    table = pd.concat(tables, ignore_index=len(outcomes) > 1)
 
     if out_csv:
         table.to_csv(out_csv, index=False)
 
     if fig_path:
         plt.figure()
-        k = table["k"]; b = table["coef"]; se = table["std_err"]
-        ci_lo = b - 1.96*se
-        ci_hi = b + 1.96*se
-        plt.plot(k, b, marker='o', label='β_k')
-        plt.fill_between(k, ci_lo, ci_hi, alpha=0.2, label='95% CI')
+        for name, t in zip(outcomes, tables, strict=True):
+            k, b, se = t["k"], t["coef"], t["std_err"]
+            ci_lo = b - 1.96*se
+            ci_hi = b + 1.96*se
+            lbl = f"β_k ({name})" if len(outcomes) > 1 else 'β_k'
+            plt.plot(k, b, marker='o', label=lbl)
+            plt.fill_between(k, ci_lo, ci_hi, alpha=0.2,
+                             label='95% CI' if len(outcomes) == 1 else None)
         plt.axhline(0, linestyle='--')
         plt.axvline(-1, linestyle=':')  # baseline
         plt.title('Event Study (baseline = -1)')
         plt.xlabel('Event time k')
-        plt.ylabel('Effect on CCC')
+        plt.ylabel(f'Effect on {outcomes[0]}' if len(outcomes) == 1 else 'Effect')
         plt.legend()
         plt.tight_layout()
         plt.savefig(fig_path, dpi=180)
@@ -57,14 +84,24 @@ def run_eventstudy(df, out_csv=None, fig_path=None, window=6):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--data", required=True, help="processed CSV with event_time")
+    ap.add_argument("--data", required=True,
+                    help="processed panel (.csv/.parquet/.feather) with event_time")
     ap.add_argument("--out", help="output CSV for event-study terms" )
     ap.add_argument("--fig", help="output figure path (png)" )
     ap.add_argument("--window", type=int, default=6, help="lead/lag window" )
+    ap.add_argument("--cov", default="HC1", choices=["HC1","cluster"],
+                    help="HC1 or clustered by firm")
+    ap.add_argument("--tol", type=float, default=1e-10,
+                    help="convergence tolerance of the FE demeaning")
+    ap.add_argument("--outcomes", nargs="+", default=["CCC"],
+                    help="dependent variables sharing the event-time design; "
+                         "more than one stacks the tables")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.data)
-    run_eventstudy(df, out_csv=args.out, fig_path=args.fig, window=args.window)
+    cols = list(dict.fromkeys(["firm_id","quarter"] + args.outcomes + ["event_time"]))
+    df = read_table(args.data, columns=cols, categorical_keys=True)
+    run_eventstudy(df, out_csv=args.out, fig_path=args.fig, window=args.window,
+                   cov_type=args.cov, tol=args.tol, outcomes=args.outcomes)
 
 if __name__ == '__main__':
     main()
@@ -1,55 +1,52 @@
-
 import argparse
+
 import pandas as pd
-import numpy as np
-
-def fe_via_statsmodels(df: pd.DataFrame):
-    import statsmodels.api as sm
-    # Build dummies for firm and quarter FE
-    entities = pd.get_dummies(df['firm_id'], drop_first=True, prefix='f')
-    times = pd.get_dummies(df['quarter'], drop_first=True, prefix='t')
-    X = pd.concat([pd.Series(1.0, index=df.index, name='const'),
-                   df[['IT_lag1','gscpi']],
-                   df[['IT_lag1']].mul(df['gscpi'], axis=0).rename(columns={'IT_lag1':'ITxGSCPI'}),
-                   entities, times], axis=1)
-    y = df['CCC']
-    res = sm.OLS(y, X).fit(cov_type='HC1')
-    out_df = pd.DataFrame({
-        "term": res.params.index,
-        "coef": res.params.values,
-        "std_err": res.bse.values,
-        "p_value": res.pvalues.values,
-    })
-    return res, out_df
+
+from src.models.absorb import FixedEffects, absorb_ols_many, stacked_table, warn_dropped
+from src.utils.io import categorize_keys, read_table
+
+REGRESSORS = ['IT_lag1', 'gscpi', 'ITxGSCPI']
+
+def fe_regression(df: pd.DataFrame, cov_type: str = "HC1", tol: float = 1e-10, outcomes=("CCC",),
+                  absorbed=None):
+    # outcomes on IT_lag1, gscpi and their interaction with firm and quarter effects absorbed;
+    # outcomes observed on the same rows share one factorization of the design
+    # ({outcome: result}, table).
+    # absorbed: an Absorbed of df's rows holding the outcomes and REGRESSORS, demeaned once
+    # elsewhere
+    if absorbed is not None:
+        res = absorbed.ols(list(outcomes), REGRESSORS, cov_type=cov_type)
+    else:
+        X = df[['IT_lag1','gscpi']].assign(ITxGSCPI=df['IT_lag1'] * df['gscpi'])
+        fe = FixedEffects.from_frame(df, tol=tol)
+        res = absorb_ols_many(df[list(outcomes)], X, fe, cov_type=cov_type, clusters=df['firm_id'])
+    # a single outcome keeps the plain term table
+    table = stacked_table(res) if len(res) > 1 else next(iter(res.values())).table()
+    return res, table
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--data", required=True)
     ap.add_argument("--out", required=True)
+    ap.add_argument("--cov", default="HC1", choices=["HC1","cluster"],
+                    help="HC1 or clustered by firm")
+    ap.add_argument("--tol", type=float, default=1e-10,
+                    help="convergence tolerance of the FE demeaning")
+    ap.add_argument("--outcomes", nargs="+", default=["CCC"],
+                    help="dependent variables sharing the design (e.g. CCC DIO DSO DPO); more than "
+                         "one writes a stacked table with outcome and nobs columns, each outcome "
+                         "on the rows it is observed")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.data)
-    df = df.dropna(subset=["CCC","IT_lag1","gscpi"]).copy()
-
-    try:
-        from linearmodels.panel import PanelOLS
-        import statsmodels.api as sm
-        df2 = df.copy()
-        df2["ITxGSCPI"] = df2["IT_lag1"] * df2["gscpi"]
-        df2 = df2.set_index(["firm_id","quarter"]).sort_index()
-        y = df2["CCC"]
-        X = sm.add_constant(df2[["IT_lag1","gscpi","ITxGSCPI"]])
-        mod = PanelOLS(y, X, entity_effects=True, time_effects=True)
-        res = mod.fit(cov_type="clustered", cluster_entity=True)
-        out_df = pd.DataFrame({
-            "term": res.params.index,
-            "coef": res.params.values,
-            "std_err": res.std_errors.values,
-            "p_value": res.pvalues.values,
-        })
-    except Exception as e:
-        # Fallback with statsmodels OLS + dummies
-        res, out_df = fe_via_statsmodels(df)
+    outcomes = list(dict.fromkeys(args.outcomes))
+    cols = list(dict.fromkeys(outcomes + ["IT_lag1","gscpi"]))
+    df = read_table(args.data, columns=["firm_id","quarter"] + cols, categorical_keys=True)
+    # rows without the regressors or without any outcome never enter a fit
+    df = df.dropna(subset=["IT_lag1","gscpi"])
+    df = categorize_keys(df[df[outcomes].notna().any(axis=1)].copy())
+
+    res, out_df = fe_regression(df, cov_type=args.cov, tol=args.tol, outcomes=outcomes)
+    warn_dropped(next(iter(res.values())))
 
     out_df.to_csv(args.out, index=False)
     print(f"Saved FE table -> {args.out} (rows={len(out_df)})")
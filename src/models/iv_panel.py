@@ -1,25 +1,24 @@
+import argparse
 
-import argparse, pandas as pd, numpy as np
+from src.models.absorb import FixedEffects, absorb_iv, warn_dropped
+from src.utils.io import categorize_keys, read_table
 
-def two_stage_ols(df, y_col, endog_cols, exog_df, instr_df):
-    import statsmodels.api as sm
-    # Align and drop NaNs across all needed columns
-    full = pd.concat([df[[y_col] + endog_cols], exog_df, instr_df], axis=1).dropna()
-    y = full[y_col]
-    endog = full[endog_cols]
-    exog = full[exog_df.columns]
-    instr = full[instr_df.columns]
-    # First stage
-    Z = pd.concat([pd.Series(1.0, index=full.index, name='const'), exog, instr], axis=1)
-    Xhat = {}
-    for c in endog.columns:
-        res1 = sm.OLS(endog[c], Z).fit()
-        Xhat[c] = res1.fittedvalues
-    Xhat_df = pd.DataFrame(Xhat, index=full.index)
-    # Second stage
-    X2 = pd.concat([pd.Series(1.0, index=full.index, name='const'), exog, Xhat_df], axis=1)
-    res2 = sm.OLS(y, X2).fit(cov_type="HC1")
-    return res2
+
+def fe_2sls(df, y_col, endog_cols, exog_cols, instr_cols, cov_type="HC1", tol=1e-10):
+    # 2SLS with firm and quarter effects absorbed; rows with NaNs in any needed column are dropped
+    full = df.dropna(subset=[y_col] + endog_cols + exog_cols + instr_cols)
+    fe = FixedEffects.from_frame(full, tol=tol)
+    return absorb_iv(full[y_col], full[exog_cols], full[endog_cols], full[instr_cols], fe,
+                     cov_type=cov_type, clusters=full["firm_id"])
+
+def iv_design(df, endog: str, instr: str):
+    # endogenous regressor and instrument, each with its GSCPI interaction:
+    # (df, endog_cols, instr_cols)
+    if instr not in df.columns:
+        raise ValueError(f"Missing instrument column: {instr}")
+    df = df.assign(**{f"{endog}xGSCPI": df[endog] * df["gscpi"],
+                      f"{instr}xGSCPI": df[instr] * df["gscpi"]})
+    return df, [endog, f"{endog}xGSCPI"], [instr, f"{instr}xGSCPI"]
 
 def main():
     ap = argparse.ArgumentParser()
@@ -27,37 +26,28 @@ def main():
     ap.add_argument("--out", required=True)
     ap.add_argument("--endog", default="IT_lag1")
     ap.add_argument("--instr", default="IV_peer_IT")
+    ap.add_argument("--cov", default="HC1", choices=["HC1","cluster"],
+                    help="HC1 or clustered by firm")
+    ap.add_argument("--tol", type=float, default=1e-10,
+                    help="convergence tolerance of the FE demeaning")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.data).dropna(subset=["CCC", args.endog, "gscpi"]).copy()
-
-    entities = pd.get_dummies(df['firm_id'], drop_first=True, prefix='f')
-    times = pd.get_dummies(df['quarter'], drop_first=True, prefix='t')
-    exog_df = pd.concat([df[["gscpi"]], entities, times], axis=1)
-
-    endog_cols = [args.endog, f"{args.endog}xGSCPI"]
-    df[f"{args.endog}xGSCPI"] = df[args.endog] * df["gscpi"]
+    df = read_table(args.data, columns=["firm_id","quarter","CCC", args.endog, "gscpi"],
+                    optional=[args.instr], categorical_keys=True)
+    df = categorize_keys(df.dropna(subset=["CCC", args.endog, "gscpi"]).copy())
 
     if args.instr not in df.columns:
         raise SystemExit(f"Missing instrument column: {args.instr}")
-    instr_df = pd.concat([df[[args.instr]], df[[args.instr]].mul(df['gscpi'], axis=0).rename(columns={args.instr:f'{args.instr}xGSCPI'})], axis=1)
+    df, endog_cols, instr_cols = iv_design(df, args.endog, args.instr)
 
-    try:
-        from linearmodels.iv import IV2SLS
-        import statsmodels.api as sm
-        full = pd.concat([df[["CCC"] + endog_cols], exog_df, instr_df], axis=1).dropna()
-        X = pd.concat([pd.Series(1.0, index=full.index, name="const"), full[exog_df.columns]], axis=1)
-        endog = full[endog_cols]
-        instr = full[instr_df.columns]
-        mod = IV2SLS(full["CCC"], X, endog, instr)
-        res = mod.fit(cov_type="robust")
-        out = res.summary.as_text()
-    except Exception as e:
-        res = two_stage_ols(df, "CCC", endog_cols, exog_df, instr_df)
-        out = str(res.summary()) + "\n\n[Note] Fallback 2SLS via two-stage OLS (HC1). Dropped rows with NaNs."
+    res = fe_2sls(df, "CCC", endog_cols, ["gscpi"], instr_cols, cov_type=args.cov, tol=args.tol)
+    warn_dropped(res)
+    out = res.summary("IV-2SLS, firm and quarter effects absorbed "
+                      f"(instruments: {', '.join(instr_cols)})")
+    out += "\n\n[Note] Dropped rows with NaNs."
 
     with open(args.out, "w", encoding="utf-8") as f:
-        f.write(out)
+        f.write(out + "\n")
     print(f"Saved IV results -> {args.out}")
 
 if __name__ == "__main__":
@@ -1,50 +1,64 @@
-
 import argparse
+
 import pandas as pd
 
-def fe_ols(y_col, X_cols, df):
-    import statsmodels.api as sm
-    entities = pd.get_dummies(df['firm_id'], drop_first=True, prefix='f')
-    times = pd.get_dummies(df['quarter'], drop_first=True, prefix='t')
-    X = pd.concat([pd.Series(1.0, index=df.index, name='const'), df[X_cols], entities, times], axis=1)
-    y = df[y_col]
-    res = sm.OLS(y, X).fit(cov_type='HC1')
-    return res
+from src.models.absorb import Absorbed, FixedEffects
+from src.utils.io import categorize_keys, read_table
+
+
+def mediation_paths(df, mediators, fe=None, cov_type="HC1", absorbed=None):
+    # IT_lag1, every mediator and CCC are demeaned once; the a-paths (mediators on IT_lag1) share
+    # one factorization, and each b/c' fit (CCC on IT_lag1 and M) reuses the same demeaned columns.
+    # A mediator with missing values is fitted on the rows where it is observed, like a
+    # single-mediator run.
+    # absorbed: an Absorbed of df's rows that already holds those columns
+    if absorbed is not None:
+        ab = absorbed
+    else:
+        fe = fe or FixedEffects.from_frame(df)
+        ab = Absorbed(df, ["IT_lag1", *mediators, "CCC"], fe, clusters=df['firm_id'])
+    res_M = ab.ols(mediators, ["IT_lag1"], cov_type=cov_type)
+    rows = []
+    for m in mediators:
+        res_Y = ab.ols(["CCC"], ["IT_lag1", m], cov_type=cov_type)["CCC"]
+        a = res_M[m].params.get("IT_lag1", float('nan'))
+        b = res_Y.params.get(m, float('nan'))
+        cprime = res_Y.params.get("IT_lag1", float('nan'))
+        ab_ = a*b if (a==a and b==b) else float('nan')
+        rows.append(pd.DataFrame({
+            "metric": ["a (IT→M)", "b (M→Y|IT)", "c' (IT→Y|M)", "a*b (statistical)"],
+            "value": [a, b, cprime, ab_]
+        }))
+    return rows
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--data", required=True)
     ap.add_argument("--out", required=True)
-    ap.add_argument("--mediator", default="DIO")
+    ap.add_argument("--mediator", nargs="+", default=["DIO"],
+                    help="one or more mediators (e.g. DIO DSO DPO); several add a mediator column "
+                         "to the table")
+    ap.add_argument("--cov", default="HC1", choices=["HC1","cluster"],
+                    help="HC1 or clustered by firm")
+    ap.add_argument("--tol", type=float, default=1e-10,
+                    help="convergence tolerance of the FE demeaning")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.data).dropna(subset=["CCC","IT_lag1", args.mediator]).copy()
-
-    # Try linearmodels; else fallback to OLS+dummies
-    try:
-        from linearmodels.panel import PanelOLS
-        import statsmodels.api as sm
-        def run_fe(y, X, d):
-            d2 = d.set_index(["firm_id","quarter"]).sort_index()
-            mod = PanelOLS(d2[y], sm.add_constant(d2[X]), entity_effects=True, time_effects=True)
-            return mod.fit(cov_type="clustered", cluster_entity=True)
-        res_M = run_fe(args.mediator, ["IT_lag1"], df)
-        res_Y = run_fe("CCC", ["IT_lag1", args.mediator], df)
-        a = res_M.params.get("IT_lag1", float('nan'))
-        b = res_Y.params.get(args.mediator, float('nan'))
-        cprime = res_Y.params.get("IT_lag1", float('nan'))
-    except Exception:
-        res_M = fe_ols(args.mediator, ["IT_lag1"], df)
-        res_Y = fe_ols("CCC", ["IT_lag1", args.mediator], df)
-        a = res_M.params.get("IT_lag1", float('nan'))
-        b = res_Y.params.get(args.mediator, float('nan'))
-        cprime = res_Y.params.get("IT_lag1", float('nan'))
+    mediators = list(dict.fromkeys(args.mediator))
+    cols = list(dict.fromkeys(["CCC","IT_lag1"] + mediators))
+    df = read_table(args.data, columns=["firm_id","quarter"] + cols, categorical_keys=True)
+    # each mediator keeps its own rows; only rows no path can use are dropped
+    df = df.dropna(subset=["CCC","IT_lag1"])
+    df = categorize_keys(df[df[mediators].notna().any(axis=1)].copy())
 
-    ab = a*b if (a==a and b==b) else float('nan')
-    out = pd.DataFrame({
-        "metric": ["a (IT→M)", "b (M→Y|IT)", "c' (IT→Y|M)", "a*b (statistical)"],
-        "value": [a, b, cprime, ab]
-    })
+    fe = FixedEffects.from_frame(df, tol=args.tol)
+    rows = mediation_paths(df, mediators, fe, cov_type=args.cov)
+    if len(rows) == 1:
+        out = rows[0]
+    else:
+        out = pd.concat([r.assign(mediator=m, nobs=int(df[m].notna().sum()))
+                         for m, r in zip(mediators, rows, strict=True)], ignore_index=True)
+        out = out[["mediator","metric","value","nobs"]]
     out.to_csv(args.out, index=False)
     print(f"Saved mediation -> {args.out}")
 
@@ -1,112 +1,289 @@
-
-import argparse, re, os
+import argparse
 from pathlib import Path
-import pandas as pd
+
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import StratifiedKFold, cross_val_predict
-from sklearn.metrics import f1_score, confusion_matrix, classification_report
-from sklearn.pipeline import make_pipeline
-
-def load_corpus(input_dir: Path):
-    rows = []
-    for p in sorted(input_dir.glob("*.txt")):
-        text = p.read_text(encoding="utf-8", errors="ignore")
-        stem = p.stem  # firm_year
-        m = re.match(r"(.+)_([0-9]{4})$", stem)
-        if m:
-            firm_id, year = m.group(1), m.group(2)
-        else:
-            firm_id, year = stem, "0000"
-        rows.append({"firm_id": firm_id, "year": year, "text": text})
-    return pd.DataFrame(rows)
+import pandas as pd
+import sklearn
+from scipy import sparse
+from sklearn.metrics import classification_report, confusion_matrix, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from src.text.cache import DocCache, fingerprint, hash_file, hash_files
+from src.text.corpus import iter_batches, list_corpus, read_doc, score_corpus, section_reader
+from src.text.cv import VEC_KW, build_pipeline, cross_validate, param_grid
+from src.text.dedup import MinHashLSH, score_with_dedup
+from src.text.keywords import KEYWORDS, KeywordMatcher, save_hits, score_hits
+from src.text.model_io import load_model, save_model
+from src.text.ooc import build_hashing_pipeline, ooc_cross_val, partial_fit_paths
+from src.text.sections import parse_sections
+from src.utils.io import write_table
+
+
+def parse_list(s: str, cast):
+    return [cast(v) for v in s.split(",")] if s else None
+
+def parse_ngram(s: str):
+    lo, hi = s.split("-")
+    return (int(lo), int(hi))
+
+def write_eval(eval_dir, y_true, y_pred, tables=None):
+    f1 = f1_score(y_true, y_pred)
+    cm = confusion_matrix(y_true, y_pred)
+    report = classification_report(y_true, y_pred, digits=3)
+    Path(eval_dir).mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"metric":["F1"], "value":[f1]}).to_csv(Path(eval_dir)/"it_eval.csv", index=False)
+    pd.DataFrame(cm, columns=["pred_0","pred_1"], index=["true_0","true_1"]).to_csv(
+        Path(eval_dir)/"it_confusion_matrix.csv")
+    with open(Path(eval_dir)/"it_classification_report.txt","w",encoding="utf-8") as f:
+        f.write(report)
+    for name, table in (tables or {}).items():
+        table.to_csv(Path(eval_dir)/name, index=False)
+
+QUARTERS = np.array(["Q1","Q2","Q3","Q4"])
+
+def expand_quarters(df: pd.DataFrame) -> pd.DataFrame:
+    # Cross join of documents with the four quarter suffixes, built with repeat/tile (no row loop)
+    firm = pd.Categorical(df["firm_id"])
+    n = len(df)
+    return pd.DataFrame({
+        "firm_id": pd.Categorical.from_codes(np.repeat(firm.codes, 4), categories=firm.categories),
+        "quarter": np.char.add(np.repeat(df["year"].to_numpy(dtype=str), 4), np.tile(QUARTERS, n)),
+        "IT_index": np.repeat(df["IT_index"].to_numpy(dtype=float), 4),
+    })
+
+def write_it_index(out: pd.DataFrame, path) -> None:
+    # .parquet/.feather keep categorical firm_id/quarter and float64 IT_index; .csv as before
+    write_table(out, path)
+
+def load_corpus(input_dir: Path, batch_size: int = 256, workers: int = 4):
+    # Eager variant kept for small corpora/notebooks; main() streams via list_corpus + score_corpus
+    df = list_corpus(input_dir)
+    texts = [t for batch in iter_batches(df["path"], batch_size, workers) for t in batch]
+    return df.drop(columns="path").assign(text=texts)
 
 def main():
-    ap = argparse.ArgumentParser(description="Build supervised IT index from 10-K text with evaluation")
+    ap = argparse.ArgumentParser(
+        description="Build supervised IT index from 10-K text with evaluation")
     ap.add_argument("--input", required=True, help="directory of 10-K .txt files")
-    ap.add_argument("--output", required=True, help="output CSV with firm_id,quarter,IT_index")
-    ap.add_argument("--labels_csv", help="CSV with columns: firm_id,year,label[,text] for supervised training")
+    ap.add_argument("--output", required=True,
+                    help="output .csv, .parquet or .feather with firm_id,quarter,IT_index")
+    ap.add_argument("--labels_csv",
+                    help="CSV with columns: firm_id,year,label[,text] for supervised training")
     ap.add_argument("--eval_dir", help="directory to save evaluation tables (csv/txt)")
+    ap.add_argument("--batch_size", type=int, default=256, help="documents per read/score batch")
+    ap.add_argument("--workers", type=int, default=4, help="threads reading documents")
+    ap.add_argument("--cache",
+                    help="SQLite document-score cache; reruns only score new or changed files")
+    ap.add_argument("--cv_jobs", type=int, default=-1,
+                    help="parallel CV fold fits (-1 = all cores)")
+    ap.add_argument("--grid_ngram", help="comma list of ngram ranges, e.g. 1-1,1-2 (default 1-2)")
+    ap.add_argument("--grid_max_features", help="comma list, e.g. 20000,40000 (default 40000)")
+    ap.add_argument("--grid_C", help="comma list of LogisticRegression C values (default 1.0)")
+    ap.add_argument("--train_mode", default="memory", choices=["memory","ooc"],
+                    help="ooc: hashed features + SGD partial_fit over mini-batches streamed "
+                         "from disk")
+    ap.add_argument("--ooc_epochs", type=int, default=5,
+                    help="passes over the labeled documents (ooc mode)")
+    ap.add_argument("--hash_features", type=int, default=2**20,
+                    help="hashing vectorizer width (ooc mode)")
+    ap.add_argument("--kw_hits",
+                    help="keyword mode: save sparse document x keyword hit counts (.npz)")
+    ap.add_argument("--save_model", help="save the fitted classifier to this artifact (.joblib)")
+    ap.add_argument("--model",
+                    help="score-only mode: load a saved classifier artifact, no training")
+    ap.add_argument("--dedup_index",
+                    help="MinHash/LSH index file; near-duplicate filings reuse a neighbor's score")
+    ap.add_argument("--dedup_threshold", type=float, default=0.9,
+                    help="estimated Jaccard similarity to reuse a score")
+    ap.add_argument("--dedup_report",
+                    help="CSV listing documents whose score was reused and their neighbor")
+    ap.add_argument("--sections",
+                    help="comma list of 10-K items to keep before vectorizing, e.g. 1,7 "
+                         "(default: full text)")
     args = ap.parse_args()
+    if args.kw_hits and (args.labels_csv or args.model):
+        raise SystemExit("--kw_hits applies to the keyword fallback (no --labels_csv/--model)")
+    if args.model and (args.labels_csv or args.save_model):
+        raise SystemExit("--model scores with a saved classifier; drop --labels_csv/--save_model")
+    if args.save_model and not args.labels_csv:
+        raise SystemExit("--save_model requires --labels_csv")
+    if args.kw_hits and args.dedup_index:
+        raise SystemExit("--kw_hits needs every document scanned; drop --dedup_index")
 
     input_dir = Path(args.input)
-    df_corpus = load_corpus(input_dir)
+    df_corpus = list_corpus(input_dir)
     if df_corpus.empty:
         raise SystemExit("No .txt files found in input directory.")
 
-    # If labels provided, train supervised classifier
-    if args.labels_csv:
-        df_lbl = pd.read_csv(args.labels_csv)
+    sections = parse_sections(args.sections)
+    if args.model:
+        pipe, art = load_model(args.model)
+        print(f"[INFO] Loaded IT model {args.model} (created {art['created']})")
+        # score on the same 10-K sections the model was trained on unless overridden
+        sections = sections or art["meta"].get("sections")
+    reader = section_reader(sections) if sections else read_doc
+
+    cache = DocCache(args.cache) if args.cache else None
+    if cache or args.dedup_index:
+        df_corpus["doc_hash"] = hash_files(df_corpus["path"], workers=args.workers)
+
+    # Scoring configuration fingerprint: cached scores are reused only under the same one
+    if args.model:
+        fp = fingerprint("model", hash_file(args.model), sections)
+    elif args.labels_csv:
         need_cols = {"firm_id","year","label"}
+        # ooc mode reads document text from --input only (any labels text column is ignored)
+        usecols = (lambda c: c in need_cols) if args.train_mode == "ooc" else None
+        df_lbl = pd.read_csv(args.labels_csv, dtype={"firm_id": str, "year": str}, usecols=usecols)
         if not need_cols.issubset(df_lbl.columns):
             raise SystemExit(f"labels_csv must contain columns: {need_cols}")
         # Merge labels onto corpus; prefer labels' text if present
-        df = df_corpus.merge(df_lbl, on=["firm_id","year"], how="left", suffixes=("","_lbl"))
-        if "text_lbl" in df.columns and df["text_lbl"].notna().any():
-            df["text"] = df["text_lbl"].fillna(df["text"])
-        # Supervised subset
-        train = df.dropna(subset=["label"]).copy()
+        df = df_corpus.merge(df_lbl, on=["firm_id","year"], how="left")
+        labeled = df.dropna(subset=["label"])
+        # Hyperparameter candidates (a single default TF-IDF + LogisticRegression unless a grid
+        # is given)
+        grid = param_grid(parse_list(args.grid_ngram, parse_ngram),
+                          parse_list(args.grid_max_features, int), parse_list(args.grid_C, float))
+        model_spec = (["ooc", args.hash_features, args.ooc_epochs, args.batch_size]
+                      if args.train_mode == "ooc" else [grid, VEC_KW])
+        fp = fingerprint("supervised", sklearn.__version__, model_spec, hash_file(args.labels_csv),
+                         sorted(labeled["doc_hash"]) if cache else None, sections)
+    else:
+        fp = fingerprint("keywords", KEYWORDS, sections)
+
+    df_corpus["IT_index_raw"] = np.nan
+    if cache:
+        cached = cache.get_many(df_corpus["doc_hash"], fp, with_payload=bool(args.kw_hits))
+        if args.kw_hits:
+            # a cached score without its hit row cannot fill the hit matrix; rescore it
+            cached = {h: v for h, v in cached.items() if v[1] is not None}
+            scores = {h: v[0] for h, v in cached.items()}
+            df_corpus["IT_index_raw"] = df_corpus["doc_hash"].map(scores).astype(float)
+        else:
+            df_corpus["IT_index_raw"] = df_corpus["doc_hash"].map(cached).astype(float)
+    todo = df_corpus["IT_index_raw"].isna()
+    if cache:
+        print(f"[INFO] Cache: reused {int((~todo).sum())} of {len(df_corpus)} documents, "
+              f"scoring {int(todo.sum())}")
+
+    # If labels provided, train supervised classifier
+    need_fit = bool(todo.any() or args.save_model)
+    if args.labels_csv and args.train_mode == "ooc" and (args.eval_dir or need_fit):
+        # Out-of-core: hashed features + partial_fit, labeled text streamed from disk in
+        # mini-batches
+        fit_kw = dict(epochs=args.ooc_epochs, batch_size=args.batch_size, workers=args.workers,
+                      reader=reader)
+        pipe_kw = dict(n_features=args.hash_features)
+        y = labeled["label"].astype(int).to_numpy()
+        if args.eval_dir:
+            skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+            y_pred, y_prob = ooc_cross_val(labeled["path"], y, skf, pipe_kw=pipe_kw, **fit_kw)
+            write_eval(args.eval_dir, y, y_pred)
+        if need_fit:
+            pipe = partial_fit_paths(build_hashing_pipeline(**pipe_kw), labeled["path"], y,
+                                     **fit_kw)
+            model_meta = {"train_mode": "ooc", **pipe_kw, "epochs": args.ooc_epochs,
+                          "sections": sections}
+    elif args.labels_csv and (args.eval_dir or need_fit):
+        # Supervised subset; only labeled documents are read into memory
+        train = labeled.copy()
         train["label"] = train["label"].astype(int)
-        # Build pipeline
-        pipe = make_pipeline(
-            TfidfVectorizer(ngram_range=(1,2), max_features=40000, stop_words="english", min_df=2),
-            LogisticRegression(max_iter=200, n_jobs=None)
-        )
-        # CV predictions for evaluation
-        skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-        y_pred = cross_val_predict(pipe, train["text"], train["label"], cv=skf, method="predict")
-        y_prob = cross_val_predict(pipe, train["text"], train["label"], cv=skf, method="predict_proba")[:,1]
-
-        f1 = f1_score(train["label"], y_pred)
-        cm = confusion_matrix(train["label"], y_pred)
-        report = classification_report(train["label"], y_pred, digits=3)
+        if "text" not in train.columns:
+            train["text"] = pd.Series(np.nan, index=train.index, dtype=object)
+        need = train["text"].isna()
+        batches = iter_batches(train.loc[need, "path"], args.batch_size, args.workers,
+                               reader=reader)
+        train.loc[need, "text"] = [t for batch in batches for t in batch]
+
+        # CV predictions for evaluation (and grid selection): one fit per fold and candidate,
+        # folds in parallel
+        best = grid[0]
+        if args.eval_dir or len(grid) > 1:
+            skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+            cv_table, best, y_pred, y_prob = cross_validate(train["text"], train["label"], skf,
+                                                            grid=grid, n_jobs=args.cv_jobs)
+            print(f"[INFO] CV best params: {best}")
+        if args.eval_dir:
+            write_eval(args.eval_dir, train["label"], y_pred, {"it_cv_grid.csv": cv_table})
 
         # Fit on full labeled data for deployment
-        pipe.fit(train["text"], train["label"])
+        if need_fit:
+            pipe = build_pipeline(**best)
+            pipe.fit(train["text"], train["label"])
+            model_meta = {"train_mode": "memory", **best, "sections": sections}
 
-        # Predict IT probability for all documents
-        it_prob = pipe.predict_proba(df_corpus["text"])[:,1]
-        df_corpus["IT_index_raw"] = it_prob
+    if args.save_model:
+        save_model(pipe, args.save_model, labels_csv=str(args.labels_csv), n_labeled=len(labeled),
+                   **model_meta)
+        print(f"[OK] Saved IT model -> {args.save_model}")
 
-        # Save eval files
-        if args.eval_dir:
-            Path(args.eval_dir).mkdir(parents=True, exist_ok=True)
-            pd.DataFrame({"metric":["F1"], "value":[f1]}).to_csv(Path(args.eval_dir)/"it_eval.csv", index=False)
-            pd.DataFrame(cm, columns=["pred_0","pred_1"], index=["true_0","true_1"]).to_csv(Path(args.eval_dir)/"it_confusion_matrix.csv")
-            with open(Path(args.eval_dir)/"it_classification_report.txt","w",encoding="utf-8") as f:
-                f.write(report)
-    else:
-        # Fallback: keyword heuristic => proxy score (still numeric)
-        KEYWORDS = [
-            r"e[-\s]?commerce", r"electronic\s+catalog", r"\bEDI\b", r"platform",
-            r"digital\s+marketplace", r"online\s+order", r"B2B\s+portal",
-            r"supply\s+chain\s+integration", r"\bAPI\b", r"ERP\s+integration"
-        ]
-        def kw_score(s:str) -> float:
-            sc=0.0
-            for kw in KEYWORDS:
-                if re.search(kw, s, flags=re.I):
-                    sc+=1.0
-            return sc
-        df_corpus["IT_index_raw"] = df_corpus["text"].apply(kw_score)
+    hit_parts = []
+    if todo.any():
+        if args.labels_csv or args.model:
+            # vectorized predict_proba per batch
+            def score_fn(texts):
+                return pipe.predict_proba(texts)[:,1]
+        else:
+            # Fallback: keyword heuristic => proxy score (still numeric), one scan per document
+            matcher = KeywordMatcher(KEYWORDS)
+            def score_fn(texts):
+                h = matcher.hits(texts)
+                hit_parts.append(h)
+                return score_hits(h)
+        # Score only new/changed documents, streaming text in batches
+        if args.dedup_index:
+            index = (MinHashLSH.load(args.dedup_index) if Path(args.dedup_index).exists()
+                     else MinHashLSH())
+            # neighbors indexed by earlier runs contribute their cached score under the current
+            # fingerprint
+            lookup = (lambda h: cache.get_many([h], fp).get(h)) if cache else (lambda h: None)
+            rows = df_corpus.loc[todo]
+            scores, near, sim, st = score_with_dedup(
+                rows["doc_hash"].tolist(), rows["path"], score_fn, index, lookup,
+                threshold=args.dedup_threshold, batch_size=args.batch_size, workers=args.workers,
+                reader=reader,
+                meta=rows[["firm_id","year"]].to_dict("records"))
+            index.save(args.dedup_index)
+            print(f"[INFO] Dedup: scored {st['scored']}, reused {st['reused']} of {st['docs']} "
+                  f"documents; skipped {st['chars_skipped'] / max(st['chars_total'], 1):.1%} "
+                  f"of text ({len(index)} indexed)")
+            if args.dedup_report:
+                rep = rows[["firm_id","year"]].assign(near_dup_of=near, similarity=sim)
+                meta = rep["near_dup_of"].map(lambda k: index.meta.get(k, {}))
+                rep["near_firm_id"] = meta.map(lambda m: m.get("firm_id"))
+                rep["near_year"] = meta.map(lambda m: m.get("year"))
+                Path(args.dedup_report).parent.mkdir(parents=True, exist_ok=True)
+                rep.dropna(subset=["near_dup_of"]).to_csv(args.dedup_report, index=False)
+        else:
+            scores = score_corpus(df_corpus.loc[todo, "path"], score_fn, batch_size=args.batch_size,
+                                  workers=args.workers, reader=reader)
+        df_corpus.loc[todo, "IT_index_raw"] = scores
+        if cache:
+            # keyword mode keeps each document's hit row next to its score
+            payloads = ([r.tobytes() for r in sparse.vstack(hit_parts).toarray().astype(np.int32)]
+                        if hit_parts and not args.dedup_index else None)
+            cache.put_many(df_corpus.loc[todo, "doc_hash"].tolist(), scores, fp, payloads=payloads)
+
+    if args.kw_hits:
+        todo_idx, cached_idx = np.flatnonzero(todo), np.flatnonzero(~todo)
+        parts = list(hit_parts)
+        if len(cached_idx):
+            rows = [np.frombuffer(cached[h][1], dtype=np.int32)
+                    for h in df_corpus["doc_hash"].iloc[cached_idx]]
+            parts.append(sparse.csr_matrix(np.vstack(rows)))
+        order = np.argsort(np.concatenate([todo_idx, cached_idx]))
+        save_hits(args.kw_hits, sparse.vstack(parts).tocsr()[order], KEYWORDS, df_corpus)
+        print(f"[OK] Keyword hit matrix ({len(df_corpus)} x {len(KEYWORDS)}) -> {args.kw_hits}")
+    if cache:
+        cache.close()
 
     # Z-score standardization across firms/years
     x = df_corpus["IT_index_raw"]
     df_corpus["IT_index"] = (x - x.mean()) / (x.std(ddof=0) if x.std(ddof=0)>0 else 1.0)
 
     # Expand to quarters
-    out_rows = []
-    for _, r in df_corpus.iterrows():
-        for q in ["Q1","Q2","Q3","Q4"]:
-            out_rows.append({
-                "firm_id": r["firm_id"],
-                "quarter": f"{r['year']}{q}",
-                "IT_index": r["IT_index"]
-            })
-    out = pd.DataFrame(out_rows)
-    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(args.output, index=False)
+    out = expand_quarters(df_corpus)
+    write_it_index(out, args.output)
     print(f"Wrote {len(out)} rows -> {args.output}")
 
 if __name__ == "__main__":
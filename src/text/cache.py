@@ -0,0 +1,60 @@
+import hashlib
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def hash_file(path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def hash_files(paths, workers: int = 4) -> list:
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        return list(ex.map(hash_file, paths))
+
+def fingerprint(*parts) -> str:
+    # Stable digest of the scoring configuration (keyword set, model params, labels hash, ...)
+    blob = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+class DocCache:
+    """Persistent per-document IT_index_raw scores keyed on (content hash, scoring fingerprint)."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        # payload: optional per-document blob stored alongside the score (e.g. sparse feature rows)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS doc_scores ("
+            " doc_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, score REAL NOT NULL, payload BLOB,"
+            " PRIMARY KEY (doc_hash, fingerprint))"
+        )
+        self.conn.commit()
+
+    def get_many(self, hashes, fp: str, with_payload: bool = False) -> dict:
+        out = {}
+        uniq = list(dict.fromkeys(hashes))
+        col = "score, payload" if with_payload else "score"
+        for i in range(0, len(uniq), 500):
+            chunk = uniq[i:i + 500]
+            q = (f"SELECT doc_hash, {col} FROM doc_scores WHERE fingerprint = ? "
+                 f"AND doc_hash IN ({','.join('?' * len(chunk))})")
+            for row in self.conn.execute(q, [fp, *chunk]):
+                out[row[0]] = tuple(row[1:]) if with_payload else row[1]
+        return out
+
+    def put_many(self, hashes, scores, fp: str, payloads=None) -> None:
+        payloads = payloads if payloads is not None else [None] * len(hashes)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO doc_scores (doc_hash, fingerprint, score, payload) "
+            "VALUES (?, ?, ?, ?)",
+            [(h, fp, float(s), p) for h, s, p in zip(hashes, scores, payloads, strict=True)],
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,61 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.text.sections import extract_sections
+
+
+def parse_firm_year(stem: str):
+    # firm_year, e.g. firm001_2020
+    m = re.match(r"(.+)_([0-9]{4})$", stem)
+    if m:
+        return m.group(1), m.group(2)
+    return stem, "0000"
+
+def list_corpus(input_dir: Path) -> pd.DataFrame:
+    # Document index only (firm_id, year, path); text is read lazily in batches
+    rows = []
+    for p in sorted(Path(input_dir).glob("*.txt")):
+        firm_id, year = parse_firm_year(p.stem)
+        rows.append({"firm_id": firm_id, "year": year, "path": str(p)})
+    return pd.DataFrame(rows, columns=["firm_id", "year", "path"])
+
+def read_doc(path) -> str:
+    # One document in memory at a time per worker; memory is bounded by batch size, not file size
+    return Path(path).read_text(encoding="utf-8", errors="ignore")
+
+def iter_batches(paths, batch_size: int = 256, workers: int = 4, reader=read_doc):
+    # Yield lists of texts in path order. The next batch is read in the thread pool while
+    # the caller works on the current one, so at most two batches are held in memory.
+    # reader maps a path to the text to use (e.g. only selected 10-K sections).
+    paths = list(paths)
+    if not paths:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        def submit(start):
+            return [ex.submit(reader, p) for p in paths[start:start + batch_size]]
+        pending = submit(0)
+        for start in range(0, len(paths), batch_size):
+            nxt = submit(start + batch_size) if start + batch_size < len(paths) else None
+            yield [f.result() for f in pending]
+            pending = nxt
+
+def iter_corpus(paths, batch_size: int = 256, workers: int = 4, reader=read_doc):
+    for batch in iter_batches(paths, batch_size=batch_size, workers=workers, reader=reader):
+        yield from batch
+
+def section_reader(items):
+    # Reader keeping only the given 10-K items; the full filing is dropped right after extraction
+    def read(path):
+        return extract_sections(read_doc(path), items)[0]
+    return read
+
+def score_corpus(paths, score_fn, batch_size: int = 256, workers: int = 4,
+                 reader=read_doc) -> np.ndarray:
+    # score_fn maps a list of texts to an array of scores (e.g. predict_proba on a batch)
+    batches = iter_batches(paths, batch_size=batch_size, workers=workers, reader=reader)
+    parts = [np.asarray(score_fn(batch), dtype=float) for batch in batches]
+    return np.concatenate(parts) if parts else np.array([], dtype=float)
@@ -0,0 +1,77 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score
+from sklearn.pipeline import make_pipeline
+
+# Fixed vectorizer settings; ngram_range/max_features/C are the tunable ones
+VEC_KW = {"stop_words": "english", "min_df": 2}
+DEFAULT_PARAMS = {"ngram_range": (1, 2), "max_features": 40000, "C": 1.0}
+
+def build_pipeline(ngram_range=(1, 2), max_features=40000, C=1.0):
+    return make_pipeline(
+        TfidfVectorizer(ngram_range=tuple(ngram_range), max_features=max_features, **VEC_KW),
+        LogisticRegression(C=C, max_iter=200),
+    )
+
+def param_grid(ngram_ranges=None, max_features=None, Cs=None) -> list:
+    ngram_ranges = ngram_ranges or [DEFAULT_PARAMS["ngram_range"]]
+    max_features = max_features or [DEFAULT_PARAMS["max_features"]]
+    Cs = Cs or [DEFAULT_PARAMS["C"]]
+    return [{"ngram_range": tuple(ng), "max_features": mf, "C": c}
+            for ng, mf, c in product(ngram_ranges, max_features, Cs)]
+
+def top_terms(counts, k):
+    # Columns TfidfVectorizer(max_features=k) would keep: k most frequent terms, vocabulary order
+    tfs = np.asarray(counts.sum(axis=0)).ravel()
+    if k is None or k >= len(tfs):
+        return np.arange(len(tfs))
+    return np.sort(np.argsort(-tfs, kind="stable")[:k])
+
+def _fit_fold(texts, y, train_idx, test_idx, ngram_range, candidates):
+    # Tokenize once per (fold, ngram_range); every max_features/C candidate reuses these counts
+    vec = CountVectorizer(ngram_range=ngram_range, **VEC_KW)
+    c_tr = vec.fit_transform(texts[train_idx])
+    c_te = vec.transform(texts[test_idx])
+    out = []
+    for i, params in candidates:
+        cols = top_terms(c_tr, params["max_features"])
+        tfidf = TfidfTransformer()
+        x_tr = tfidf.fit_transform(c_tr[:, cols])
+        x_te = tfidf.transform(c_te[:, cols])
+        clf = LogisticRegression(C=params["C"], max_iter=200).fit(x_tr, y[train_idx])
+        # Labels and probabilities come from the same fitted fold model
+        out.append((i, test_idx, clf.predict(x_te), clf.predict_proba(x_te)[:, 1]))
+    return out
+
+def cross_validate(texts, y, cv, grid=None, n_jobs=-1):
+    """Out-of-fold labels/probabilities for every grid candidate, one fit per fold and candidate.
+
+    Returns (grid results table, best params, y_pred, y_prob) where the predictions belong to the
+    candidate with the highest out-of-fold F1 (first in grid order on ties).
+    """
+    texts = np.asarray(list(texts), dtype=object)
+    y = np.asarray(y)
+    grid = grid or [dict(DEFAULT_PARAMS)]
+    by_ngram = {}
+    for i, params in enumerate(grid):
+        by_ngram.setdefault(tuple(params["ngram_range"]), []).append((i, params))
+    tasks = [(tr, te, ng, cands) for tr, te in cv.split(texts, y) for ng, cands in by_ngram.items()]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(texts, y, tr, te, ng, cands) for tr, te, ng, cands in tasks
+    )
+    preds = np.zeros((len(grid), len(y)), dtype=y.dtype)
+    probs = np.zeros((len(grid), len(y)))
+    for fold in results:
+        for i, test_idx, pred, prob in fold:
+            preds[i, test_idx] = pred
+            probs[i, test_idx] = prob
+    table = pd.DataFrame(grid)
+    table["ngram_range"] = table["ngram_range"].map(lambda ng: f"{ng[0]}-{ng[1]}")
+    table["f1"] = [f1_score(y, p) for p in preds]
+    best = int(np.argmax(table["f1"].to_numpy()))
+    return table, grid[best], preds[best], probs[best]
@@ -0,0 +1,123 @@
+import pickle
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from src.text.corpus import iter_batches, read_doc
+
+MERSENNE = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_RE = re.compile(r"\w+")
+
+class MinHashLSH:
+    """MinHash signatures over word shingles with banded LSH buckets; grows incrementally."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE), num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE), num_perm, dtype=np.uint64)
+        self.num_perm, self.bands, self.shingle = num_perm, bands, shingle
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]
+        self.sigs = {}
+        self.meta = {}
+
+    def __len__(self):
+        return len(self.sigs)
+
+    def signature(self, text: str, chunk: int = 4096) -> np.ndarray:
+        words = WORD_RE.findall(text.lower())
+        n = max(len(words) - self.shingle + 1, 1)
+        shingles = (" ".join(words[i:i + self.shingle]).encode("utf-8") for i in range(n))
+        hv = np.fromiter((zlib.crc32(s) for s in shingles), dtype=np.uint64, count=n)
+        sig = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # (a*h + b) mod p, masked to 32 bits; chunked so long filings do not build a huge
+        # perm x shingle matrix
+        for i in range(0, len(hv), chunk):
+            ph = (np.outer(self.a, hv[i:i + chunk]) + self.b[:, None]) % MERSENNE
+            ph = np.bitwise_and(ph, MAX_HASH)
+            sig = np.minimum(sig, ph.min(axis=1))
+        return sig
+
+    def _band_keys(self, sig):
+        return [sig[r * self.rows:(r + 1) * self.rows].tobytes() for r in range(self.bands)]
+
+    def insert(self, key, sig, **meta) -> None:
+        if key in self.sigs:
+            return
+        self.sigs[key] = sig
+        if meta:
+            self.meta[key] = meta
+        for band, bk in zip(self.buckets, self._band_keys(sig), strict=True):
+            band.setdefault(bk, []).append(key)
+
+    def best_match(self, sig, threshold: float, accept=None):
+        # Most similar indexed document with estimated Jaccard >= threshold (and accept(key) true)
+        cands = {k for band, bk in zip(self.buckets, self._band_keys(sig), strict=True)
+                 for k in band.get(bk, ())}
+        best, best_sim = None, threshold
+        for k in cands:
+            if accept is not None and not accept(k):
+                continue
+            sim = float(np.mean(self.sigs[k] == sig))
+            if sim >= best_sim:
+                best, best_sim = k, sim
+        return (best, best_sim) if best is not None else (None, 0.0)
+
+    def save(self, path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path) -> "MinHashLSH":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+def score_with_dedup(keys, paths, score_fn, index: MinHashLSH, lookup, threshold: float = 0.9,
+                     batch_size: int = 256, workers: int = 4, reader=read_doc, meta=None):
+    """Score documents, reusing the score of an already-scored near duplicate when one exists.
+
+    lookup(key) returns the known score of an indexed document (or None). Documents scored here
+    are added to the index, so later duplicates in the same run are caught too.
+    Returns (scores, near_dup_of, similarity, stats).
+    """
+    n = len(keys)
+    scores = np.empty(n)
+    near, sim = [None] * n, np.zeros(n)
+    known = {}
+    stats = {"docs": n, "scored": 0, "reused": 0, "chars_total": 0, "chars_skipped": 0}
+    def get(k):
+        return known[k] if k in known else lookup(k)
+
+    batches = iter_batches(paths, batch_size=batch_size, workers=workers, reader=reader)
+    for start, texts in zip(range(0, n, batch_size), batches, strict=True):
+        fresh, alias, pending = [], {}, set()
+        for j, text in enumerate(texts):
+            i = start + j
+            sig = index.signature(text)
+            nb, s = index.best_match(sig, threshold, accept=lambda k, pending=pending:
+                                     k in pending or get(k) is not None)
+            stats["chars_total"] += len(text)
+            if nb is None:
+                fresh.append(j)
+                pending.add(keys[i])
+                index.insert(keys[i], sig, **(meta[i] if meta else {}))
+            else:
+                alias[j] = nb
+                near[i], sim[i] = nb, s
+                stats["chars_skipped"] += len(text)
+        if fresh:
+            fresh_scores = np.asarray(score_fn([texts[j] for j in fresh]), dtype=float)
+            for j, v in zip(fresh, fresh_scores, strict=True):
+                scores[start + j] = v
+                known[keys[start + j]] = v
+        for j, nb in alias.items():
+            scores[start + j] = get(nb)
+        stats["scored"] += len(fresh)
+        stats["reused"] += len(alias)
+    return scores, near, sim, stats
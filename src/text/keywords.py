@@ -0,0 +1,78 @@
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Keyword heuristic for the no-labels fallback: IT_index_raw = number of distinct keywords present
+KEYWORDS = [
+    r"e[-\s]?commerce", r"electronic\s+catalog", r"\bEDI\b", r"platform",
+    r"digital\s+marketplace", r"online\s+order", r"B2B\s+portal",
+    r"supply\s+chain\s+integration", r"\bAPI\b", r"ERP\s+integration"
+]
+
+class KeywordMatcher:
+    """All keywords compiled into one alternation; each document is scanned once.
+
+    The alternation reports non-overlapping matches, so a keyword that starts inside another
+    keyword's match ("order" inside "online order") would be lost. Such a match can only start
+    inside a reported span, so the spans are checked against every other keyword; a document
+    where one does is recounted keyword by keyword, as separate re.finditer scans would count.
+    """
+
+    def __init__(self, keywords=KEYWORDS, flags=re.I):
+        self.keywords = list(keywords)
+        alternation = "|".join(f"(?P<k{i}>{kw})" for i, kw in enumerate(self.keywords))
+        self.pattern = re.compile(alternation, flags)
+        self.group_col = {f"k{i}": i for i in range(len(self.keywords))}
+        self.single = [re.compile(kw, flags) for kw in self.keywords]
+
+    def _hidden(self, text, found) -> bool:
+        # does another keyword match starting inside a reported (start, end, keyword) span?
+        for s, e, k in found:
+            for j, p in enumerate(self.single):
+                if j != k and any(p.match(text, pos) for pos in range(s, e)):
+                    return True
+        return False
+
+    def hits(self, texts) -> sparse.csr_matrix:
+        # document x keyword hit counts (duplicate (row, col) entries are summed by csr_matrix)
+        rows, cols = [], []
+        for r, text in enumerate(texts):
+            found = [(m.start(), m.end(), self.group_col[m.lastgroup])
+                     for m in self.pattern.finditer(text)]
+            if found and self._hidden(text, found):
+                # overlapping keywords: count each one on its own
+                for j, p in enumerate(self.single):
+                    n = sum(1 for _ in p.finditer(text))
+                    rows += [r] * n
+                    cols += [j] * n
+                continue
+            for _, _, j in found:
+                rows.append(r)
+                cols.append(j)
+        data = np.ones(len(rows), dtype=np.int32)
+        shape = (len(texts), len(self.keywords))
+        return sparse.csr_matrix((data, (rows, cols)), shape=shape, dtype=np.int32)
+
+def score_hits(hits, weights=None) -> np.ndarray:
+    # Weighted count of keywords present; reweighting needs only the hit matrix, not the text
+    present = (hits > 0).astype(float)
+    w = np.ones(hits.shape[1]) if weights is None else np.asarray(weights, dtype=float)
+    return np.asarray(present @ w).ravel()
+
+def save_hits(path, hits, keywords, docs: pd.DataFrame) -> None:
+    hits = sparse.csr_matrix(hits)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        path, data=hits.data, indices=hits.indices, indptr=hits.indptr, shape=np.array(hits.shape),
+        keywords=np.array(keywords, dtype=str),
+        firm_id=docs["firm_id"].to_numpy(dtype=str), year=docs["year"].to_numpy(dtype=str),
+    )
+
+def load_hits(path):
+    # Returns (csr hit matrix, keyword list, DataFrame of firm_id/year per row)
+    z = np.load(path)
+    hits = sparse.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+    return hits, list(z["keywords"]), pd.DataFrame({"firm_id": z["firm_id"], "year": z["year"]})
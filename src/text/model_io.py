@@ -0,0 +1,28 @@
+import datetime
+from pathlib import Path
+
+import joblib
+import sklearn
+
+# Bump when the artifact layout changes; load_model refuses other versions
+ARTIFACT_VERSION = 1
+
+def save_model(pipe, path, **meta) -> None:
+    # Fitted pipeline (vectorizer vocabulary/hashing spec + classifier coefficients) and provenance
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump({
+        "artifact_version": ARTIFACT_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "meta": meta,
+        "pipeline": pipe,
+    }, path)
+
+def load_model(path):
+    art = joblib.load(path)
+    if not isinstance(art, dict) or art.get("artifact_version") != ARTIFACT_VERSION:
+        raise ValueError(f"{path}: not an IT model artifact (version {ARTIFACT_VERSION})")
+    if art["sklearn_version"] != sklearn.__version__:
+        print(f"[WARN] {path} was saved with scikit-learn {art['sklearn_version']}, "
+              f"running {sklearn.__version__}")
+    return art["pipeline"], art
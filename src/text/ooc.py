@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import make_pipeline
+
+from src.text.corpus import iter_batches, read_doc
+from src.text.cv import VEC_KW
+
+CLASSES = np.array([0, 1])
+
+def build_hashing_pipeline(n_features: int = 2**20, ngram_range=(1, 2), alpha: float = 1e-5,
+                           random_state: int = 42):
+    # Stateless hashed features (no vocabulary) + linear learner that supports partial_fit
+    return make_pipeline(
+        HashingVectorizer(n_features=n_features, ngram_range=tuple(ngram_range),
+                          alternate_sign=False, stop_words=VEC_KW["stop_words"]),
+        SGDClassifier(loss="log_loss", alpha=alpha, random_state=random_state),
+    )
+
+def partial_fit_paths(pipe, paths, labels, epochs: int = 5, batch_size: int = 256,
+                      workers: int = 4, seed: int = 42, reader=read_doc):
+    # Stream labeled documents from disk in mini-batches; only one or two batches of text are in
+    # memory
+    paths = np.asarray(list(paths), dtype=object)
+    labels = np.asarray(labels)
+    vec, clf = pipe[0], pipe[-1]
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(paths))
+        batches = iter_batches(paths[order], batch_size=batch_size, workers=workers, reader=reader)
+        for start, texts in zip(range(0, len(order), batch_size), batches, strict=True):
+            y = labels[order[start:start + batch_size]]
+            clf.partial_fit(vec.transform(texts), y, classes=CLASSES)
+    return pipe
+
+def predict_paths(pipe, paths, batch_size: int = 256, workers: int = 4, reader=read_doc):
+    preds, probs = [], []
+    for texts in iter_batches(paths, batch_size=batch_size, workers=workers, reader=reader):
+        x = pipe[0].transform(texts)
+        preds.append(pipe[-1].predict(x))
+        probs.append(pipe[-1].predict_proba(x)[:, 1])
+    return np.concatenate(preds), np.concatenate(probs)
+
+def ooc_cross_val(paths, labels, cv, pipe_kw=None, **fit_kw):
+    # Out-of-fold labels/probabilities; each fold model is trained by streaming its training
+    # documents
+    paths = np.asarray(list(paths), dtype=object)
+    labels = np.asarray(labels)
+    y_pred = np.zeros(len(labels), dtype=labels.dtype)
+    y_prob = np.zeros(len(labels))
+    for tr, te in cv.split(np.zeros(len(labels)), labels):
+        pipe = partial_fit_paths(build_hashing_pipeline(**(pipe_kw or {})), paths[tr], labels[tr],
+                                 **fit_kw)
+        y_pred[te], y_prob[te] = predict_paths(pipe, paths[te],
+                                               batch_size=fit_kw.get("batch_size", 256),
+                                               workers=fit_kw.get("workers", 4),
+                                               reader=fit_kw.get("reader", read_doc))
+    return y_pred, y_prob
@@ -0,0 +1,35 @@
+import re
+
+# 10-K item headers ("Item 1.", "ITEM 1A", "Item 7 -", ...); 1[0-6] before [1-9] so "Item 10" is
+# not read as "1"
+ITEM_RE = re.compile(r"\bitem\s+(1[0-6]|[1-9][a-c]?)\b", re.I)
+# Item 1 (Business) and Item 7 (MD&A) carry most of the IT signal
+DEFAULT_SECTIONS = ("1", "7")
+
+def parse_sections(s: str):
+    return tuple(v.strip().lower() for v in s.split(",") if v.strip()) if s else None
+
+def find_sections(text: str, items=DEFAULT_SECTIONS) -> list:
+    """Locate the body of each requested item with one linear scan over the headers.
+
+    Every header opens a region that runs to the next header of any item. An item can appear
+    several times (table of contents, cross references); the longest region is taken as its body.
+    Returns [(item, start, end)] in document order, offsets into text.
+    """
+    want = {i.lower() for i in items}
+    heads = [(m.group(1).lower(), m.start()) for m in ITEM_RE.finditer(text)]
+    best = {}
+    for k, (item, start) in enumerate(heads):
+        if item not in want:
+            continue
+        end = heads[k + 1][1] if k + 1 < len(heads) else len(text)
+        if item not in best or end - start > best[item][1] - best[item][0]:
+            best[item] = (start, end)
+    return sorted(((item, s, e) for item, (s, e) in best.items()), key=lambda r: r[1])
+
+def extract_sections(text: str, items=DEFAULT_SECTIONS):
+    # (kept text, spans); documents without any recognizable header are kept whole
+    spans = find_sections(text, items)
+    if not spans:
+        return text, []
+    return "\n\n".join(text[s:e] for _, s, e in spans), spans
@@ -0,0 +1,220 @@
+import argparse
+import collections
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+
+import numpy as np
+
+from src.text.model_io import load_model
+
+
+class _Pending:
+    __slots__ = ("texts", "t0", "done", "scores", "error", "queue_depth", "batch_docs")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.t0 = time.perf_counter()
+        self.done = threading.Event()
+        self.scores = None
+        self.error = None
+        self.queue_depth = 0
+        self.batch_docs = 0
+
+class ScoringService:
+    """Keeps one fitted IT pipeline warm and scores concurrent requests in micro-batches.
+
+    Requests wait at most max_wait_ms for company; a batch closes early once it holds
+    max_batch documents. Each batch is a single vectorized predict_proba call; if it fails,
+    the batch's requests are retried one by one so a bad request only fails itself.
+    Latency percentiles cover the last latency_window requests.
+    """
+
+    def __init__(self, pipe, max_batch: int = 64, max_wait_ms: float = 5.0,
+                 latency_window: int = 10_000):
+        self.pipe = pipe
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.q = queue.Queue()
+        self.stats = {"requests": 0, "documents": 0, "batches": 0,
+                      "latency_ms": collections.deque(maxlen=latency_window)}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def score(self, texts):
+        # Blocking call from a request thread; returns (scores, latency_ms, queue_depth, batch_docs)
+        item = _Pending(list(texts))
+        item.queue_depth = self.q.qsize()
+        self.q.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        latency = (time.perf_counter() - item.t0) * 1000.0
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["documents"] += len(item.texts)
+            self.stats["latency_ms"].append(latency)
+        return item.scores, latency, item.queue_depth, item.batch_docs
+
+    def _collect(self):
+        try:
+            first = self.q.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch, n = [first], len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n += len(item.texts)
+        return batch
+
+    def _loop(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            texts = [t for item in batch for t in item.texts]
+            try:
+                probs = self.pipe.predict_proba(texts)[:, 1] if texts else np.array([])
+            except Exception:
+                probs = None
+            with self._lock:
+                self.stats["batches"] += 1
+            start = 0
+            for item in batch:
+                k = len(item.texts)
+                if probs is not None:
+                    item.scores = probs[start:start + k].tolist()
+                else:
+                    # the batch failed: rescore this request alone so only the culprit gets the
+                    # error
+                    try:
+                        item.scores = (self.pipe.predict_proba(item.texts)[:, 1].tolist()
+                                       if k else [])
+                    except Exception as e:
+                        item.error = e
+                item.batch_docs = len(texts)
+                start += k
+                item.done.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            # no request yet: percentiles are null, not NaN (which is not valid JSON)
+            lat = np.array(self.stats["latency_ms"], dtype=float)
+            b = max(self.stats["batches"], 1)
+            return {
+                "requests": self.stats["requests"],
+                "documents": self.stats["documents"],
+                "batches": self.stats["batches"],
+                "mean_batch_docs": self.stats["documents"] / b,
+                "queue_depth": self.q.qsize(),
+                "latency_ms_p50": float(np.percentile(lat, 50)) if lat.size else None,
+                "latency_ms_p95": float(np.percentile(lat, 95)) if lat.size else None,
+            }
+
+def request_texts(req) -> list:
+    # {"texts": [str, ...]} or {"text": str}; anything else is a client error
+    if not isinstance(req, dict):
+        raise ValueError("body must be a JSON object")
+    texts = req["texts"] if "texts" in req else [req["text"]]
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise ValueError("'texts' must be a list of strings ('text' a string)")
+    return texts
+
+def make_handler(service: ScoringService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self._send(200, service.snapshot())
+            else:
+                self._send(404, {"error": "unknown path"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                return self._send(404, {"error": "unknown path"})
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                req = json.loads(body or b"{}")
+                texts = request_texts(req)
+            except (ValueError, KeyError) as e:
+                return self._send(400, {"error": f"expected JSON with 'texts' list or 'text': {e}"})
+            try:
+                scores, latency, depth, batch_docs = service.score(texts)
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+            self._send(200, {"scores": scores, "latency_ms": latency, "queue_depth": depth,
+                             "batch_docs": batch_docs})
+
+        def log_message(self, fmt, *args):  # keep stdout quiet under load
+            pass
+    return Handler
+
+def make_server(service: ScoringService, host: str = "127.0.0.1",
+                port: int = 8765) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), make_handler(service))
+
+def score_remote(url: str, texts, timeout: float = 30.0) -> dict:
+    # Minimal client: POST texts to a running server, e.g. url="http://127.0.0.1:8765"
+    body = json.dumps({"texts": list(texts)}).encode("utf-8")
+    req = urlrequest.Request(url.rstrip("/") + "/score", data=body,
+                             headers={"Content-Type": "application/json"})
+    with urlrequest.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Serve IT-index scores from a saved model over localhost HTTP")
+    ap.add_argument("--model", required=True,
+                    help="artifact written by build_it_index --save_model")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max_batch", type=int, default=64,
+                    help="max documents per predict_proba call")
+    ap.add_argument("--max_wait_ms", type=float, default=5.0,
+                    help="max time a request waits for a batch to fill")
+    args = ap.parse_args()
+
+    pipe, art = load_model(args.model)
+    service = ScoringService(pipe, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms).start()
+    server = make_server(service, args.host, args.port)
+    print(f"[OK] Serving {args.model} on http://{args.host}:{server.server_address[1]} "
+          "(POST /score, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
-
 from pathlib import Path
+
 import pandas as pd
 
+# Pipeline tables can be CSV (default), Parquet or Feather; the suffix picks the format.
+# A directory is read as a (possibly year-partitioned) Parquet dataset.
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".feather": "feather",
+           ".arrow": "feather"}
+KEYS = ("firm_id", "quarter")
+# numeric ids (CIKs, gvkeys) are read as labels, so every table merges
+KEY_DTYPES = {k: str for k in KEYS}
+
 def read_csv(path: str) -> pd.DataFrame:
     p = Path(path)
     if not p.exists():
@@ -10,3 +18,88 @@ def read_csv(path: str) -> pd.DataFrame:
 
 def ensure_dir(path: str) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+def table_format(path) -> str:
+    p = Path(path)
+    if p.is_dir():
+        return "parquet"
+    # anything else (.txt, pipes, no suffix) is CSV, as before
+    return FORMATS.get(p.suffix.lower(), "csv")
+
+def table_columns(path) -> list:
+    # Column names without reading any rows
+    fmt = table_format(path)
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    import pyarrow.dataset as ds
+    return list(ds.dataset(path, format="feather" if fmt == "feather" else "parquet").schema.names)
+
+def categorize_keys(df: pd.DataFrame, keys=KEYS) -> pd.DataFrame:
+    # firm_id/quarter as categoricals (labels stored once); unused categories are dropped
+    for k in keys:
+        if k in df.columns:
+            df[k] = df[k].astype("category") if df[k].dtype != "category" \
+                else df[k].cat.remove_unused_categories()
+    return df
+
+def read_table(path, columns=None, optional=None, categorical_keys: bool = False,
+               dtype=None) -> pd.DataFrame:
+    """Read a pipeline table in any supported format.
+
+    columns projects the read (only those columns are parsed/loaded); optional columns are
+    added to the projection when the file has them. With categorical_keys, firm_id and
+    quarter come back as categoricals.
+    """
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    fmt = table_format(p)
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+        if optional:
+            have = set(table_columns(p))
+            columns += [c for c in optional if c in have and c not in columns]
+    if fmt == "csv":
+        df = pd.read_csv(p, usecols=columns, dtype=dtype)
+        if columns is not None:
+            df = df[columns]
+    elif fmt == "parquet":
+        df = pd.read_parquet(p, columns=columns)
+    else:
+        df = pd.read_feather(p, columns=columns)
+    if dtype and fmt != "csv":
+        df = df.astype({k: v for k, v in dtype.items() if k in df.columns})
+    return categorize_keys(df) if categorical_keys else df
+
+def iter_table(path, columns=None, chunksize: int = 500_000, dtype=None):
+    # Yield the table as DataFrames of at most chunksize rows (only one chunk in memory)
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    fmt = table_format(p)
+    if fmt == "csv":
+        for chunk in pd.read_csv(p, usecols=columns, chunksize=chunksize, dtype=dtype):
+            yield chunk[columns] if columns is not None else chunk
+        return
+    import pyarrow.dataset as ds
+    data = ds.dataset(p, format="feather" if fmt == "feather" else "parquet")
+    for batch in data.to_batches(columns=columns, batch_size=chunksize):
+        if batch.num_rows:
+            chunk = batch.to_pandas()
+            if dtype:
+                chunk = chunk.astype({k: v for k, v in dtype.items() if k in chunk.columns})
+            yield chunk
+
+def write_table(df: pd.DataFrame, path, categorical_keys: bool = True) -> None:
+    # Columnar formats keep dtypes; firm_id/quarter are stored dictionary-encoded
+    ensure_dir(path)
+    fmt = table_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    if categorical_keys:
+        df = categorize_keys(df.copy())
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
@@ -1,5 +1,10 @@
 
-import argparse, pathlib, numpy as np, pandas as pd, re
+import argparse
+import pathlib
+
+import numpy as np
+import pandas as pd
+
 
 def main():
     ap = argparse.ArgumentParser()
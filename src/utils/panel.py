@@ -0,0 +1,164 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+QUARTER_RE = r"^(\d{4})Q(\d)$"
+
+def parse_quarters(quarters: pd.Series):
+    # "YYYYQn" -> (year, quarter) int arrays; only the distinct labels are parsed
+    codes, uniq = pd.factorize(quarters)
+    parts = pd.Series(uniq, dtype=object).str.extract(QUARTER_RE)
+    if codes.min(initial=0) < 0 or parts.isna().any().any():
+        raise ValueError("quarter values must look like YYYYQn")
+    parts = parts.astype(int).to_numpy()
+    return parts[codes, 0], parts[codes, 1]
+
+def quarter_codes(quarters: pd.Series) -> np.ndarray:
+    # calendar quarter number year*4 + (q-1): consecutive quarters differ by exactly 1
+    year, q = parse_quarters(quarters)
+    return year * 4 + q - 1
+
+def drop_duplicate_keys(df: pd.DataFrame, firm: str = "firm_id",
+                        quarter: str = "quarter") -> pd.DataFrame:
+    # one row per firm-quarter as Panel needs, keeping the last (a restated filing comes after the
+    # original)
+    dup = df.duplicated([firm, quarter], keep="last")
+    if dup.any():
+        print(f"[WARN] Dropped {int(dup.sum())} duplicate ({firm}, {quarter}) rows; "
+              "kept the last of each")
+        df = df.loc[~dup]
+    return df
+
+class Panel:
+    """Dense firm x quarter panel over integer codes.
+
+    Firms are coded in sorted label order and quarters as consecutive calendar quarters from
+    the first to the last observed one, so a missing quarter is an explicit empty slot.
+    Variables are (n_firms, n_quarters) float arrays with NaN where unobserved; `mask`
+    marks the cells that came from a row. Lags/leads are array shifts along the quarter
+    axis (calendar-exact across gaps) and results map back to the source rows with to_rows.
+    """
+
+    def __init__(self, firms, q0: int, n_quarters: int, fi, qi):
+        self.firms = pd.Index(firms)
+        self.q0 = int(q0)
+        self.shape = (len(self.firms), int(n_quarters))
+        self.fi, self.qi = np.asarray(fi), np.asarray(qi)
+        self.mask = np.zeros(self.shape, dtype=bool)
+        self.mask[self.fi, self.qi] = True
+        self.vars = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns=(), firm: str = "firm_id",
+                   quarter: str = "quarter") -> "Panel":
+        fi, firms = pd.factorize(df[firm], sort=True)
+        if (fi < 0).any():
+            raise ValueError(f"{firm} has missing values")
+        code = quarter_codes(df[quarter])
+        q0 = int(code.min()) if len(code) else 0
+        qi = code - q0
+        n_q = int(qi.max()) + 1 if len(qi) else 0
+        if pd.Series(fi * max(n_q, 1) + qi).duplicated().any():
+            raise ValueError(f"duplicate ({firm}, {quarter}) rows; a panel needs one row per "
+                             "firm-quarter (see drop_duplicate_keys)")
+        p = cls(firms, q0, n_q, fi, qi)
+        for c in columns:
+            p[c] = df[c]
+        return p
+
+    def __len__(self):
+        return len(self.fi)
+
+    def __contains__(self, name):
+        return name in self.vars
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.vars[name]
+
+    def __setitem__(self, name, values):
+        self.vars[name] = self.dense(values)
+
+    def dense(self, values, fill=np.nan) -> np.ndarray:
+        # row-aligned 1D values -> (firms, quarters); 2D arrays pass through
+        values = np.asarray(values)
+        if values.ndim == 2:
+            if values.shape != self.shape:
+                raise ValueError(f"expected shape {self.shape}, got {values.shape}")
+            return values
+        dtype = float if values.dtype.kind in "biuf" else values.dtype
+        out = np.full(self.shape, fill, dtype=dtype)
+        out[self.fi, self.qi] = values
+        return out
+
+    def codes(self, values):
+        # row-level labels (e.g. industry) -> 2D int codes (-1 where missing) and the labels
+        c, labels = pd.factorize(pd.Series(values), sort=True)
+        out = np.full(self.shape, -1, dtype=np.int64)
+        out[self.fi, self.qi] = c
+        return out, labels
+
+    def to_rows(self, x) -> np.ndarray:
+        x = self.vars[x] if isinstance(x, str) else x
+        return x[self.fi, self.qi]
+
+    @property
+    def quarter_labels(self) -> np.ndarray:
+        c = np.arange(self.q0, self.q0 + self.shape[1])
+        return np.char.add(np.char.add((c // 4).astype(str), "Q"), (c % 4 + 1).astype(str))
+
+    def lag(self, x, k: int = 1) -> np.ndarray:
+        # value k calendar quarters earlier (k < 0: later); NaN when that quarter is absent
+        x = self.vars[x] if isinstance(x, str) else x
+        out = np.full(x.shape, np.nan)
+        if k == 0:
+            out[:] = x
+        elif k > 0:
+            out[:, k:] = x[:, :-k]
+        else:
+            out[:, :k] = x[:, -k:]
+        return out
+
+    def lead(self, x, k: int = 1) -> np.ndarray:
+        return self.lag(x, -k)
+
+    def group_reduce(self, x, groups=None, how: str = "mean"):
+        """Aggregate x over firms within (group, quarter) cells, skipping NaN.
+
+        groups is a 2D code array from codes() (None: one group per quarter, i.e. the
+        cross-section). Returns a (n_groups, n_quarters) array, NaN for empty cells.
+        """
+        x = self.vars[x] if isinstance(x, str) else x
+        if groups is None:
+            groups = np.where(self.mask, 0, -1)
+        n_g = int(groups.max()) + 1 if groups.size else 0
+        T = self.shape[1]
+        ok = (groups >= 0) & ~np.isnan(x)
+        key = (groups * T + np.arange(T)[None, :])[ok]
+        # one grouped pass over integer cell keys (compensated sums, same numbers as DataFrame
+        # groupby)
+        r = pd.Series(x[ok]).groupby(key).agg(how)
+        out = np.full(n_g * T, np.nan)
+        out[r.index.to_numpy()] = r.to_numpy()
+        return out.reshape(n_g, T)
+
+    def group_transform(self, x, groups=None, how: str = "mean") -> np.ndarray:
+        # group_reduce broadcast back to every firm-quarter cell (NaN where the cell has no group)
+        red = self.group_reduce(x, groups, how)
+        if groups is None:
+            groups = np.where(self.mask, 0, -1)
+        out = red[np.maximum(groups, 0), np.arange(self.shape[1])[None, :]]
+        return np.where(groups >= 0, out, np.nan)
+
+    def firm_reduce(self, x, how: str = "mean") -> np.ndarray:
+        # per-firm aggregate over its quarters, skipping NaN
+        x = self.vars[x] if isinstance(x, str) else x
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN firms -> NaN
+            fn = {"mean": np.nanmean, "sum": np.nansum, "max": np.nanmax, "min": np.nanmin}[how]
+            return fn(x, axis=1)
+
+    def cumulative_max(self, x) -> np.ndarray:
+        # running max along each firm's quarters; NaN cells carry the max so far
+        x = self.vars[x] if isinstance(x, str) else x
+        return np.fmax.accumulate(x, axis=1)
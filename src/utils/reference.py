@@ -0,0 +1,162 @@
+"""Reference implementations the vectorized code replaced, and synthetic inputs to compare them on.
+
+The tests use them as oracles and the scripts/bench_* timings run against them; the pipeline
+itself never imports this module.
+"""
+import numpy as np
+import pandas as pd
+
+from src.data.fetch_fin_from_sec import FACT_TAGS, best_unit, to_quarter
+
+# --- companyfacts extraction (src/data/fetch_fin_from_sec.py) ---
+
+def pick_facts(cfacts: dict, tags) -> list:
+    # Return all fact entries across provided tags
+    out = []
+    facts = cfacts.get("facts", {}).get("us-gaap", {})
+    for tag in tags:
+        if tag in facts:
+            for uom, arr in facts[tag].get("units", {}).items():
+                for item in arr:
+                    # item has "start", "end" (for duration), or only "end" (for instant), and "val"
+                    out.append({"tag": tag, "uom": uom, **item})
+    return out
+
+def legacy_fin_from_companyfacts(cf: dict, cik: str) -> pd.DataFrame:
+    series = {}
+    for k, tags in FACT_TAGS.items():
+        rows = pick_facts(cf, tags)
+        if not rows:
+            continue
+        u = best_unit([r["uom"] for r in rows])
+        rows = [r for r in rows if r["uom"] == u]
+        recs = []
+        for r in rows:
+            end = r.get("end")
+            if not end:
+                continue
+            recs.append({"quarter": to_quarter(end), "val": r.get("val"),
+                         "filed": r.get("filed", ""), "accn": r.get("accn", "")})
+        s = (pd.DataFrame(recs).sort_values(["quarter", "filed"])
+             .groupby("quarter", as_index=False).last())
+        series[k] = s[["quarter", "val"]].rename(columns={"val": k})
+    fin = None
+    for s in series.values():
+        fin = s if fin is None else fin.merge(s, on="quarter", how="outer")
+    if fin is None:
+        return pd.DataFrame()
+    fin["cik"] = cik
+    return fin
+
+def synthetic_companyfacts(n_facts: int, seed: int = 0) -> dict:
+    # Facts spread over every FACT_TAGS tag, 40 years of period ends, many restatements per quarter
+    rng = np.random.default_rng(seed)
+    tags = [t for ts in FACT_TAGS.values() for t in ts] + ["Unrelated"]
+    days = pd.date_range("1985-01-01", "2024-12-31", freq="D")
+    facts = {}
+    for tag, n in zip(tags, rng.multinomial(n_facts, np.ones(len(tags)) / len(tags)), strict=True):
+        ends = days[rng.integers(0, len(days), n)].strftime("%Y-%m-%d")
+        filed = (days[rng.integers(0, len(days), n)]).strftime("%Y-%m-%d")
+        vals = rng.integers(0, 10**9, n)
+        arr = [{"start": "1984-01-01", "end": e, "val": int(v), "accn": f"0000-{i}", "fy": 2000,
+                "fp": "Q1", "form": "10-Q", "filed": f}
+               for i, (e, v, f) in enumerate(zip(ends, vals, filed, strict=True))]
+        units = {"USD": arr[: n * 9 // 10], "EUR": arr[n * 9 // 10:]}
+        facts[tag] = {"label": tag, "units": units}
+    return {"cik": 1, "facts": {"us-gaap": facts}}
+
+# --- fixed-effects OLS (src/models/absorb.py) ---
+
+def legacy_fe_ols(y_col, X_cols, df, cov_type="HC1"):
+    # previous approach: firm and quarter dummies in a dense design
+    import statsmodels.api as sm
+    entities = pd.get_dummies(df['firm_id'], drop_first=True, prefix='f', dtype=float)
+    times = pd.get_dummies(df['quarter'], drop_first=True, prefix='t', dtype=float)
+    const = pd.Series(1.0, index=df.index, name='const')
+    X = pd.concat([const, df[X_cols], entities, times], axis=1)
+    kw = {"cov_kwds": {"groups": pd.factorize(df["firm_id"])[0]}} if cov_type == "cluster" else {}
+    return sm.OLS(df[y_col], X).fit(cov_type=cov_type, **kw)
+
+def synthetic_fe_panel(firms: int, quarters: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    labels = np.array([f"{2000 + i // 4}Q{i % 4 + 1}" for i in range(quarters)])
+    df = pd.DataFrame({"firm_id": np.repeat([f"firm{i:05d}" for i in range(firms)], quarters),
+                       "quarter": np.tile(labels, firms)}).sample(frac=0.8, random_state=seed)
+    fi = pd.factorize(df["firm_id"], sort=True)[0]
+    qi = pd.factorize(df["quarter"], sort=True)[0]
+    n = len(df)
+    alpha, gscpi = rng.normal(0, 20, firms), rng.normal(size=quarters)
+    df["gscpi"] = gscpi[qi]
+    df["IT_lag1"] = 0.3 * alpha[fi] / 20 + rng.normal(size=n)
+    df["ITxGSCPI"] = df["IT_lag1"] * df["gscpi"]
+    df["CCC"] = (80 + alpha[fi] + 10 * gscpi[qi] + 5 * df["IT_lag1"] - 3 * df["ITxGSCPI"]
+                 + rng.normal(0, 15, n))
+    return df.reset_index(drop=True)
+
+# --- event-study design (src/models/did_eventstudy.py) ---
+
+def legacy_design_matrices(df, window=6):
+    # previous dense layout: one int column per event time, written into df
+    for k in range(-window, window+1):
+        df[f"E{k}"] = (df["event_time"] == k).astype(int)
+    cols = [f"E{k}" for k in range(-window, window+1) if k != -1]
+    return df[cols], cols
+
+def synthetic_events(firms: int, quarters: int = 40, seed: int = 0) -> pd.DataFrame:
+    # staggered adoption; 30% never treated (event_time far outside any window)
+    rng = np.random.default_rng(seed)
+    labels = np.array([f"{2000 + i // 4}Q{i % 4 + 1}" for i in range(quarters)])
+    df = pd.DataFrame({"firm_id": np.repeat([f"firm{i:06d}" for i in range(firms)], quarters),
+                       "quarter": np.tile(labels, firms)}).sample(frac=0.85, random_state=seed)
+    df = df.sort_values(["firm_id", "quarter"]).reset_index(drop=True)
+    fi = pd.factorize(df["firm_id"], sort=True)[0]
+    qi = pd.factorize(df["quarter"], sort=True)[0]
+    start = rng.integers(4, quarters - 4, firms).astype(float)
+    start[rng.random(firms) < 0.3] = np.nan
+    df["event_time"] = np.where(np.isnan(start[fi]), -999, qi - np.nan_to_num(start[fi]))
+    df["CCC"] = (rng.normal(0, 20, firms)[fi] + rng.normal(size=quarters)[qi]
+                 + np.where(df["event_time"] >= 0, 5.0, 0.0) + rng.normal(0, 10, len(df)))
+    return df
+
+# --- treatment and event time (src/features/compute_ccc.py) ---
+
+def _first_treat(s):
+    return s.idxmax() if s.any() else pd.NA
+
+def legacy_add_treat_and_event(df, rule: str, gscpi_thresh: float = 0.5,
+                               custom_events_csv: str = None, shock_col: str = "gscpi"):
+    df = df.copy()
+    if rule == "gscpi_thresh":
+        df["treat"] = (df[shock_col] > gscpi_thresh).astype(int)
+        df["first_treat"] = df.groupby("firm_id")["treat"].transform(_first_treat)
+    elif rule == "industry_topdecile":
+        qg = df.groupby("quarter")[shock_col]
+        thr = qg.transform(lambda s: s.quantile(0.9))
+        df["treat"] = (df[shock_col] >= thr).astype(int)
+        df["first_treat"] = df.groupby("firm_id")["treat"].transform(_first_treat)
+    elif rule == "custom_dates":
+        ev = pd.read_csv(custom_events_csv)
+        df = df.merge(ev, on="firm_id", how="left")
+        df["treat"] = (df["quarter"] >= df["event_quarter"]).astype(int)
+        df["first_treat"] = df.groupby("firm_id")["treat"].transform(_first_treat)
+    qnum = df["quarter"].str.extract(r"(\d{4})Q(\d)").astype(int)
+    df["q_index"] = (qnum[0] - qnum[0].min())*4 + (qnum[1]-1)
+    first = df.loc[df.groupby("firm_id")["treat"].transform("idxmax")]
+    first_idx = first.set_index("firm_id")["q_index"].to_dict()
+    df["event_time"] = df.apply(lambda r: r["q_index"] - first_idx.get(r["firm_id"], r["q_index"]),
+                                axis=1)
+    return df.drop(columns=["first_treat"])
+
+def synthetic_treat_panel(firms: int, quarters: int, seed: int = 0) -> pd.DataFrame:
+    # Unbalanced panel in firm/quarter order with a shuffled index, as compute_ccc leaves it after
+    # sorting
+    rng = np.random.default_rng(seed)
+    labels = [f"{2000 + i // 4}Q{i % 4 + 1}" for i in range(quarters)]
+    firm = np.repeat([f"firm{i:06d}" for i in range(firms)], quarters)
+    quarter = np.tile(labels, firms)
+    df = pd.DataFrame({"firm_id": firm, "quarter": quarter,
+                       "industry": np.repeat(rng.integers(10, 60, firms), quarters),
+                       "shock": rng.normal(size=firms * quarters)})
+    df["gscpi"] = df["quarter"].map(dict(zip(labels, rng.normal(size=quarters), strict=True)))
+    df = df.sample(frac=0.9, random_state=seed).sort_values(["firm_id", "quarter"])
+    return df
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from src.models.absorb import FixedEffects, absorb_ols
+
+
+def test_absorbed_ols_matches_dummies():
+    from src.utils.reference import legacy_fe_ols, synthetic_fe_panel
+    df = synthetic_fe_panel(40, 12, seed=2)
+    cols = ["IT_lag1", "ITxGSCPI"]
+    fe = FixedEffects.from_frame(df)
+    assert fe.rank == 40 + 12 - 1
+    for cov in ("HC1", "cluster"):
+        old = legacy_fe_ols("CCC", cols, df, cov)
+        new = absorb_ols(df["CCC"], df[cols], fe, cov_type=cov, clusters=df["firm_id"])
+        np.testing.assert_allclose(new.params[cols], old.params[cols], rtol=1e-9)
+        np.testing.assert_allclose(new.bse[cols], old.bse[cols], rtol=1e-7)
+
+def test_quarter_level_regressor_is_dropped():
+    from src.utils.reference import synthetic_fe_panel
+    df = synthetic_fe_panel(20, 8, seed=3)
+    res = absorb_ols(df["CCC"], df[["IT_lag1", "gscpi"]], FixedEffects.from_frame(df))
+    assert res.dropped == ["gscpi"] and np.isnan(res.params["gscpi"])
+    assert not np.isnan(res.bse["IT_lag1"])
+
+def test_fe_rank_counts_disconnected_blocks():
+    # two firms that never share a quarter: the firm and quarter effects form two components
+    df = pd.DataFrame({"firm_id": ["a", "a", "b", "b"],
+                       "quarter": ["2019Q1", "2019Q2", "2020Q1", "2020Q2"]})
+    assert FixedEffects.from_frame(df).rank == 2 + 4 - 2
+
+def test_many_outcomes_share_one_fit():
+    from src.models.absorb import Absorbed, absorb_ols_many
+    from src.utils.reference import synthetic_fe_panel
+    df = synthetic_fe_panel(30, 10, seed=5)
+    df["DIO"] = 0.5 * df["CCC"] + np.random.default_rng(0).normal(size=len(df))
+    X = df[["IT_lag1", "ITxGSCPI"]]
+    many = absorb_ols_many(df[["CCC", "DIO"]], X, FixedEffects.from_frame(df), cov_type="cluster",
+                           clusters=df["firm_id"])
+    shared = Absorbed(df, ["IT_lag1", "ITxGSCPI", "CCC", "DIO"], FixedEffects.from_frame(df),
+                      clusters=df["firm_id"])
+    for y in ("CCC", "DIO"):
+        one = absorb_ols(df[y], X, FixedEffects.from_frame(df), cov_type="cluster",
+                         clusters=df["firm_id"])
+        for res in (many[y], shared.ols([y], ["IT_lag1", "ITxGSCPI"], cov_type="cluster")[y]):
+            np.testing.assert_allclose(res.params, one.params, rtol=1e-9)
+            np.testing.assert_allclose(res.bse, one.bse, rtol=1e-9)
+
+def test_many_outcomes_keep_their_own_rows():
+    from src.models.absorb import Absorbed, absorb_ols_many
+    from src.utils.reference import synthetic_fe_panel
+    df = synthetic_fe_panel(30, 10, seed=6)
+    df["DIO"] = 0.5 * df["CCC"] + np.random.default_rng(1).normal(size=len(df))
+    df.loc[df.index[::7], "DIO"] = np.nan
+    X = df[["IT_lag1", "ITxGSCPI"]]
+    many = absorb_ols_many(df[["CCC", "DIO"]], X, FixedEffects.from_frame(df), cov_type="cluster",
+                           clusters=df["firm_id"])
+    shared = Absorbed(df, ["IT_lag1", "ITxGSCPI", "CCC", "DIO"], FixedEffects.from_frame(df),
+                      clusters=df["firm_id"])
+    for y in ("CCC", "DIO"):
+        d = df[df[y].notna()]
+        one = absorb_ols(d[y], d[["IT_lag1", "ITxGSCPI"]], FixedEffects.from_frame(d),
+                         cov_type="cluster", clusters=d["firm_id"])
+        for res in (many[y], shared.ols([y], ["IT_lag1", "ITxGSCPI"], cov_type="cluster")[y]):
+            assert res.nobs == len(d)
+            np.testing.assert_allclose(res.params, one.params, rtol=1e-8)
+            np.testing.assert_allclose(res.bse, one.bse, rtol=1e-8)
@@ -0,0 +1,10 @@
+from src.text.cache import DocCache, fingerprint
+
+
+def test_doc_cache_roundtrip(tmp_path):
+    cache = DocCache(tmp_path / "c.db")
+    fp = fingerprint("keywords", ["a"])
+    cache.put_many(["h1", "h2"], [1.0, 2.0], fp)
+    assert cache.get_many(["h1", "h2", "h3"], fp) == {"h1": 1.0, "h2": 2.0}
+    assert cache.get_many(["h1"], fingerprint("keywords", ["b"])) == {}
+    cache.close()
@@ -1,9 +1,144 @@
 
 import pandas as pd
+
 from src.features.compute_ccc import winsorize
 
+
 def test_winsorize_basic():
     s = pd.Series([1,2,3,1000])
     w = winsorize(s, 0.25, 0.75)
     assert w.min() >= s.quantile(0.25) - 1e-9
     assert w.max() <= s.quantile(0.75) + 1e-9
+
+def test_treat_event_matches_rowwise(tmp_path):
+    from src.features.compute_ccc import add_treat_and_event
+    from src.utils.reference import legacy_add_treat_and_event, synthetic_treat_panel
+    df = synthetic_treat_panel(30, 12, seed=1)
+    ev = tmp_path / "ev.csv"
+    pd.DataFrame({"firm_id": ["firm000001", "firm000004"],
+                  "event_quarter": ["2001Q3", "2000Q1"]}).to_csv(ev, index=False)
+    for rule, kw in [("gscpi_thresh", {}), ("industry_topdecile", {"shock_col": "shock"}),
+                     ("custom_dates", {"custom_events_csv": str(ev)})]:
+        pd.testing.assert_frame_equal(add_treat_and_event(df, rule, **kw),
+                                      legacy_add_treat_and_event(df, rule, **kw))
+
+def test_incremental_update_matches_full_build(tmp_path):
+    import argparse
+
+    import numpy as np
+
+    from src.features.compute_ccc import build_panel, finalize_panel
+    from src.features.panel_update import update_panel
+    fin = pd.read_csv("data/raw/fin.csv")
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].copy()
+    it["IT_index"] = np.random.default_rng(0).normal(size=len(it))
+    args = argparse.Namespace(out=str(tmp_path / "fq.csv"), treat_rule="gscpi_thresh",
+                              gscpi_thresh=0.5, shock_col="gscpi", iv_spec="peer_it_lagK",
+                              iv_lag=2, custom_events=None, industry_wave_csv=None,
+                              quantile_eps=0.0)
+    full = finalize_panel(build_panel(fin.copy(), it, gscpi, args))
+    old = fin["quarter"] < "2020Q3"
+    update_panel(fin.loc[old].copy(), it.loc[old], gscpi, args).to_csv(args.out, index=False)
+    inc = update_panel(fin.copy(), it, gscpi, args)
+    pd.testing.assert_frame_equal(inc, full)
+
+def test_threshold_sweep_matches_single_threshold():
+    import numpy as np
+
+    from src.features.compute_ccc import add_treat_and_event, first_treat_sweep, sweep_event_times
+    from src.utils.reference import synthetic_treat_panel
+    df = synthetic_treat_panel(40, 12, seed=2)
+    df.loc[df.index[::7], "shock"] = np.nan
+    thresholds = [-1.0, 0.0, 0.5, 1.5, 10.0]
+    table = first_treat_sweep(df, thresholds, shock_col="shock")
+    assert table.shape == (df["firm_id"].nunique(), len(thresholds))
+    assert table[10.0].isna().all()
+    for t, event_time in sweep_event_times(df, table):
+        ref = add_treat_and_event(df, "gscpi_thresh", gscpi_thresh=t, shock_col="shock")
+        np.testing.assert_array_equal(event_time, ref["event_time"].to_numpy())
+
+def test_duplicate_filings_and_multiple_custom_events(tmp_path, capsys):
+    import argparse
+
+    import numpy as np
+
+    from src.features.compute_ccc import build_panel, finalize_panel
+    from src.models.absorb import FixedEffects
+    from src.models.fe_panel import fe_regression
+    fin = pd.read_csv("data/raw/fin.csv")
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].assign(IT_index=np.random.default_rng(0).normal(size=len(fin)))
+    firms = fin["firm_id"].unique()
+    ev = pd.DataFrame({"firm_id": [firms[0], firms[0], firms[1]],
+                       "event_quarter": ["2021Q2", "2020Q3", "2020Q1"]})
+    ev.to_csv(tmp_path / "ev.csv", index=False)
+    ev.iloc[1:].to_csv(tmp_path / "ev_first.csv", index=False)
+    args = argparse.Namespace(treat_rule="custom_dates", gscpi_thresh=0.5, shock_col="gscpi",
+                              iv_spec="peer_it_lagK", iv_lag=2,
+                              custom_events=str(tmp_path / "ev.csv"), industry_wave_csv=None,
+                              quantile_eps=0.0)
+    # a restated copy of the first rows comes later and wins
+    restated = fin.iloc[:3].assign(sales=fin["sales"].iloc[:3] * 1.1)
+    both = pd.concat([fin, restated], ignore_index=True)
+    got = finalize_panel(build_panel(both, it, gscpi, args))
+    assert "duplicate" in capsys.readouterr().out
+    args.custom_events = str(tmp_path / "ev_first.csv")
+    fin.iloc[:3] = restated
+    want = finalize_panel(build_panel(fin, it, gscpi, args))
+    pd.testing.assert_frame_equal(got, want)
+    fe_regression(got)
+    # regressions accept repeated firm-quarters
+    assert FixedEffects.from_frame(pd.concat([got, got.iloc[:5]])).n == len(got) + 5
+
+def test_numeric_firm_ids_merge(tmp_path, monkeypatch):
+    import sys
+
+    import numpy as np
+
+    from src.features.compute_ccc import main
+    fin = pd.read_csv("data/raw/fin.csv")
+    fin["firm_id"] = pd.factorize(fin["firm_id"])[0] + 1000  # CIK/gvkey-like integers
+    fin.to_csv(tmp_path / "fin.csv", index=False)
+    it = fin[["firm_id", "quarter"]].assign(IT_index=np.random.default_rng(0).normal(size=len(fin)))
+    it.to_csv(tmp_path / "it.csv", index=False)
+    outs = []
+    for extra in ([], ["--quantile_eps", "0.01"]):
+        out = tmp_path / f"fq{len(extra)}.csv"
+        monkeypatch.setattr(sys, "argv", ["compute_ccc", "--fin", str(tmp_path / "fin.csv"),
+                                          "--it", str(tmp_path / "it.csv"),
+                                          "--gscpi", "data/raw/external/gscpi.csv",
+                                          "--out", str(out), *extra])
+        main()
+        outs.append(pd.read_csv(out))
+    for df in outs:
+        assert len(df) and df["IT_index"].notna().all()
+
+def test_incremental_update_with_duplicates_and_numeric_ids(tmp_path):
+    import argparse
+
+    import numpy as np
+
+    from src.features.compute_ccc import build_panel, finalize_panel
+    from src.features.panel_update import update_panel
+    fin = pd.read_csv("data/raw/fin.csv")
+    # CIK-like ids, read back as str
+    fin["firm_id"] = (pd.factorize(fin["firm_id"])[0] + 1000).astype(str)
+    # restated filings: later duplicates of some firm-quarters with extreme values
+    restated = fin.iloc[::9].assign(inventory=fin["inventory"].iloc[::9] * 50)
+    fin = pd.concat([fin, restated], ignore_index=True)
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].drop_duplicates()
+    it = it.assign(IT_index=np.random.default_rng(0).normal(size=len(it)))
+    args = argparse.Namespace(out=str(tmp_path / "fq.csv"), treat_rule="gscpi_thresh",
+                              gscpi_thresh=0.5, shock_col="gscpi", iv_spec="peer_it_lagK",
+                              iv_lag=2, custom_events=None, industry_wave_csv=None,
+                              quantile_eps=0.0)
+    full = finalize_panel(build_panel(fin.copy(), it, gscpi, args))
+    rebuilt = update_panel(fin.copy(), it, gscpi, args)
+    pd.testing.assert_frame_equal(rebuilt, full)
+    old = fin["quarter"] < "2020Q3"
+    prev = update_panel(fin.loc[old].copy(), it.loc[it["quarter"] < "2020Q3"], gscpi, args)
+    prev.to_csv(args.out, index=False)
+    inc = update_panel(fin.copy(), it, gscpi, args)
+    pd.testing.assert_frame_equal(inc, full)
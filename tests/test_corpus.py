@@ -0,0 +1,12 @@
+from src.text.corpus import iter_batches, list_corpus
+
+
+def test_streaming_loader_keeps_order(tmp_path):
+    for i in range(5):
+        (tmp_path / f"firm{i:03d}_2020.txt").write_text(f"doc {i}", encoding="utf-8")
+    (tmp_path / "nofirmyear.txt").write_text("x", encoding="utf-8")
+    df = list_corpus(tmp_path)
+    assert list(df["year"]) == ["2020"] * 5 + ["0000"]
+    batches = list(iter_batches(df["path"], batch_size=2, workers=3))
+    assert [len(b) for b in batches] == [2, 2, 2]
+    assert [t for b in batches for t in b][:5] == [f"doc {i}" for i in range(5)]
@@ -0,0 +1,19 @@
+import numpy as np
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+from src.text.cv import build_pipeline, cross_validate
+
+
+def test_cv_engine_matches_cross_val_predict():
+    rng = np.random.default_rng(0)
+    vocab = ["edi", "portal", "api", "erp", "ledger", "store", "truck", "cash", "order", "cloud"]
+    texts = [" ".join(rng.choice(vocab, size=30)) for _ in range(60)]
+    y = np.array([int(t.count("api") + t.count("edi") > 6) for t in texts])
+    skf = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+    params = {"ngram_range": (1, 1), "max_features": 1000, "C": 1.0}
+    _, best, y_pred, y_prob = cross_validate(texts, y, skf, grid=[params], n_jobs=1)
+    ref = cross_val_predict(build_pipeline(**params), texts, y, cv=skf,
+                            method="predict_proba")[:, 1]
+    assert best == params
+    assert np.allclose(y_prob, ref)
+    assert (y_pred == (ref > 0.5)).all()
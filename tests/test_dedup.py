@@ -0,0 +1,21 @@
+import numpy as np
+
+from src.text.dedup import MinHashLSH, score_with_dedup
+
+
+def test_dedup_reuses_near_duplicate_scores(tmp_path):
+    words = [f"w{i}" for i in range(300)]
+    texts = [" ".join(words), " ".join(words[:-1] + ["x"]), " ".join(reversed(words))]
+    paths = []
+    for i, t in enumerate(texts):
+        p = tmp_path / f"f{i}_2020.txt"
+        p.write_text(t, encoding="utf-8")
+        paths.append(p)
+    calls = []
+    def score_fn(batch):
+        calls.append(len(batch))
+        return np.arange(len(batch), dtype=float) + 10
+    scores, near, sim, st = score_with_dedup(["a", "b", "c"], paths, score_fn, MinHashLSH(),
+                                             lambda k: None, threshold=0.8, batch_size=1, workers=1)
+    assert near == [None, "a", None] and sim[1] >= 0.8
+    assert scores[1] == scores[0] and st["reused"] == 1 and sum(calls) == 2
@@ -1,7 +1,9 @@
 
 import pandas as pd
+
 from src.models.did_eventstudy import run_eventstudy
 
+
 def test_eventstudy_runs(tmp_path):
     df = pd.DataFrame({
         'firm_id': ['a','a','b','b'],
@@ -11,3 +13,20 @@ def test_eventstudy_runs(tmp_path):
     })
     out = run_eventstudy(df, out_csv=None, fig_path=None, window=1)
     assert not out.empty
+
+def test_sparse_design_matches_dense():
+    from src.models.absorb import FixedEffects, absorb_ols
+    from src.models.did_eventstudy import design_matrices
+    from src.utils.reference import legacy_design_matrices, synthetic_events
+    df = synthetic_events(60, 16, seed=4)
+    X, cols = design_matrices(df, 3)
+    assert X.nnz <= len(df)
+    for cov in ("HC1", "cluster"):
+        sp = absorb_ols(df["CCC"], X, FixedEffects.from_frame(df), cov_type=cov,
+                        clusters=df["firm_id"], terms=cols)
+        d = df.copy()
+        Xd, _ = legacy_design_matrices(d, 3)
+        de = absorb_ols(d["CCC"], Xd, FixedEffects.from_frame(d), cov_type=cov,
+                        clusters=d["firm_id"])
+        pd.testing.assert_series_equal(sp.params, de.params, rtol=1e-9)
+        pd.testing.assert_series_equal(sp.bse, de.bse, rtol=1e-7)
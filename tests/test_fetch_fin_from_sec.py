@@ -0,0 +1,133 @@
+import json
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from src.data.fetch_fin_from_sec import HttpCache, fetch_all, fin_from_companyfacts, load_ticker_map
+from src.data.ingest_companyfacts_zip import ingest_zip
+
+
+def _facts(cik):
+    usd = [{"end": "2020-03-31", "val": 100 + int(cik), "filed": "2020-05-01", "form": "10-Q"},
+           {"end": "2020-06-30", "val": 200 + int(cik), "filed": "2020-08-01", "form": "10-Q"}]
+    return {"facts": {"us-gaap": {"Revenues": {"units": {"USD": usd}},
+                                  "InventoryNet": {"units": {"USD": usd}}}}}
+
+def _server(hits):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            if self.path.endswith("company_tickers.json"):
+                body = {"0": {"cik_str": 1, "ticker": "AAA"}, "1": {"cik_str": 2, "ticker": "BBB"}}
+            else:
+                body = _facts(self.path.split("CIK")[1][:10])
+            etag = f'"{self.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def test_async_fetch_with_etag_cache(tmp_path):
+    hits = []
+    srv = _server(hits)
+    url = f"http://127.0.0.1:{srv.server_address[1]}"
+    try:
+        cache = HttpCache(tmp_path / "cache")
+        tmap = load_ticker_map(cache=cache, url=url + "/files/company_tickers.json")
+        assert tmap == {"AAA": "0000000001", "BBB": "0000000002"}
+        ciks = sorted(tmap.values())
+        first = fetch_all(ciks, "async", base_url=url, rate=50, concurrency=4, cache=cache)
+        assert [s for _, _, s in first] == ["fetched", "fetched"]
+        df = first[1][1]
+        assert list(df["quarter"]) == ["2020Q1", "2020Q2"] and list(df["sales"]) == [102, 202]
+        # rerun revalidates: 304s reuse the cached bodies, same tables as serial mode
+        again = fetch_all(ciks, "async", base_url=url, rate=50, concurrency=4, cache=cache)
+        assert [s for _, _, s in again] == ["not_modified", "not_modified"]
+        serial = fetch_all(ciks, "serial", base_url=url, rate=50, cache=cache)
+        for (_, a, _), (_, b, _) in zip(first, serial, strict=True):
+            assert a.equals(b)
+        assert len(hits) == 1 + 3 * len(ciks)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+def test_zip_ingest_matches_online_path(tmp_path):
+    zp = tmp_path / "companyfacts.zip"
+    ciks = ["0000000003", "0000000001", "0000000002"]
+    with zipfile.ZipFile(zp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for c in ciks:
+            zf.writestr(f"CIK{c}.json", json.dumps(_facts(c)))
+        zf.writestr("CIK0000000009.json", "{not json")
+        zf.writestr("CIK0000000008.json", "[]")  # JSON array, not a document
+        # units hold a number, not a list of facts
+        bad_units = {"facts": {"us-gaap": {"Revenues": {"units": {"USD": 5}}}}}
+        zf.writestr("CIK0000000007.json", json.dumps(bad_units))
+    for workers in (1, 2):
+        frames, bad, n, _ = ingest_zip(zp, ciks=ciks, workers=workers, batch_mb=1e-6)
+        assert n == 3 and not bad
+        got = pd.concat(frames, ignore_index=True)
+        want = pd.concat([fin_from_companyfacts(_facts(c), c).assign(firm_id=c)
+                          for c in sorted(ciks)], ignore_index=True)
+        pd.testing.assert_frame_equal(got, want)
+    for workers in (1, 2):
+        frames, bad, n, _ = ingest_zip(zp, workers=workers, batch_mb=1e-6)
+        assert n == 6 and len(frames) == 3
+        assert [c for c, _ in bad] == ["0000000007", "0000000008", "0000000009"]
+
+def test_vectorized_extraction_matches_rowwise():
+    from src.utils.reference import legacy_fin_from_companyfacts, synthetic_companyfacts
+    cf = synthetic_companyfacts(600, seed=3)
+    cf["facts"]["us-gaap"]["CostOfGoodsSold"]["units"]["USD"][0]["val"] = None
+    # falls back to the first other unit
+    del cf["facts"]["us-gaap"]["AccountsPayableCurrent"]["units"]["USD"]
+    pd.testing.assert_frame_equal(fin_from_companyfacts(cf, "1"),
+                                  legacy_fin_from_companyfacts(cf, "1"))
+
+def test_fetch_retries_rate_limits_and_isolates_bad_documents():
+    hits = []
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            cik = self.path.split("CIK")[1][:10]
+            hits.append(cik)
+            if cik == "0000000001" and hits.count(cik) == 1:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            # CIK 2 serves a JSON array: parsing it fails with a non-HTTP error
+            data = json.dumps([] if cik == "0000000002" else _facts(cik)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}"
+    try:
+        ciks = ["0000000001", "0000000002", "0000000003"]
+        for mode in ("async", "serial"):
+            hits.clear()
+            out = fetch_all(ciks, mode, base_url=url, rate=50, concurrency=3, backoff=0.01)
+            assert [s.split(":")[0] for _, _, s in out] == ["fetched", "error", "fetched"]
+            assert list(out[0][1]["sales"]) == [101, 201] and hits.count("0000000001") == 2
+    finally:
+        srv.shutdown()
+        srv.server_close()
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from src.utils.io import KEY_DTYPES, read_table, table_columns, write_table
+
+
+def test_table_roundtrip_projection_and_keys(tmp_path):
+    df = pd.DataFrame({"firm_id": ["a", "b", "a"], "quarter": ["2020Q1", "2020Q1", "2020Q2"],
+                       "CCC": [1.5, 2.0, 3.25], "extra": ["x", "y", "z"]})
+    for ext in ("csv", "parquet", "feather"):
+        p = tmp_path / f"t.{ext}"
+        write_table(df, p)
+        assert table_columns(p) == list(df.columns)
+        got = read_table(p, columns=["firm_id", "quarter", "CCC"], optional=["IV_wave", "extra"],
+                         categorical_keys=True)
+        assert list(got.columns) == ["firm_id", "quarter", "CCC", "extra"]
+        assert got["firm_id"].dtype == "category"
+        assert list(got["firm_id"].cat.categories) == ["a", "b"]
+        pd.testing.assert_frame_equal(got.astype(KEY_DTYPES), df.astype(KEY_DTYPES))
+    write_table(df, tmp_path / "t.txt")  # unknown suffix: CSV
+    pd.testing.assert_frame_equal(read_table(tmp_path / "t.txt"), df)
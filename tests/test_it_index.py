@@ -0,0 +1,11 @@
+import pandas as pd
+
+from src.text.build_it_index import expand_quarters
+
+
+def test_expand_quarters_vectorized():
+    df = pd.DataFrame({"firm_id": ["b", "a"], "year": ["2020", "2019"], "IT_index": [1.5, -0.5]})
+    out = expand_quarters(df)
+    assert list(out["quarter"][:5]) == ["2020Q1", "2020Q2", "2020Q3", "2020Q4", "2019Q1"]
+    assert list(out["firm_id"].astype(str)) == ["b"] * 4 + ["a"] * 4
+    assert list(out["IT_index"]) == [1.5] * 4 + [-0.5] * 4
@@ -0,0 +1,20 @@
+import re
+
+from src.text.keywords import KEYWORDS, KeywordMatcher, score_hits
+
+
+def test_keyword_matcher_matches_per_keyword_search():
+    texts = ["Our B2B portal and EDI links; e-commerce, ecommerce and an API for ERP integration.",
+             "No digital initiatives.", "Platform platform online order"]
+    hits = KeywordMatcher().hits(texts)
+    ref = [sum(bool(re.search(kw, t, flags=re.I)) for kw in KEYWORDS) for t in texts]
+    assert list(score_hits(hits)) == ref
+    assert hits[0, 0] == 2 and hits[2, 3] == 2
+
+
+def test_keyword_matcher_counts_overlapping_keywords():
+    keywords = [r"online\s+order", r"order", r"plat", r"platform", r"form"]
+    texts = ["Online order and order forms on the platform.", "nothing", "order order"]
+    hits = KeywordMatcher(keywords).hits(texts).toarray()
+    ref = [[len(re.findall(kw, t, flags=re.I)) for kw in keywords] for t in texts]
+    assert hits.tolist() == ref
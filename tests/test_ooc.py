@@ -0,0 +1,18 @@
+import numpy as np
+
+from src.text.ooc import build_hashing_pipeline, partial_fit_paths, predict_paths
+
+
+def test_ooc_partial_fit_streams_from_disk(tmp_path):
+    paths, y = [], []
+    for i in range(20):
+        p = tmp_path / f"firm{i:03d}_2020.txt"
+        text = "edi portal api integration" if i % 2 else "trucks warehouses cash"
+        p.write_text(text, encoding="utf-8")
+        paths.append(p)
+        y.append(i % 2)
+    pipe = build_hashing_pipeline(n_features=2**12)
+    pipe = partial_fit_paths(pipe, paths, y, epochs=3, batch_size=4, workers=2)
+    pred, prob = predict_paths(pipe, paths, batch_size=4, workers=2)
+    assert (pred == np.array(y)).all()
+    assert ((prob > 0.5) == pred.astype(bool)).all()
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.panel import Panel
+
+
+def test_panel_lags_respect_gaps_and_groups_match_pandas():
+    df = pd.DataFrame({"firm_id": ["b", "b", "b", "a", "a", "c"],
+                       "quarter": ["2019Q4", "2020Q1", "2020Q3", "2019Q4", "2020Q1", "2020Q1"],
+                       "industry": [1, 1, 1, 2, 2, 1],
+                       "x": [1.0, 2.0, 4.0, 10.0, np.nan, 7.0]})
+    p = Panel.from_frame(df, ["x"])
+    assert p.shape == (3, 4) and list(p.quarter_labels) == ["2019Q4", "2020Q1", "2020Q2", "2020Q3"]
+    np.testing.assert_array_equal(p.to_rows("x"), df["x"])
+    # 2020Q3 follows a missing 2020Q2: its lag is NaN, not the 2020Q1 value a row shift would give
+    np.testing.assert_array_equal(p.to_rows(p.lag("x", 1)),
+                                  [np.nan, 1.0, np.nan, np.nan, 10.0, np.nan])
+    np.testing.assert_array_equal(p.to_rows(p.lead("x", 2)),
+                                  [np.nan, 4.0, np.nan, np.nan, np.nan, np.nan])
+    ind, labels = p.codes(df["industry"])
+    for how in ("mean", "median", "count"):
+        want = df.groupby(["industry", "quarter"])["x"].transform(how)
+        got = p.to_rows(p.group_transform("x", ind, how))
+        np.testing.assert_allclose(got[~np.isnan(got)], want.to_numpy()[~np.isnan(got)])
+    np.testing.assert_array_equal(p.firm_reduce("x", "max"), [10.0, 4.0, 7.0])
+    np.testing.assert_array_equal(p.cumulative_max("x")[1], [1.0, 2.0, 2.0, 4.0])
@@ -0,0 +1,17 @@
+import random
+
+from src.data.prepare_10k_sec import TagStripper, clean_text
+
+
+def test_streaming_stripper_matches_clean_text():
+    rng = random.Random(0)
+    alphabet = ["<", ">", " ", "\n", "a", "b", "<p>", "</div>", "<>", "<<", ">>"]
+    for _ in range(2000):
+        s = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 25)))
+        t, out, i = TagStripper(), [], 0
+        while i < len(s):
+            k = rng.randint(1, 4)
+            out.append(t.feed(s[i:i + k]))
+            i += k
+        out.append(t.close())
+        assert "".join(out) == clean_text(s), s
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from src.data.prepare_fin_compustat import quarter_labels, read_fundq
+
+COLS = {"firm_id": "gvkey", "quarter": "datadate", "sales": "saleq", "cogs": "cogsq",
+        "inventory": "invtq", "receivables": "rectq", "payables": "apq"}
+
+def test_chunked_fundq_matches_single_pass(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 400
+    raw = pd.DataFrame({"gvkey": rng.choice(["001004", "001013", "012141"], n),
+                        "datadate": rng.choice(["2019-03-31", "2019-06-30", "2019-12-31"], n),
+                        "saleq": rng.integers(1, 100, n).astype(float), "cogsq": 1.0,
+                        "invtq": np.arange(n, dtype=float), "rectq": 2.0, "apq": 3.0,
+                        "naics": rng.choice(["334111", ""], n), "unused": "x"})
+    raw.loc[5, "apq"] = np.nan
+    p = tmp_path / "fundq.csv"
+    raw.to_csv(p, index=False)
+    whole, nrows = read_fundq(str(p), COLS, "naics", chunksize=10_000)
+    chunked, _ = read_fundq(str(p), COLS, "naics", chunksize=37)
+    assert nrows == n
+    pd.testing.assert_frame_equal(whole, chunked)
+    kept = raw.drop(index=5)
+    g = whole.set_index(["firm_id", "quarter"])
+    assert g["sales"].sum() == kept["saleq"].sum()
+    # last stock per firm-quarter in file order
+    last = kept.groupby(["gvkey", "datadate"])["invtq"].last()
+    assert sorted(g["inventory"]) == sorted(last)
+    assert list(quarter_labels(whole["quarter"]).unique()) == ["2019Q1", "2019Q2", "2019Q4"]
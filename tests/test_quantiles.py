@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.quantiles import ExactQuantiles, GroupedQuantiles, KLLSketch
+
+
+def test_exact_mode_matches_pandas():
+    x = np.random.default_rng(0).lognormal(size=10_001)
+    ex = ExactQuantiles()
+    for chunk in np.array_split(x, 7):
+        ex.update(chunk)
+    for q in (0.01, 0.5, 0.99):
+        assert ex.quantile(q) == pd.Series(x).quantile(q)
+
+def test_kll_rank_error_and_merge():
+    x = np.random.default_rng(1).normal(size=200_000)
+    xs = np.sort(x)
+    a, b = KLLSketch(0.01), KLLSketch(0.01, seed=1)
+    for chunk in np.array_split(x[:100_000], 10):
+        a.update(chunk)
+    b.update(x[100_000:])
+    a.merge(b)
+    assert a.n == len(x) and a.size < 2_000
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        assert abs(np.searchsorted(xs, a.quantile(q), side="right") / len(x) - q) < 0.01
+
+def test_grouped_quantiles_small_groups_exact():
+    # groups below the sketch capacity are never compacted, so they match the exact per-group
+    # quantile; a chunk without any grouped row adds nothing
+    df = pd.DataFrame({"g": np.repeat(["a", "b", None], 50), "v": np.arange(150.0)})
+    top = GroupedQuantiles(0.01).update(df["v"], df["g"]).update([1.0], [None]).quantile(0.9)
+    pd.testing.assert_series_equal(top, df.groupby("g")["v"].quantile(0.9), check_names=False,
+                                   check_index_type=False)
+
+def test_chunked_fin_read_matches_full_build():
+    from src.features.compute_ccc import (
+        base_panel,
+        core_metrics,
+        read_fin_winsorized,
+        winsor_cutoffs,
+    )
+    fin = pd.read_csv("data/raw/fin.csv")
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].assign(IT_index=np.random.default_rng(0).normal(size=len(fin)))
+    clipped, cutoffs = read_fin_winsorized("data/raw/fin.csv", chunksize=37)
+    assert cutoffs == winsor_cutoffs(core_metrics(fin.copy()))
+    pd.testing.assert_frame_equal(base_panel(clipped, it, gscpi, cutoffs),
+                                  base_panel(fin, it, gscpi))
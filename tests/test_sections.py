@@ -0,0 +1,11 @@
+from src.text.sections import extract_sections
+
+
+def test_find_sections_skips_table_of_contents():
+    text = ("Contents Item 1. Business 3 Item 7. MD&A 20 Item 10. Directors 50 "
+            "Item 1. Business We run an EDI platform for customers. Item 1A. Risks. "
+            "Item 7. MD&A Our e-commerce sales grew. Item 8. Financial statements 1 2 3")
+    kept, spans = extract_sections(text, ("1", "7"))
+    assert [s[0] for s in spans] == ["1", "7"]
+    assert kept.startswith("Item 1. Business We run") and "Financial statements" not in kept
+    assert extract_sections("no headers here", ("1",)) == ("no headers here", [])
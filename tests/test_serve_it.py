@@ -0,0 +1,72 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request
+
+import numpy as np
+
+from src.text.cv import build_pipeline
+from src.text.serve_it import ScoringService, make_server, score_remote
+
+
+def test_server_batches_concurrent_requests():
+    texts = ["edi portal api integration", "trucks warehouses cash"] * 10
+    y = [1, 0] * 10
+    pipe = build_pipeline(ngram_range=(1, 1), max_features=100).fit(texts, y)
+    service = ScoringService(pipe, max_batch=32, max_wait_ms=20).start()
+    server = make_server(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with ThreadPoolExecutor(8) as ex:
+            replies = list(ex.map(lambda t: score_remote(url, [t]), texts))
+        scores = np.array([r["scores"][0] for r in replies])
+        assert np.allclose(scores, pipe.predict_proba(texts)[:, 1])
+        assert all(r["latency_ms"] >= 0 for r in replies)
+        stats = json.loads(request.urlopen(url + "/stats").read())
+        assert stats["requests"] == len(texts)
+        assert stats["batches"] < len(texts)
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+def test_bad_requests_are_rejected_or_isolated():
+    class Pipe:
+        def predict_proba(self, texts):
+            if "boom" in texts:
+                raise ValueError("cannot score boom")
+            return np.tile([0.25, 0.75], (len(texts), 1))
+    service = ScoringService(Pipe(), max_batch=8, max_wait_ms=100, latency_window=3).start()
+    server = make_server(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/score"
+    def post(payload):
+        req = request.Request(url, data=json.dumps(payload).encode(),
+                              headers={"Content-Type": "application/json"})
+        try:
+            with request.urlopen(req) as resp:
+                return resp.status, json.loads(resp.read())
+        except request.HTTPError as e:
+            return e.code, json.loads(e.read())
+    try:
+        # before any request the latency percentiles are null (strict JSON, no NaN)
+        def no_nan(c):
+            raise ValueError(c)
+        body = request.urlopen(url.replace("/score", "/stats")).read()
+        stats = json.loads(body, parse_constant=no_nan)
+        assert stats["latency_ms_p50"] is None and stats["latency_ms_p95"] is None
+        for bad in ({"texts": "abc"}, ["abc"], {"texts": ["ok", 3]}):
+            assert post(bad)[0] == 400
+        # one failing request in a batch does not fail the others
+        with ThreadPoolExecutor(4) as ex:
+            payloads = [{"texts": ["ok"]}, {"texts": ["boom"]}, {"text": "fine"},
+                        {"texts": ["a", "b"]}]
+            replies = list(ex.map(post, payloads))
+        assert [code for code, _ in replies] == [200, 500, 200, 200]
+        assert replies[3][1]["scores"] == [0.75, 0.75]
+        assert len(service.stats["latency_ms"]) == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
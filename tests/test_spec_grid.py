@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from scripts.run_spec_grid import expand_specs, run_grid, shared_stages
+from src.features.compute_ccc import add_treat_and_event, base_panel, finalize_panel
+from src.models.did_eventstudy import run_eventstudy
+from src.models.fe_panel import fe_regression
+
+
+def test_grid_matches_single_runs():
+    fin = pd.read_csv("data/raw/fin.csv")
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].copy()
+    it["IT_index"] = np.random.default_rng(0).normal(size=len(it))
+    axes = {"treat_rule": ["gscpi_thresh", "industry_topdecile"], "gscpi_thresh": [0.0, 0.5],
+            "shock_col": ["gscpi"], "iv_spec": ["peer_it_lagK"], "iv_lag": [2], "window": [3],
+            "mediator": ["DIO", "DPO"]}
+    specs = expand_specs(axes, ["fe", "did", "mediation"])
+    # the threshold only multiplies gscpi_thresh specs; fe runs once
+    assert [s["model"] for s in specs] == ["fe", "did", "did", "did", "mediation", "mediation"]
+
+    base = base_panel(fin, it, gscpi)
+    shared = shared_stages(base, axes["mediator"])
+    shared.update(cov="HC1", tol=1e-10, quantile_eps=0.0, custom_events=None,
+                  industry_wave_csv=None)
+    out = run_grid(shared, specs)
+
+    df = finalize_panel(base)
+    fe = fe_regression(df)[1]
+    np.testing.assert_allclose(out.loc[out["spec"] == 0, "coef"], fe["coef"], rtol=1e-9,
+                               equal_nan=True)
+    did = run_eventstudy(finalize_panel(add_treat_and_event(base, "industry_topdecile")), window=3)
+    got = out.loc[(out["model"] == "did") & (out["treat_rule"] == "industry_topdecile")]
+    np.testing.assert_allclose(got["coef"], did["coef"], rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(got["std_err"], did["std_err"], rtol=1e-9, equal_nan=True)
+
+def test_grid_mediator_with_missing_rows():
+    from src.models.mediation_statistical import mediation_paths
+    fin = pd.read_csv("data/raw/fin.csv")
+    gscpi = pd.read_csv("data/raw/external/gscpi.csv")
+    it = fin[["firm_id", "quarter"]].copy()
+    it["IT_index"] = np.random.default_rng(1).normal(size=len(it))
+    base = base_panel(fin, it, gscpi)
+    base["DPO_gap"] = base["DPO"].where(np.arange(len(base)) % 5 > 0)
+    shared = shared_stages(base, ["DPO_gap"])
+    shared.update(cov="HC1", tol=1e-10, quantile_eps=0.0, custom_events=None,
+                  industry_wave_csv=None)
+    keys = ["treat_rule", "gscpi_thresh", "shock_col", "iv_spec", "iv_lag", "window"]
+    specs = [{"model": "mediation", **dict.fromkeys(keys), "mediator": "DPO_gap"}]
+    out = run_grid(shared, specs)
+    df = finalize_panel(base)
+    one = mediation_paths(df[df["DPO_gap"].notna()], ["DPO_gap"])[0]
+    np.testing.assert_allclose(out["coef"], one["value"], rtol=1e-8)